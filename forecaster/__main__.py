@@ -2,14 +2,21 @@
 # -*- coding: utf-8 -*-
 
 import argparse
+import json
 import logging
 import os.path
 import subprocess
+import sys
 
 from forecaster import Bot
+from forecaster.logger import setup_logging
 from forecaster.utils import CLIConfig
 from forecaster.__version__ import __version__
 
+# modules loaded by the code paths of the CLI
+STARTUP_MODULES = ['forecaster', 'forecaster.handler', 'forecaster.mediate',
+                   'forecaster.predict', 'forecaster.automate']
+
 
 def main():
     # PARSER
@@ -24,7 +31,23 @@ def main():
     parser.add_argument('--config-credentials', dest="config_creds",
                         action="store_true", help="config credentials from terminal")
     parser.add_argument('--version', action="version", version="%(prog)s {}".format(__version__))
+    parser.add_argument('--import-time', dest="import_time", action="store_true",
+                        help="report import time of modules")
+    subparsers = parser.add_subparsers(dest="command")
+    bench_parser = subparsers.add_parser('bench', help="run benchmarks on synthetic data")
+    bench_parser.add_argument('--symbols', type=int, default=200, help="number of symbols")
+    bench_parser.add_argument('--positions', type=int, default=200, help="number of positions")
+    bench_parser.add_argument('--repeat', type=int, default=5, help="runs of every benchmark")
+    bench_parser.add_argument('--only', nargs='+', help="run only these benchmarks")
+    bench_parser.add_argument('--output', help="save results to json file")
+    bench_parser.add_argument('--baseline', help="compare with results saved in json file")
+    bench_parser.add_argument('--tolerance', type=float, default=0.1,
+                              help="relative change considered noise")
     args = parser.parse_args()
+    if args.import_time:
+        import_report()
+        return
+    setup_logging()
     root_logger = logging.getLogger('forecaster')
     # - verbose
     if args.verbose >= 1:
@@ -45,6 +68,11 @@ def main():
         conf.add_query_insert('mode', 'trading mode')
         conf.run()
         return
+    if args.command == 'bench':
+        if args.verbose < 1:  # don't measure logging
+            root_logger.setLevel(logging.WARNING)
+            logging.getLogger('mover').setLevel(logging.WARNING)
+        sys.exit(bench(args))
     if args.foreground:
         path = os.path.join(os.path.dirname(__file__), 'run.sh')
         subprocess.call(path)
@@ -61,5 +89,49 @@ def main():
         raise
 
 
+def bench(args):
+    """run benchmarks, print json results and return exit code"""
+    from forecaster.bench import compare, run
+    results = run(args.symbols, args.positions, args.repeat, args.only)
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            json.dump(results, output_file, indent=2)
+    if args.baseline:
+        with open(args.baseline, 'r') as baseline_file:
+            results['comparison'] = compare(results, json.load(baseline_file), args.tolerance)
+    print(json.dumps(results, indent=2))
+    if any(item['status'] == 'slower' for item in results.get('comparison', {}).values()):
+        return 1
+    return 0
+
+
+def import_report(modules=STARTUP_MODULES, top=8):
+    """print import time of modules and of their slowest dependencies"""
+    interpreter = {name for _, name, _ in _import_times('pass')}
+    for module in modules:
+        times = [item for item in _import_times('import ' + module) if item[1] not in interpreter]
+        total = sum(secs for secs, _, depth in times if depth == 0)
+        print("{:<24} {:.3f}s".format(module, total))
+        # packages (not modules) outside forecaster, their time includes dependencies
+        packages = [(secs, name) for secs, name, _ in times
+                    if '.' not in name and name != 'forecaster' and not name.startswith('_')]
+        for secs, name in sorted(packages, reverse=True)[:top]:
+            print("    {:<20} {:.3f}s".format(name, secs))
+
+
+def _import_times(code):
+    """run code with -X importtime, return (seconds, module, depth) list"""
+    output = subprocess.run([sys.executable, '-X', 'importtime', '-c', code],
+                            stderr=subprocess.PIPE, universal_newlines=True).stderr
+    times = []
+    for line in output.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        times.append((int(cumulative) / 1e6, name.strip(), depth))
+    return times
+
+
 if __name__ == '__main__':
     main()
@@ -1 +1,2 @@
 from .automaton import Automaton
+from .shard import Coordinator, MarginBudget, Shard
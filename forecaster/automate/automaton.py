@@ -5,70 +5,215 @@ forecaster.automate.automaton
 Proxy class to automate algorithms.
 """
 
+import asyncio
 import logging
 import time
-from threading import Event
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
 
 from forecaster.automate.positioner import Positioner
-from forecaster.automate.utils import LogThread, ThreadHandler, wait, wait_precisely
+from forecaster.automate.scheduler import OVERRUN, Scheduler
 from forecaster.enums import ACTIONS, TIMEFRAME
 from forecaster.handler import Client
+from forecaster.handler.gateway import LANE
+from forecaster.metrics import ROUND_LAG, ROUND_SECONDS
 from forecaster.patterns import Chainer
 from forecaster.security import Preserver
-from forecaster.utils import read_strategy
+from forecaster.utils import get_conf, read_strategy, watch_strategy
 
 LOGGER = logging.getLogger('forecaster.automate')
 
+# side of orders of predictions
+SIDES = {ACTIONS.BUY: 'buy', ACTIONS.SELL: 'sell'}
+
+# timestamps of a transaction round, boundary is the close of the last candle
+RoundTiming = namedtuple('RoundTiming', ['boundary', 'start', 'fetched', 'predicted', 'end'])
+
 
 class Automaton(Chainer):
     """Adapter and Mediator for autonomous capability"""
 
-    def __init__(self, strat, bot):
+    def __init__(self, strat, bot, client=None, shard=None):
         super().__init__(bot)
-        self.strategy = read_strategy(strat)
+        self._client = client  # None is the default account
+        self.shard = shard  # instruments of this process, None is all
+        self.strategy = read_strategy(strat) if isinstance(strat, str) else strat
+        if shard is not None:
+            self.strategy = shard.select(self.strategy)
         time_trans = self.strategy['timeframe']
         self.timeframe = [time_trans, TIMEFRAME[time_trans]]
         # AUTONOMOUS MODULES
-        self.preserver = Preserver(self.strategy)
-        self.positioner = Positioner(self.strategy)
-        self.LOOP = Event()
+        self.preserver = Preserver(
+            self.strategy, client, shard.budget if shard is not None else None)
+        self.positioner = Positioner(self.strategy, self)
+        self.aclient = self._make_async()  # None runs rounds on threads
+        self.job = None
+        self.last_round = None  # RoundTiming of last round
+        if isinstance(strat, str):
+            watch_strategy(strat, self.configure)  # hot reload
         LOGGER.debug("AUTOMATON: ready")
 
+    @property
+    def client(self):
+        """client of the account traded by automaton"""
+        return self._client if self._client is not None else Client()
+
+    def configure(self, strat):
+        """apply a new strategy without stopping checkers"""
+        if self.shard is not None:
+            strat = self.shard.select(strat)
+        old = self.strategy
+        self.strategy = strat
+        self.timeframe = [strat['timeframe'], TIMEFRAME[strat['timeframe']]]
+        self.preserver.configure(strat)
+        self.positioner.configure(strat)
+        timing = ('sleep_transactions', 'overrun')
+        if self.job is not None and any(old.get(key) != strat.get(key) for key in timing):
+            self.job.cancel()
+            self.job = self._schedule(delay=strat['sleep_transactions'])
+        LOGGER.info("AUTOMATON: strategy updated")
+
     def handle_request(self, event, **kw):
         """handle requests from chainers"""
         return self.pass_request(event, **kw)
 
     def start(self):
-        """start threads"""
-        self.LOOP.set()
-        ThreadHandler().add_event(self.LOOP)
-        thread = LogThread(target=self.check_closes)  # check closes
-        thread.start()
-        ThreadHandler().add_thread(thread)
-        LOGGER.debug("check_closes thread started")
+        """schedule transaction rounds"""
+        self.job = self._schedule(delay=self._time_left())
         self.positioner.start()
         LOGGER.debug("AUTOMATON: started")
 
+    def _schedule(self, delay):
+        return Scheduler().every(
+            self.strategy['sleep_transactions'], self.run_round, delay=delay,
+            overrun=OVERRUN(self.strategy.get('overrun', OVERRUN.SKIP.value)),
+            name='transactions')
+
     def stop(self):
-        """stop threads"""
+        """stop scheduled jobs"""
         self.positioner.stop()
-        self.LOOP.clear()
+        if self.job is not None:
+            self.job.cancel()
+            self.job = None
         LOGGER.debug("AUTOMATON: stopped")
 
-    def check_closes(self):
-        """first thread loop - check close"""
-        wait(self._time_left(), self.LOOP)
-        while self.LOOP.is_set():
-            start = time.time()
-            for symbol in self.strategy['currencies']:
-                tran = Transaction(symbol, self)
-                tran.complete()
-            wait_precisely(self.strategy['sleep_transactions'], start, self.LOOP)
+    def run_round(self):
+        """scheduled round, on the async client if enabled in config"""
+        if self.aclient is not None:
+            return asyncio.run(self.complete_round_async(self.aclient))
+        return self.complete_round()
+
+    def complete_round(self):
+        """fetch candles of all symbols, predict them, then dispatch orders"""
+        start = time.time()
+        candles = self._fetch_all(self.strategy['currencies'])
+        fetched = time.time()
+        predictions = self.handle_request(ACTIONS.PREDICT_MANY, candles=candles)
+        predicted = time.time()
+        transactions = [Transaction(sym, self, predictions[sym])
+                        for sym in self.strategy['currencies'] if sym in predictions]
+        for transaction in transactions:
+            transaction.fix_trend()  # margin freed by closes is counted for orders
+        self.preserver.begin_round()  # one read of funds for every order
+        try:
+            allowed = self._check_orders(predictions)
+            for transaction in transactions:
+                transaction.allowed = allowed.get(transaction.symbol)
+                transaction.open()
+        finally:
+            self.preserver.end_round()
+        end = time.time()
+        self.last_round = RoundTiming(self._boundary(), start, fetched, predicted, end)
+        self._log_round(self.last_round, len(predictions))
+
+    async def complete_round_async(self, client):
+        """complete_round on an AsyncClient, orders of all symbols are concurrent"""
+        start = time.time()
+        symbols = self.strategy['currencies']
+        results = await asyncio.gather(
+            *[client.get_last_candles(sym, self.strategy['count'], self.strategy['timeframe'])
+              for sym in symbols], return_exceptions=True)
+        candles = {}
+        for symbol, result in zip(symbols, results):
+            if isinstance(result, Exception):
+                LOGGER.warning("failed to fetch candles of {}: {}".format(symbol, result))
+            elif result:
+                candles[symbol] = result
+        fetched = time.time()
+        predictions = self.handle_request(ACTIONS.PREDICT_MANY, candles=candles)
+        predicted = time.time()
+        transactions = [Transaction(sym, self, predictions[sym])
+                        for sym in symbols if sym in predictions]
+        await asyncio.gather(*[transaction.fix_trend_async(client)
+                               for transaction in transactions])
+        await client.run(self.preserver.begin_round)
+        try:
+            allowed = await client.run(self._check_orders, predictions)
+            for transaction in transactions:
+                transaction.allowed = allowed.get(transaction.symbol)
+            await asyncio.gather(*[transaction.open_async(client)
+                                   for transaction in transactions])
+        finally:
+            self.preserver.end_round()
+        end = time.time()
+        self.last_round = RoundTiming(self._boundary(), start, fetched, predicted, end)
+        self._log_round(self.last_round, len(predictions))
+
+    def _make_async(self):
+        from forecaster.handler.aio import AsyncClient
+        if not get_conf()['HANDLER'].getboolean('async', fallback=False):
+            return None
+        return AsyncClient(self.client)
+
+    def _check_orders(self, predictions):
+        """check margin of all orders of the round in one batch"""
+        symbols = [sym for sym in self.strategy['currencies']
+                   if predictions.get(sym) in (ACTIONS.BUY, ACTIONS.SELL)]
+        quantity = self.strategy['fixed_quantity']
+        allowed = self.preserver.check_margins([(sym, quantity) for sym in symbols])
+        return dict(zip(symbols, allowed))
+
+    def _fetch_all(self, symbols):
+        """fetch candles of every symbol with a bounded pool of workers"""
+        def fetch(symbol):
+            try:
+                return self.client.get_last_candles(
+                    symbol, self.strategy['count'], self.strategy['timeframe'])
+            except Exception as e:
+                LOGGER.warning("failed to fetch candles of {}: {}".format(symbol, e))
+                return None
+
+        with ThreadPoolExecutor(max_workers=self.strategy.get('workers', 4)) as executor:
+            results = executor.map(fetch, symbols)
+            return {sym: candles for sym, candles in zip(symbols, results) if candles}
+
+    def _boundary(self):
+        """get time of the last candle boundary"""
+        times = [self.client.candles.last_timestamp(sym, self.timeframe[0])
+                 for sym in self.strategy['currencies']]
+        times = [x for x in times if x is not None]
+        return max(times) if times else None
+
+    def _log_round(self, timing, num):
+        """log timing of the round"""
+        ROUND_SECONDS.observe(timing.fetched - timing.start, phase='fetch')
+        ROUND_SECONDS.observe(timing.predicted - timing.fetched, phase='predict')
+        ROUND_SECONDS.observe(timing.end - timing.predicted, phase='orders')
+        ROUND_SECONDS.observe(timing.end - timing.start, phase='total')
+        LOGGER.info("round of {} symbols: fetch {:.3f}s, predict {:.3f}s, orders {:.3f}s".format(
+            num, timing.fetched - timing.start, timing.predicted - timing.fetched,
+            timing.end - timing.predicted))
+        if timing.boundary is not None:
+            LOGGER.info("last order sent {:.3f}s after candle boundary".format(
+                timing.end - timing.boundary))
+            ROUND_LAG.set(timing.end - timing.boundary)
 
     def _time_left(self):
         """get time left to update of hist data"""
         # check EURUSD for convention
-        hist = Client().api.get_historical_data('EURUSD', 1, self.timeframe[0])
+        client = self.client
+        hist = client.gateway.call(
+            LANE.DATA, client.api.get_historical_data, 'EURUSD', 1, self.timeframe[0])
         last_time = int(hist[0]['timestamp']) / 1000  # remove milliseconds
         time_left = self.timeframe[1] - (time.time() - last_time)
         LOGGER.debug("time left (in minutes): {}".format(time_left / 60))
@@ -76,33 +221,64 @@ class Automaton(Chainer):
 
 
 class Transaction(object):
-    def __init__(self, symbol, automaton):
+    def __init__(self, symbol, automaton, mode=None, allowed=None):
         self.auto = automaton
+        self.allowed = allowed  # result of margin check if already done
         self.symbol = symbol
-        self.mode = self._get_mode()
+        self.mode = mode if mode is not None else self._get_mode()
         self.quantity = automaton.strategy['fixed_quantity']
         self.fix = automaton.strategy['fix_trend']
 
     def complete(self):
-        Client().refresh()
-        poss = [pos for pos in Client().api.positions if pos.instrument == self.symbol]
-        if self.mode == ACTIONS.BUY:
-            if self.fix:  # if requested to fix
-                self._fix_trend(poss, 'sell')
-            self.open()
-        elif self.mode == ACTIONS.SELL:
-            if self.fix:  # if requested to fix
-                self._fix_trend(poss, 'buy')
-            self.open()
+        self.fix_trend()
+        self.open()
+        LOGGER.debug("transaction completed")
+
+    async def complete_async(self, client):
+        """complete on an AsyncClient"""
+        await self.fix_trend_async(client)
+        await self.open_async(client)
         LOGGER.debug("transaction completed")
 
+    def fix_trend(self):
+        """close positions of the opposite trend if requested"""
+        opposite = self._opposite()
+        if opposite is not None:
+            poss = self.auto.client.snapshot().by_instrument.get(self.symbol, ())
+            self._fix_trend(poss, opposite)
+
+    async def fix_trend_async(self, client):
+        opposite = self._opposite()
+        if opposite is not None:
+            poss = (await client.snapshot()).by_instrument.get(self.symbol, ())
+            await asyncio.gather(*[client.submit_close(pos, 'trend') for pos in poss
+                                   if pos.mode == opposite])
+
     def open(self):
-        if not self.auto.preserver.check_margin(self.symbol, self.quantity):
+        """open position of transaction, return error of refused order or None"""
+        if self.mode not in SIDES:
+            return None
+        if self.allowed is None:
+            self.allowed = self.auto.preserver.check_margin(self.symbol, self.quantity)
+        if not self.allowed:
             LOGGER.warning("Transaction can't be executed due to missing funds")
-        if self.mode == ACTIONS.BUY:
-            Client().open_pos(self.symbol, 'buy', self.quantity)
-        if self.mode == ACTIONS.SELL:
-            Client().open_pos(self.symbol, 'sell', self.quantity)
+        return self.auto.client.open_pos(self.symbol, SIDES[self.mode], self.quantity)
+
+    async def open_async(self, client):
+        if self.mode not in SIDES:
+            return None
+        if self.allowed is None:
+            self.allowed = await client.run(
+                self.auto.preserver.check_margin, self.symbol, self.quantity)
+        if not self.allowed:
+            LOGGER.warning("Transaction can't be executed due to missing funds")
+        return await client.submit_open(self.symbol, SIDES[self.mode], self.quantity)
+
+    def _opposite(self):
+        """get side of positions to close, None if not fixing"""
+        if self.fix and self.mode in SIDES:
+            return SIDES[ACTIONS.SELL if self.mode == ACTIONS.BUY else ACTIONS.BUY]
+        return None
 
     def _get_mode(self):
         args = [self.symbol, self.auto.strategy['count'], self.auto.strategy['timeframe']]
@@ -110,8 +286,8 @@ class Transaction(object):
 
     def _fix_trend(self, poss, mode):
         pos_left = [x for x in poss if x.mode == mode]  # get position of mode
-        LOGGER.debug("{} trends to fix".format(len(pos_left)))
+        LOGGER.debug("%d trends to fix", len(pos_left))
         if pos_left:  # if existent
             for pos in pos_left:  # iterate over
-                LOGGER.debug("fixing trend for {}".format(pos.instrument))
-                Client().close_pos(pos)
+                LOGGER.debug("fixing trend for %s", pos.instrument)
+                self.auto.client.close_pos(pos, reason='trend')
@@ -8,15 +8,15 @@ complexity of operations.
 """
 
 import abc
+import asyncio
 import logging
-import time
-from threading import Event
 
-from forecaster.automate.utils import ACTIONS, LogThread, ThreadHandler, wait_precisely
+from forecaster.automate.scheduler import OVERRUN, Scheduler
+from forecaster.automate.utils import ACTIONS
+from forecaster import enums
 from forecaster.enums import TIMEFRAME
 from forecaster.handler import Client
 from forecaster.patterns import Chainer
-from forecaster.predict.utils import AverageTrueRange
 
 LOGGER = logging.getLogger('forecaster.automate.checker')
 
@@ -25,44 +25,92 @@ LOGGER = logging.getLogger('forecaster.automate.checker')
 class PositionChecker(Chainer, metaclass=abc.ABCMeta):
     """abstract implementation class for checkers"""
 
-    def __init__(self, sleep_time, successor):
+    def __init__(self, strat, successor):
         super().__init__(successor)
-        self.sleep_time = sleep_time
-        self.active = Event()
+        self.job = None
+        self.configure(strat)
         LOGGER.debug("{!s} initied".format(self.__class__.__name__))
 
+    def configure(self, strat):
+        """read strategy values, sweeps are rescheduled if timing changed"""
+        sleep_time = strat['sleep']
+        overrun = OVERRUN(strat.get('overrun', OVERRUN.SKIP.value))
+        changed = (sleep_time, overrun) != (getattr(self, 'sleep_time', None),
+                                            getattr(self, 'overrun', None))
+        self.sleep_time, self.overrun = sleep_time, overrun
+        if changed and self.job is not None:  # running: keep monitoring positions
+            self.job.cancel()
+            self.start()
+
+    @property
+    def client(self):
+        """client of the account of positioner"""
+        client = getattr(self._successor, 'client', None)
+        return client if client is not None else Client()
+
+    @property
+    def aclient(self):
+        return getattr(self._successor, 'aclient', None)
+
+    @property
+    def shard(self):
+        return getattr(self._successor, 'shard', None)
+
     def handle_request(self, event, **kw):
         """handle requests from chainers"""
-        self.pass_request(event, **kw)
+        return self.pass_request(event, **kw)
+
+    def owned(self, positions):
+        """get positions of the instruments of this process"""
+        shard = self.shard
+        if shard is None:
+            return positions
+        return [pos for pos in positions if shard.owns(pos.instrument)]
 
     @abc.abstractmethod
     def check(self, *args):
         """main check function"""
         pass
 
-    def run(self):
-        """run method for threading"""
-        while self.active.is_set():
-            start = time.time()  # record timing
-            for pos in Client().positions:
-                Client().refresh()  # refresh and update
-                action = self.check(pos)
-                if action is not None:
-                    self.handle_request(action, pos=pos, checker=self.__class__.__name__)
-            wait_precisely(self.sleep_time, start, self.active)  # wait and repeat
+    def run_sweep(self):
+        """scheduled sweep, on the async client if enabled in config"""
+        aclient = self.aclient
+        if aclient is not None:
+            return asyncio.run(self.sweep_async(aclient))
+        return self.sweep()
+
+    def sweep(self):
+        """check every position once"""
+        for pos in self.owned(self.client.snapshot().positions):  # shared between checkers
+            action = self.check(pos)
+            if action is not None:
+                self.handle_request(action, pos=pos, checker=self.__class__.__name__)
+
+    async def sweep_async(self, client):
+        """sweep on an AsyncClient, positions are checked and closed concurrently"""
+        positions = self.owned((await client.snapshot()).positions)
+        actions = await asyncio.gather(*[client.run(self.check, pos) for pos in positions])
+        closing = []
+        for pos, action in zip(positions, actions):
+            if action == ACTIONS.CLOSE:
+                LOGGER.debug("%s checker triggered for %s", self.__class__.__name__, pos.id)
+                closing.append(client.submit_close(pos, self.__class__.__name__))
+            elif action is not None:
+                self.handle_request(action, pos=pos, checker=self.__class__.__name__)
+        await asyncio.gather(*closing)
 
     def start(self):
-        """start the thread"""
-        self.active.set()
-        ThreadHandler().add_event(self.active)
-        thread = LogThread(target=self.run)
-        thread.start()
-        ThreadHandler().add_thread(thread)
+        """schedule sweeps"""
+        self.job = Scheduler().every(
+            self.sleep_time, self.run_sweep, overrun=self.overrun,
+            name=self.__class__.__name__)
         LOGGER.debug("{!s} started".format(self.__class__.__name__))
 
     def stop(self):
-        """stop the thread"""
-        self.active.clear()
+        """cancel sweeps"""
+        if self.job is not None:
+            self.job.cancel()
+            self.job = None
         LOGGER.debug("{!s} stopped".format(self.__class__.__name__))
 
 
@@ -75,26 +123,26 @@ class PositionChecker(Chainer, metaclass=abc.ABCMeta):
 class RelativeChecker(PositionChecker):
     """Check Average True Range and put limits on percentages of the range"""
 
-    def __init__(self, strat, positioner):
-        super().__init__(strat['sleep'], positioner)
+    def configure(self, strat):
         self.gain = strat['gain']
         self.loss = strat['loss']
         self.avg = strat['avg']
+        super().configure(strat)
 
     def check(self, position):
         pos_price = position.price
         curr_price = position.current_price
-        candles = Client().get_last_candles(
-            position.instrument, self.avg['count'], self.avg['timeframe'])
-        ATR = AverageTrueRange(candles)
+        ATR = self.handle_request(
+            enums.ACTIONS.GET_ATR,
+            args=[position.instrument, self.avg['count'], self.avg['timeframe']])
         diff = pos_price - ATR
         fav_price = pos_price + diff * self.gain
         unfav_price = pos_price - diff * self.loss
         # closer to 1 cross the limit, as it goes down the loss increases
         progress = -(fav_price - curr_price) / (fav_price - pos_price) + 1
         unprogress = -(unfav_price - curr_price) / (unfav_price - pos_price) + 1
-        LOGGER.debug("progress to profit {:.2f}%%".format(100 * progress))
-        LOGGER.debug("progress to loss {:.2f}%%".format(100 * unprogress))
+        LOGGER.debug("progress to profit %.2f%%", 100 * progress)
+        LOGGER.debug("progress to loss %.2f%%", 100 * unprogress)
         if progress >= 1 or unprogress >= 1:
             return ACTIONS.CLOSE
         else:
@@ -106,16 +154,17 @@ class RelativeChecker(PositionChecker):
 # | Check if profit exceeded limits fixed limits                         |
 # +----------------------------------------------------------------------+
 class ReversionChecker(PositionChecker):
-    def __init__(self, strat, positioner):
-        super().__init__(strat['sleep'], positioner)
-        self.Meanrev = positioner.predicter.MeanReversion
-        self.count = int(TIMEFRAME[positioner.auto_strategy['timeframe']] /
-                         TIMEFRAME[strat['timeframe']]) * positioner.auto_strategy['count']
+    def configure(self, strat):
+        auto_strategy = self._successor.auto_strategy
+        self.count = int(TIMEFRAME[auto_strategy['timeframe']] /
+                         TIMEFRAME[strat['timeframe']]) * auto_strategy['count']
         self.timeframe = strat['timeframe']
+        super().configure(strat)
 
     def check(self, position):
-        candles = Client().get_last_candles(position.instrument, self.count, self.timeframe)
-        band = self.Meanrev.get_band(candles)
+        # streaming band of predicter, updated only with the newest candles
+        band = self.handle_request(enums.ACTIONS.GET_BAND,
+                                   args=[position.instrument, self.count, self.timeframe])
         if position.mode == 'buy' and position.current_price >= band:
             LOGGER.debug("overtaken band")
             return ACTIONS.CLOSE
@@ -129,15 +178,15 @@ class ReversionChecker(PositionChecker):
 # | Check if profit exceeded limits fixed limits                         |
 # +----------------------------------------------------------------------+
 class FixedChecker(PositionChecker):
-    def __init__(self, strat, positioner):
-        super().__init__(strat['sleep'], positioner)
+    def configure(self, strat):
         self.gain = strat['gain']
         self.loss = strat['loss']
+        super().configure(strat)
 
     def check(self, position):
         profit = position.result
         if profit >= self.gain or profit <= self.loss:
-            LOGGER.debug("position profit {:.2f}".format(profit))
+            LOGGER.debug("position profit %.2f", profit)
             return ACTIONS.CLOSE
 
 
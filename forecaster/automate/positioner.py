@@ -18,33 +18,76 @@ LOGGER = logging.getLogger('forecaster.automate.positioner')
 class Positioner(Chainer):
     """module that handle positions"""
 
-    def __init__(self, strat):
+    def __init__(self, strat, automaton=None):
+        super().__init__(automaton)
+        self.checkers = {}  # name: running checker
+        self.running = False
+        self.routes = {ACTIONS.CLOSE: self.close, ACTIONS.KEEP: self.keep}
+        self.configure(strat)
+        LOGGER.debug("POSITIONER: ready")
+
+    def configure(self, strat):
+        """read strategy, running checkers are updated, started or stopped"""
         self.auto_strategy = strat  # keep for checkers
         self.checkers_strat = strat['checkers']
         self.pos_checks = self.checkers_strat['activate']
-        self.checkers = []
-        LOGGER.debug("POSITIONER: ready")
+        if not self.running:
+            return
+        for name in list(self.checkers):
+            if name not in self.pos_checks:
+                self.checkers.pop(name).stop()
+        for name in self.pos_checks:
+            if name in self.checkers:
+                self.checkers[name].configure(self.checkers_strat[name])
+            else:
+                self._start_checker(name)
+
+    @property
+    def client(self):
+        """client of the account of automaton"""
+        client = getattr(self._successor, 'client', None)
+        return client if client is not None else Client()
+
+    @property
+    def aclient(self):
+        """async client of automaton, None if disabled"""
+        return getattr(self._successor, 'aclient', None)
+
+    @property
+    def shard(self):
+        """shard of automaton, positions of other instruments are left to other processes"""
+        return getattr(self._successor, 'shard', None)
 
     def handle_request(self, event, **kw):
         """handle requests from chainers"""
-        if event == ACTIONS.CLOSE:
-            LOGGER.debug("{} checker triggered for {}".format(kw['checker'], kw['pos'].id))
-            Client().close_pos(kw['pos'])
-        elif event == ACTIONS.KEEP:
-            LOGGER.debug("{} checker keeps position {}".format(kw['checker'], kw['pos'].id))
-        else:
-            self.pass_request(event, **kw)
+        route = self.routes.get(event)
+        if route is not None:
+            return route(**kw)
+        return self.pass_request(event, **kw)
+
+    def close(self, pos, checker):
+        LOGGER.debug("%s checker triggered for %s", checker, pos.id)
+        return self.client.close_pos(pos, reason=checker)
+
+    def keep(self, pos, checker):
+        LOGGER.debug("%s checker keeps position %s", checker, pos.id)
 
     def start(self):
-        """stop positioner"""
+        """start positioner"""
         for name in self.pos_checks:
-            checker = FactoryChecker[name](self.checkers_strat[name], self)
-            self.checkers.append(checker)
-            checker.start()
+            self._start_checker(name)
+        self.running = True
         LOGGER.debug("POSITIONER: started")
 
     def stop(self):
         """stop positioner"""
-        for checker in self.checkers:
+        for checker in self.checkers.values():
             checker.stop()
+        self.checkers.clear()
+        self.running = False
         LOGGER.debug("POSITIONER: stopped")
+
+    def _start_checker(self, name):
+        checker = FactoryChecker[name](self.checkers_strat[name], self)
+        self.checkers[name] = checker
+        checker.start()
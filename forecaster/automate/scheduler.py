@@ -0,0 +1,162 @@
+"""
+forecaster.automate.scheduler
+~~~~~~~~~~~~~~
+
+Single scheduler for all periodic jobs.
+Deadlines are kept in a heap on the monotonic clock and the dispatcher
+sleeps until the next one, jobs run on a small pool of workers.
+"""
+
+import heapq
+import itertools
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from enum import Enum
+from threading import Condition
+
+from forecaster.automate.utils import LogThread
+from forecaster.handler import SentryClient
+from forecaster.metrics import JOB_LAG, JOB_SECONDS
+from forecaster.patterns import Singleton
+
+LOGGER = logging.getLogger('forecaster.automate.scheduler')
+
+
+class OVERRUN(Enum):
+    """policy for ticks missed while the job was running"""
+    SKIP = 'skip'  # drop missed ticks and wait for the next one
+    CATCH_UP = 'catch_up'  # run every missed tick back to back
+    COALESCE = 'coalesce'  # run once now for all missed ticks
+
+
+class Job(object):
+    """periodic job handled by Scheduler"""
+
+    def __init__(self, func, interval, overrun, name):
+        self.func = func
+        self.interval = interval
+        self.overrun = overrun
+        self.name = name
+        self.deadline = None
+        self.cancelled = False
+        self.runs = 0
+        self.missed = 0
+        self.late_until = None  # deadline of last tick counted in missed
+
+    def cancel(self):
+        """stop rescheduling the job"""
+        Scheduler().cancel(self)
+
+    def __repr__(self):
+        return "<Job {} every {}s>".format(self.name, self.interval)
+
+
+class Scheduler(metaclass=Singleton):
+    """timer heap that runs periodic jobs on a pool of workers"""
+
+    def __init__(self, workers=4):
+        self.workers = workers
+        self._heap = []
+        self._counter = itertools.count()  # break ties between same deadlines
+        self._cond = Condition()
+        self._running = False
+        self._thread = None
+        self._executor = None
+        LOGGER.debug("Scheduler initied")
+
+    def every(self, interval, func, delay=0, overrun=OVERRUN.SKIP, name=None):
+        """run func every interval seconds starting after delay"""
+        job = Job(func, interval, overrun, name or func.__name__)
+        with self._cond:
+            job.deadline = time.monotonic() + max(delay, 0)
+            self._push(job)
+            self._start()
+            self._cond.notify()
+        LOGGER.debug("{!r} scheduled in {:.0f} seconds".format(job, max(delay, 0)))
+        return job
+
+    def cancel(self, job):
+        """cancel job, removed lazily from heap"""
+        with self._cond:
+            job.cancelled = True
+            self._cond.notify()
+        LOGGER.debug("{!r} cancelled".format(job))
+
+    def stop(self):
+        """stop dispatcher, running jobs are left to finish"""
+        with self._cond:
+            if not self._running:
+                return
+            self._running = False
+            self._heap.clear()
+            self._cond.notify_all()  # wake immediately
+        self._thread.join()
+        self._executor.shutdown(wait=False)
+        LOGGER.debug("Scheduler stopped")
+
+    def _start(self):
+        """start dispatcher and workers if not running"""
+        if self._running:
+            return
+        self._running = True
+        self._executor = ThreadPoolExecutor(max_workers=self.workers)
+        self._thread = LogThread(target=self._dispatch, name='scheduler')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _push(self, job):
+        heapq.heappush(self._heap, (job.deadline, next(self._counter), job))
+
+    def _dispatch(self):
+        """sleep until next deadline and submit due jobs"""
+        with self._cond:
+            while self._running:
+                while self._heap and self._heap[0][2].cancelled:
+                    heapq.heappop(self._heap)
+                if not self._heap:
+                    self._cond.wait()
+                    continue
+                deadline, _, job = self._heap[0]
+                timeout = deadline - time.monotonic()
+                if timeout > 0:
+                    self._cond.wait(timeout)
+                    continue
+                heapq.heappop(self._heap)
+                self._executor.submit(self._run, job, deadline)
+
+    def _run(self, job, deadline):
+        """run job and reschedule it"""
+        JOB_LAG.observe(max(time.monotonic() - deadline, 0), job=job.name)
+        try:
+            with JOB_SECONDS.time(job=job.name):
+                job.func()
+        except Exception as e:
+            LOGGER.exception("Exception in {!r}: {}".format(job, e))
+            SentryClient().captureException()
+        finally:
+            job.runs += 1
+            with self._cond:
+                if self._running and not job.cancelled:
+                    job.deadline = self._next_deadline(job, deadline, time.monotonic())
+                    self._push(job)
+                    self._cond.notify()
+
+    def _next_deadline(self, job, deadline, now):
+        """get next deadline applying the overrun policy"""
+        following = deadline + job.interval
+        if following > now:
+            return following
+        missed = int((now - deadline) // job.interval)
+        late_until = deadline + missed * job.interval  # last tick already due
+        if job.late_until is not None and job.late_until > deadline:  # catching up
+            job.missed += int(round((late_until - job.late_until) / job.interval))
+        else:
+            job.missed += missed
+        job.late_until = late_until
+        LOGGER.debug("%r overran %d ticks", job, missed)
+        if job.overrun == OVERRUN.CATCH_UP:
+            return following
+        elif job.overrun == OVERRUN.COALESCE:
+            return now
+        return deadline + (missed + 1) * job.interval  # keep phase
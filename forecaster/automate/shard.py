@@ -0,0 +1,262 @@
+"""
+forecaster.automate.shard
+~~~~~~~~~~~~~~
+
+Sharded execution of the automate strategy.
+The coordinator (in the bot process) starts a worker process for every
+shard, instruments are assigned to shards by a hash of their symbol so the
+open positions of an instrument are checked by the worker that trades it.
+Every worker has its own session, predicter, automaton and checkers, margin
+is reserved on a budget in shared memory. Notifications and log records go
+back to the coordinator, which sends them to the mediator and log files.
+"""
+
+import logging
+import logging.handlers
+import multiprocessing
+import signal
+import time
+import zlib
+from collections import namedtuple
+from threading import Thread, current_thread
+
+from forecaster.automate.automaton import Automaton
+from forecaster.enums import ACTIONS, EVENTS
+from forecaster.logger import QUEUED_LOGGERS
+from forecaster.patterns import Chainer, EventBus
+
+LOGGER = logging.getLogger('forecaster.automate.shard')
+
+# closed position sent back to coordinator (api objects don't pickle)
+PositionInfo = namedtuple('PositionInfo', ['id', 'instrument', 'mode', 'quantity', 'result'])
+
+
+def shard_of(symbol, count):
+    """get shard of symbol, the same in every process and run"""
+    return zlib.crc32(symbol.encode()) % count
+
+
+class Shard(object):
+    """instruments of worker index of count, budget is the shared margin"""
+
+    def __init__(self, index, count, budget=None):
+        self.index = index
+        self.count = count
+        self.budget = budget
+        self._owned = {}  # symbol: bool
+
+    def owns(self, symbol):
+        owned = self._owned.get(symbol)
+        if owned is None:
+            owned = self._owned[symbol] = shard_of(symbol, self.count) == self.index
+        return owned
+
+    def select(self, strat):
+        """get strategy restricted to currencies of shard"""
+        return dict(strat, currencies=[sym for sym in strat['currencies'] if self.owns(sym)])
+
+    def __getstate__(self):
+        return {'index': self.index, 'count': self.count, 'budget': self.budget}
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+
+class MarginBudget(object):
+    """funds and reserved margin shared by worker processes,
+    funds are read again by the first worker checking orders after ttl seconds"""
+
+    def __init__(self, context=multiprocessing):
+        self._values = context.Array('d', 4)  # total, free, reserved, time of read
+
+    def reserve(self, margins, funds_risk, read_funds, ttl):
+        """get list of allowed margins, reserved until funds are read again"""
+        values = self._values
+        with values.get_lock():
+            read_at = values[3]
+        if time.time() - read_at >= ttl:
+            total, free = read_funds()  # request to api, other workers don't wait
+            with values.get_lock():
+                if values[3] == read_at:  # first read since read_at is kept
+                    values[0], values[1], values[2], values[3] = total, free, 0.0, time.time()
+        with values.get_lock():
+            available = self._available(funds_risk)
+            allowed = []
+            for margin in margins:
+                allowed.append(margin <= available)
+                if allowed[-1]:
+                    available -= margin
+                    values[2] += margin
+        return allowed
+
+    def free(self, funds_risk):
+        """get margin left of last read"""
+        with self._values.get_lock():
+            return max(self._available(funds_risk), 0)
+
+    def _available(self, funds_risk):
+        total, free, reserved = self._values[:3]
+        return funds_risk * total - (total - free) - reserved
+
+
+class Coordinator(Chainer):
+    """automaton splitting instruments between worker processes"""
+
+    def __init__(self, strat, bot, workers):
+        super().__init__(bot)
+        self.strat = strat  # name of strategy, read (and watched) by workers
+        self.workers = workers
+        self._context = multiprocessing.get_context('spawn')  # don't fork running threads
+        self.budget = MarginBudget(self._context)
+        self.processes = []
+        self.handlers = {}  # event: handler of worker requests that differ from the bot ones
+        self._stop = None
+        self._relays = []  # (queue, thread) of events and logs
+        LOGGER.debug("COORDINATOR: ready with {} workers".format(workers))
+
+    def handle_request(self, event, **kw):
+        """handle requests from chainers"""
+        return self.pass_request(event, **kw)
+
+    def start(self):
+        """start worker processes and relays"""
+        if self._stop is not None:
+            return
+        events, logs = self._context.Queue(), self._context.Queue()
+        self._stop = self._context.Event()
+        for index in range(self.workers):
+            shard = Shard(index, self.workers, self.budget)
+            process = self._context.Process(
+                target=run_worker, name='shard-{}'.format(index),
+                args=(self.strat, shard, events, logs, self._stop))
+            process.daemon = True
+            process.start()
+            self.processes.append(process)
+        for queue, handle in ((events, self._notify), (logs, _log_record)):
+            thread = Thread(target=self._relay, args=(queue, handle), name='shard-relay')
+            thread.daemon = True
+            thread.start()
+            self._relays.append((queue, thread))
+        LOGGER.debug("COORDINATOR: started")
+
+    def stop(self, timeout=10):
+        """stop workers, they finish running jobs and write their journal"""
+        if self._stop is None:
+            return
+        self._stop.set()
+        for process in self.processes:
+            process.join(timeout)
+            if process.is_alive():
+                LOGGER.warning("{} didn't stop, terminating".format(process.name))
+                process.terminate()
+        for queue, thread in self._relays:
+            queue.put(None)
+            if thread is not current_thread():  # stop_bot can come from a relay
+                thread.join()
+        self.processes, self._relays, self._stop = [], [], None
+        LOGGER.debug("COORDINATOR: stopped")
+
+    def _relay(self, queue, handle):
+        while True:
+            item = queue.get()
+            if item is None:
+                return
+            try:
+                handle(item)
+            except Exception as e:  # a failed notification must not stop relay
+                LOGGER.warning("failed to relay {}: {!r}".format(item, e))
+
+    def _notify(self, item):
+        """dispatch request of a worker on the bot"""
+        index, event, kw = item
+        LOGGER.debug("%s from shard %d", event, index)
+        if event == EVENTS.CLOSED_POS:
+            from forecaster.handler import Client
+            Client().results += kw['pos'].result  # results of every process
+        handler = self.handlers.get(event)
+        if handler is not None:
+            return handler(**kw)
+        return self.handle_request(event, **kw)
+
+
+class ShardWorker(Chainer):
+    """head of the components of a worker process, requests not handled in
+    the process go back to the coordinator"""
+
+    def __init__(self, strat, shard, events):
+        from forecaster.handler import Client
+        from forecaster.predict import Predicter
+        super().__init__()
+        self.shard = shard
+        self.reload_job = None
+        self._events = events
+        EventBus()
+        self.client = Client(self)
+        self.client.gateway.share(shard.count)  # request rate of account is split
+        self.predict = Predicter('predict')
+        self.automate = Automaton(strat, self, shard=shard)
+        routes = {
+            ACTIONS.PREDICT: lambda args: self.predict.predict(*args),
+            ACTIONS.PREDICT_MANY: self.predict.predict_many,
+            ACTIONS.GET_BAND: lambda args: self.predict.current_band(*args),
+            ACTIONS.GET_ATR: lambda args: self.predict.current_atr(*args),
+            EVENTS.MODE_FAILURE: self.mode_failure}
+        for event, handler in routes.items():
+            EventBus().subscribe(event, handler)
+        LOGGER.debug("SHARD {}: {} currencies".format(
+            shard.index, len(self.automate.strategy['currencies'])))
+
+    def handle_request(self, request, **kw):
+        """send to coordinator, return None"""
+        if 'pos' in kw:
+            pos = kw['pos']
+            kw = dict(kw, pos=PositionInfo(
+                pos.id, pos.instrument, pos.mode, pos.quantity, pos.result))
+        self._events.put((self.shard.index, request, kw))
+
+    def mode_failure(self, account='default'):
+        LOGGER.warning("SHARD {}: mode failed to login".format(self.shard.index))
+        self.client.swap()
+
+    def start(self):
+        from forecaster.automate.scheduler import Scheduler
+        from forecaster.utils import ConfigRegistry, get_conf
+        self.client.start()
+        self.automate.start()
+        interval = get_conf()['CONFIG'].getfloat('reload_interval', fallback=10)
+        self.reload_job = Scheduler().every(  # hot reload of strategies
+            interval, ConfigRegistry().check, delay=interval, name='config')
+        LOGGER.debug("SHARD {}: started".format(self.shard.index))
+
+    def stop(self):
+        from forecaster.automate.scheduler import Scheduler
+        self.automate.stop()
+        if self.reload_job is not None:
+            self.reload_job.cancel()
+        Scheduler().stop()
+        EventBus().shutdown()
+        self.client.journal.close()  # write trades before exit
+        LOGGER.debug("SHARD {}: stopped".format(self.shard.index))
+
+
+def run_worker(strat, shard, events, logs, stop):
+    """entry point of worker processes"""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # stopped by coordinator
+    logging.getLogger().handlers = [logging.handlers.QueueHandler(logs)]
+    for name in QUEUED_LOGGERS:  # levels of other libraries are left as they are
+        logging.getLogger(name).setLevel(logging.DEBUG)
+    try:
+        worker = ShardWorker(strat, shard, events)
+        worker.start()
+    except Exception:
+        LOGGER.exception("shard {} failed to start".format(shard.index))
+        return
+    stop.wait()
+    worker.stop()
+
+
+def _log_record(record):
+    """log record of a worker with handlers of coordinator, if its level is enabled"""
+    logger = logging.getLogger(record.name)
+    if logger.isEnabledFor(record.levelno):
+        logger.handle(record)
@@ -6,7 +6,6 @@ Locals utils in automate model.
 """
 
 import logging
-import time
 from enum import Enum, auto
 from threading import Thread, Event
 
@@ -21,19 +20,6 @@ class ACTIONS(Enum):
     KEEP = auto()
 
 
-def wait_precisely(timeout, start_time, event):
-    """wait precisely timeout in relation of start time"""
-    wait(timeout - (time.time() - start_time), event)
-
-
-def wait(timeout, event):
-    """wait until loop or timeout clears"""
-    LOGGER.debug("sleeping for {} seconds".format(int(timeout)))
-    start = time.time()
-    while time.time() - start <= timeout and event.is_set():
-        time.sleep(0.1)
-
-
 class LogThread(Thread):
     """Thread class to handle errors"""
 
@@ -0,0 +1,2 @@
+from .data import Series, load_csv, load_folder, load_json
+from .engine import Backtester, Report
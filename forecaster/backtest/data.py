@@ -0,0 +1,84 @@
+"""
+forecaster.backtest.data
+~~~~~~~~~~~~~~
+
+Load historical candles from local files as arrays.
+"""
+
+import csv
+import json
+import os.path
+from collections import namedtuple
+
+import numpy as np
+
+from forecaster.enums import TIMEFRAME
+
+# timestamps are in milliseconds as returned by the API
+Series = namedtuple('Series', ['timestamp', 'open', 'high', 'low', 'close'])
+
+
+def from_candles(candles):
+    """build series from raw API candles (with 'bid') or bid candles"""
+    rows = [candle['bid'] if 'bid' in candle else candle for candle in candles]
+    return Series(
+        timestamp=np.array([int(candle['timestamp']) for candle in candles], dtype=np.int64),
+        open=np.array([row['open'] for row in rows], dtype=float),
+        high=np.array([row['high'] for row in rows], dtype=float),
+        low=np.array([row['low'] for row in rows], dtype=float),
+        close=np.array([row['close'] for row in rows], dtype=float))
+
+
+def load_csv(path):
+    """load csv with timestamp,open,high,low,close header"""
+    with open(path, 'r') as csv_file:
+        rows = list(csv.DictReader(csv_file))
+    return Series(
+        timestamp=np.array([int(row['timestamp']) for row in rows], dtype=np.int64),
+        open=np.array([row['open'] for row in rows], dtype=float),
+        high=np.array([row['high'] for row in rows], dtype=float),
+        low=np.array([row['low'] for row in rows], dtype=float),
+        close=np.array([row['close'] for row in rows], dtype=float))
+
+
+def load_json(path):
+    """load json list of candles as saved from API"""
+    with open(path, 'r') as json_file:
+        return from_candles(json.load(json_file))
+
+
+def load_folder(folder, symbols, timeframe):
+    """load SYMBOL_timeframe.csv (or .json) of every symbol in folder"""
+    data = {}
+    for symbol in symbols:
+        path = os.path.join(folder, '{}_{}'.format(symbol, timeframe))
+        if os.path.isfile(path + '.csv'):
+            data[symbol] = load_csv(path + '.csv')
+        else:
+            data[symbol] = load_json(path + '.json')
+    return data
+
+
+def resample(series, timeframe):
+    """aggregate series in candles of a bigger timeframe"""
+    period = TIMEFRAME[timeframe] * 1000
+    buckets = series.timestamp // period
+    starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+    ends = np.r_[starts[1:], len(buckets)] - 1
+    return Series(
+        timestamp=buckets[starts] * period,
+        open=series.open[starts],
+        high=np.maximum.reduceat(series.high, starts),
+        low=np.minimum.reduceat(series.low, starts),
+        close=series.close[ends])
+
+
+def align(values, source, source_timeframe, target, target_timeframe):
+    """for every candle of target get the value of last closed source candle"""
+    source_end = source.timestamp + TIMEFRAME[source_timeframe] * 1000
+    target_end = target.timestamp + TIMEFRAME[target_timeframe] * 1000
+    index = np.searchsorted(source_end, target_end, side='right') - 1
+    aligned = np.full(len(target_end), np.nan)
+    valid = index >= 0
+    aligned[valid] = values[index[valid]]
+    return aligned
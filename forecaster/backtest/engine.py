@@ -0,0 +1,234 @@
+"""
+forecaster.backtest.engine
+~~~~~~~~~~~~~~
+
+Offline backtest of automate and predict strategies.
+Predictions and checker conditions are computed over whole arrays, only
+the trades are walked one by one to simulate margin and fix_trend.
+"""
+
+import heapq
+import logging
+from collections import namedtuple
+
+import numpy as np
+
+from forecaster.backtest.data import align, resample
+from forecaster.enums import ACTIONS, TIMEFRAME
+from forecaster.predict import indicators
+from forecaster.utils import read_strategy
+
+LOGGER = logging.getLogger('forecaster.backtest')
+
+BUY, SELL = 1, -1  # direction of positions
+
+Trade = namedtuple('Trade', [
+    'symbol', 'mode', 'quantity', 'open_time', 'open_price',
+    'close_time', 'close_price', 'result', 'reason'])
+
+
+class Report(object):
+    """results of a backtest"""
+
+    def __init__(self, trades, rejected, funds):
+        self.trades = sorted(trades, key=lambda trade: trade.close_time)
+        self.rejected = rejected  # transactions refused by preserver
+        self.funds = funds
+        results = np.array([trade.result for trade in self.trades], dtype=float)
+        self.equity = funds + np.cumsum(results)
+        self.pnl = float(results.sum())
+        peaks = np.maximum.accumulate(np.r_[funds, self.equity])
+        drawdowns = peaks - np.r_[funds, self.equity]
+        self.max_drawdown = float(drawdowns.max())
+        self.max_drawdown_perc = float((drawdowns / peaks).max() * 100)
+        self.win_rate = float((results > 0).mean() * 100) if len(results) else 0.0
+
+    def summary(self):
+        """get dict of main results"""
+        return {'trades': len(self.trades), 'rejected': self.rejected, 'pnl': self.pnl,
+                'max_drawdown': self.max_drawdown,
+                'max_drawdown_perc': self.max_drawdown_perc, 'win_rate': self.win_rate}
+
+    def by_symbol(self):
+        """get pnl of every symbol"""
+        pnl = {}
+        for trade in self.trades:
+            pnl[trade.symbol] = pnl.get(trade.symbol, 0.0) + trade.result
+        return pnl
+
+
+class Backtester(object):
+    """replay historical candles through strategies of automate and predict"""
+
+    def __init__(self, strat='automate', predict='predict', funds=10000.0, fee=0.0,
+                 margin_rate=0.05):
+        self.strategy = read_strategy(strat) if isinstance(strat, str) else strat
+        predict = read_strategy(predict) if isinstance(predict, str) else predict
+        self.mult = predict['multiplier']
+        self.funds = funds
+        self.fee = fee  # fraction of traded value paid on open and on close
+        self.margin_rate = margin_rate  # fraction of traded value used as margin
+        self.checkers = self.strategy['checkers']
+
+    def run(self, data, timeframe):
+        """backtest {symbol: Series} of candles in timeframe"""
+        rounds = []
+        contexts = {}
+        for symbol, series in data.items():
+            contexts[symbol] = self._prepare(series, timeframe)
+            times = series.timestamp[contexts[symbol]['rounds']].tolist()
+            rounds.extend(zip(times, [symbol] * len(times), range(len(times))))
+        rounds.sort()
+        LOGGER.debug("backtesting {} rounds of {} symbols".format(len(rounds), len(data)))
+        return self._simulate(rounds, contexts)
+
+    def _prepare(self, series, timeframe):
+        """compute signals and checker arrays of a symbol"""
+        strat_tf = self.strategy['timeframe']
+        bars = series if strat_tf == timeframe else resample(series, strat_tf)
+        count = self.strategy['count']
+        ctx = {'rounds': np.array([], dtype=int), 'signals': np.array([], dtype=int),
+               'steps': {}}
+        if len(bars.close) > count:
+            # band of the window of completed candles before every round
+            bands = indicators.band(indicators.sliding(bars.close, count),
+                                    indicators.sliding(bars.high, count),
+                                    indicators.sliding(bars.low, count), self.mult)[:-1]
+            signals = np.where(bars.close[count - 1:-1] > bands, SELL, BUY)
+            step = max(1, int(self.strategy['sleep_transactions'] // TIMEFRAME[strat_tf]))
+            bases = np.searchsorted(series.timestamp, bars.timestamp[count:][::step])
+            valid = (bases > 0) & (bases < len(series.close))  # need a price before
+            ctx['rounds'], keep = np.unique(bases[valid], return_index=True)
+            ctx['signals'] = signals[::step][valid][keep]
+        ctx['next'] = {BUY: _next_index(ctx['signals'] == BUY),
+                       SELL: _next_index(ctx['signals'] == SELL)}
+        for name in self.checkers['activate']:
+            strat = self.checkers[name]
+            ctx['steps'][name] = max(1, int(strat['sleep'] // TIMEFRAME[timeframe]))
+            if name == 'relative':
+                ctx['atr'] = self._rolling(series, timeframe, strat['avg']['timeframe'],
+                                           strat['avg']['count'], 'atr')
+            elif name == 'reversion':
+                num = int(TIMEFRAME[strat_tf] / TIMEFRAME[strat['timeframe']]) * count
+                ctx['band'] = self._rolling(series, timeframe, strat['timeframe'], num, 'band')
+        self._exits(ctx, series)
+        self._results(ctx, series)
+        return ctx
+
+    def _rolling(self, series, timeframe, source_tf, window, kind):
+        """indicator over last closed candles of source_tf for every candle"""
+        source = series if source_tf == timeframe else resample(series, source_tf)
+        values = np.full(len(source.close), np.nan)
+        if len(source.close) >= window:
+            high = indicators.sliding(source.high, window)
+            low = indicators.sliding(source.low, window)
+            if kind == 'atr':
+                values[window - 1:] = indicators.average_true_range(high, low)
+            else:
+                close = indicators.sliding(source.close, window)
+                values[window - 1:] = indicators.band(close, high, low, self.mult)
+        return align(values, source, source_tf, series, timeframe)
+
+    def _simulate(self, rounds, contexts):
+        """walk rounds in time order applying preserver"""
+        funds_risk = self.strategy['preserver']['funds_risk']
+        trades = []
+        opened = []  # heap of (close_time, margin, result) of open trades
+        used = 0.0  # margin used by open trades
+        realized = 0.0
+        rejected = 0
+        for now, symbol, num in rounds:
+            while opened and opened[0][0] <= now:
+                _, margin, result = heapq.heappop(opened)
+                used -= margin
+                realized += result
+            ctx = contexts[symbol]
+            margin = ctx['margin'][num]
+            if margin > funds_risk * (self.funds + realized) - used:
+                rejected += 1
+                continue
+            trade = Trade(symbol, *ctx['trades'][num])
+            trades.append(trade)
+            heapq.heappush(opened, (trade.close_time, margin, trade.result))
+            used += margin
+        return Report(trades, rejected, self.funds)
+
+    def _exits(self, ctx, series):
+        """compute closing candle of the position of every round"""
+        rounds = ctx['rounds']
+        num = len(series.close)
+        ctx['price'] = series.close[rounds - 1]  # last close before round
+        ctx['exit'] = np.full(len(rounds), num - 1)
+        ctx['reason'] = np.full(len(rounds), 'end', dtype=object)
+        if self.strategy['fix_trend']:  # closed by next opposite prediction
+            following = np.where(ctx['signals'] == BUY, ctx['next'][SELL], ctx['next'][BUY])
+            fixed = following < len(rounds)
+            ctx['exit'][fixed] = rounds[following[fixed]] - 1
+            ctx['reason'][fixed] = 'fix_trend'
+        pending = np.flatnonzero(rounds < ctx['exit'])
+        offset = 0
+        size = 64
+        while len(pending) and self.checkers['activate']:
+            # scan the next chunk of candles of all pending positions together
+            size = min(size, max(16, 2 ** 22 // len(pending)))
+            index = rounds[pending, None] + offset + np.arange(size)
+            valid = index < ctx['exit'][pending, None]
+            index = np.minimum(index, num - 1)
+            first = np.full(len(pending), size)
+            names = np.full(len(pending), None, dtype=object)
+            for name in self.checkers['activate']:
+                mask = self._mask(name, ctx, series, pending, index) & valid
+                hits = np.where(mask.any(axis=1), mask.argmax(axis=1), size)
+                better = hits < first
+                first[better] = hits[better]
+                names[better] = name
+            closed = first < size
+            ctx['exit'][pending[closed]] = index[closed, first[closed]]
+            ctx['reason'][pending[closed]] = names[closed]
+            pending = pending[~closed & valid[:, -1]]
+            offset += size
+            size *= 2
+
+    def _mask(self, name, ctx, series, pending, index):
+        """candles where checker closes the positions, as (positions x candles)"""
+        strat = self.checkers[name]
+        price = ctx['price'][pending, None]
+        direction = ctx['signals'][pending, None]
+        current = series.close[index]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            if name == 'fixed':
+                profit = (current - price) * self.strategy['fixed_quantity'] * direction
+                mask = (profit >= strat['gain']) | (profit <= strat['loss'])
+            elif name == 'relative':
+                diff = price - ctx['atr'][index]
+                fav_price = price + diff * strat['gain']
+                unfav_price = price - diff * strat['loss']
+                progress = -(fav_price - current) / (fav_price - price) + 1
+                unprogress = -(unfav_price - current) / (unfav_price - price) + 1
+                mask = (progress >= 1) | (unprogress >= 1)
+            else:
+                band = ctx['band'][index]
+                mask = np.where(direction == BUY, current >= band, current <= band)
+        # checker runs once every 'sleep' seconds
+        return mask & (index % ctx['steps'][name] == 0)
+
+    def _results(self, ctx, series):
+        """compute trades of every round as lists (fast access in simulation)"""
+        quantity = self.strategy['fixed_quantity']
+        exit_price = series.close[ctx['exit']]
+        fees = self.fee * (ctx['price'] + exit_price) * quantity
+        result = (exit_price - ctx['price']) * quantity * ctx['signals'] - fees
+        modes = np.where(ctx['signals'] == BUY, ACTIONS.BUY.value, ACTIONS.SELL.value)
+        ctx['margin'] = (ctx['price'] * quantity * self.margin_rate).tolist()
+        ctx['trades'] = list(zip(
+            modes.tolist(), [quantity] * len(result), series.timestamp[ctx['rounds']].tolist(),
+            ctx['price'].tolist(), series.timestamp[ctx['exit']].tolist(),
+            exit_price.tolist(), result.tolist(), ctx['reason'].tolist()))
+
+
+def _next_index(mask):
+    """for every index get the next greater index where mask is true"""
+    size = len(mask)
+    indexes = np.where(mask, np.arange(size), size)
+    following = np.minimum.accumulate(indexes[::-1])[::-1]
+    return np.r_[following[1:], size]
@@ -0,0 +1 @@
+from .suite import BENCHMARKS, compare, run
@@ -0,0 +1,123 @@
+"""
+forecaster.bench.market
+~~~~~~~~~~~~~~
+
+Synthetic market data for benchmarks.
+SyntheticAPI answers like trading212api.Client without network, for any
+number of symbols and positions.
+"""
+
+import time
+from threading import Lock
+
+import numpy as np
+
+from forecaster.enums import TIMEFRAME
+from forecaster.handler.snapshot import SafeAccount
+
+
+class MarketGenerator(object):
+    """random walk candles of many symbols"""
+
+    def __init__(self, num_symbols, length=500, seed=0):
+        self.symbols = ['SYM{:05d}'.format(num) for num in range(num_symbols)]
+        self.length = length
+        rng = np.random.default_rng(seed)
+        steps = rng.normal(0, 0.002, (num_symbols, length))
+        self.close = 1.0 + rng.random((num_symbols, 1)) * np.exp(np.cumsum(steps, axis=1))
+        self.open = np.concatenate([self.close[:, :1], self.close[:, :-1]], axis=1)
+        spread = np.abs(rng.normal(0, 0.001, (2, num_symbols, length)))
+        self.high = np.maximum(self.open, self.close) * (1 + spread[0])
+        self.low = np.minimum(self.open, self.close) * (1 - spread[1])
+        self._index = {sym: num for num, sym in enumerate(self.symbols)}
+
+    def candles(self, symbol, num, timeframe):
+        """get last num raw candles of symbol ending with current one"""
+        row = self._index[symbol]
+        num = min(num, self.length)
+        period = TIMEFRAME[timeframe]
+        now = int(time.time() // period) * period
+        start = self.length - num
+        return [{'timestamp': (now - period * (num - 1 - i)) * 1000,
+                 'bid': {'open': float(self.open[row, start + i]),
+                         'high': float(self.high[row, start + i]),
+                         'low': float(self.low[row, start + i]),
+                         'close': float(self.close[row, start + i])}}
+                for i in range(num)]
+
+    def bid_candles(self, symbol, num):
+        """get last num candles as returned by Client.get_last_candles"""
+        return [candle['bid'] for candle in self.candles(symbol, num, '1h')]
+
+    def last_price(self, symbol):
+        return float(self.close[self._index[symbol], -1])
+
+    def raw_positions(self, num_positions, quantity=1000, seed=0):
+        """raw positions as returned by the API spread over symbols"""
+        rng = np.random.default_rng(seed)
+        positions = []
+        for num in range(num_positions):
+            symbol = self.symbols[num % len(self.symbols)]
+            current = self.last_price(symbol)
+            price = current * (1 + rng.normal(0, 0.002))
+            side = 1 if rng.random() < 0.5 else -1
+            positions.append({
+                'positionId': str(num), 'averagePrice': price, 'currentPrice': current,
+                'code': symbol, 'quantity': side * quantity, 'margin': price * quantity / 20,
+                'ppl': (current - price) * quantity * side})
+        return positions
+
+
+class SyntheticAPI(object):
+    """stand-in of trading212api.Client served by MarketGenerator"""
+
+    def __init__(self, market, num_positions=0, mode='demo'):
+        self.market = market
+        self.mode = mode
+        self.account = SafeAccount(mode)
+        self._raw_positions = market.raw_positions(num_positions)
+        self.account.update(self._raw_account())
+        self.positions = self.account.positions
+        self.calls = 0
+        self._lock = Lock()
+
+    def login(self, username, password):
+        self.calls += 1
+
+    def refresh(self):
+        self.calls += 1
+        self.account.update(self._raw_account())
+
+    def get_historical_data(self, instrum, num, time_span):
+        self.calls += 1
+        return self.market.candles(instrum, num, time_span)
+
+    def open_position(self, mode, instrum, quantity):
+        self.calls += 1
+        price = self.market.last_price(instrum)
+        side = 1 if mode == 'buy' else -1
+        with self._lock:
+            self._raw_positions.append({
+                'positionId': 'new{}'.format(len(self._raw_positions)), 'averagePrice': price,
+                'currentPrice': price, 'code': instrum, 'quantity': side * quantity,
+                'margin': price * quantity / 20, 'ppl': 0.0})
+            self.account.update(self._raw_account())
+
+    def close_position(self, pos_id):
+        self.calls += 1
+        if pos_id not in [pos.id for pos in self.account.positions]:
+            raise ValueError("Position not found")
+        with self._lock:
+            self._raw_positions = [raw for raw in self._raw_positions
+                                   if raw['positionId'] != pos_id]
+            self.account.update(self._raw_account())
+
+    def get_margin(self, instrum, quantity):
+        self.calls += 1
+        return self.market.last_price(instrum) * quantity / 20
+
+    def _raw_account(self):
+        margin = sum(raw['margin'] for raw in self._raw_positions)
+        return {'id': 1, 'positions': self._raw_positions,
+                'cash': {'free': 1e9 - margin, 'total': 1e9,
+                         'ppl': sum(raw['ppl'] for raw in self._raw_positions)}}
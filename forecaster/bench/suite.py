@@ -0,0 +1,202 @@
+"""
+forecaster.bench.suite
+~~~~~~~~~~~~~~
+
+Benchmarks of the hot paths of a tick on synthetic market data.
+"""
+
+import logging
+import os.path
+import platform
+import statistics
+import tempfile
+import time
+from collections import OrderedDict
+from types import SimpleNamespace
+
+from forecaster.__version__ import __version__
+from forecaster.automate.automaton import Automaton
+from forecaster.automate.checkers import (FactoryChecker, FixedChecker, RelativeChecker,
+                                          ReversionChecker)
+from forecaster.bench.market import MarketGenerator, SyntheticAPI
+from forecaster.enums import ACTIONS
+from forecaster.handler import Client
+from forecaster.handler.gateway import Gateway
+from forecaster.handler.journal import TradeJournal
+from forecaster.patterns import Chainer
+from forecaster.predict import Predicter
+from forecaster.predict.utils import AverageTrueRange
+
+LOGGER = logging.getLogger('forecaster.bench')
+
+BENCHMARKS = OrderedDict()
+
+STRATEGY = {
+    'count': 5, 'fix_trend': True, 'fixed_quantity': 1000, 'overrun': 'skip',
+    'sleep_transactions': 3600, 'timeframe': '1h', 'workers': 4,
+    'preserver': {'funds_risk': 0.5},
+    'checkers': {
+        'activate': ['relative', 'reversion', 'fixed'],
+        'relative': {'sleep': 600, 'overrun': 'coalesce', 'gain': 0.005, 'loss': 0.005,
+                     'avg': {'timeframe': '1h', 'count': 5}},
+        'reversion': {'sleep': 60, 'overrun': 'coalesce', 'timeframe': '1h'},
+        'fixed': {'sleep': 60, 'overrun': 'coalesce', 'gain': 20, 'loss': -5}}}
+
+
+def benchmark(name):
+    """register benchmark, func(env) returns (before, run) callables"""
+    def decorator(func):
+        BENCHMARKS[name] = func
+        return func
+    return decorator
+
+
+class Environment(object):
+    """synthetic market installed in Client"""
+
+    def __init__(self, num_symbols, num_positions, seed=0):
+        self.market = MarketGenerator(num_symbols, seed=seed)
+        self.num_positions = num_positions
+        self.strategy = dict(STRATEGY, currencies=self.market.symbols)
+        self.predicter = Predicter({'multiplier': 2})
+        self.chain = BenchChain(self.predicter)
+        # synthetic trades don't go in the journal of the bot
+        self.journal = TradeJournal(os.path.join(tempfile.mkdtemp(), 'journal.db'))
+        self.reset()
+
+    def reset(self):
+        """install a new synthetic api in Client"""
+        client = Client()
+        client.api = SyntheticAPI(self.market, self.num_positions)
+        client.journal = self.journal
+        client.gateway = Gateway(rate=None, concurrency=16)  # measure code, not rate limit
+        client.candles.clear()
+        client.freshness.invalidate()
+        client.snapshots.invalidate()
+
+    def windows(self):
+        return [self.market.bid_candles(sym, self.strategy['count'])
+                for sym in self.market.symbols]
+
+    def checker(self, cls):
+        name = next(key for key, value in FactoryChecker.items() if value is cls)
+        positioner = SimpleNamespace(  # actions of checkers are not executed
+            auto_strategy=self.strategy, handle_request=self.chain.handle_request)
+        return cls(self.strategy['checkers'][name], positioner)
+
+
+class BenchChain(Chainer):
+    """head of chain answering predictions like Bot"""
+
+    def __init__(self, predicter):
+        super().__init__()
+        self.predict = predicter
+
+    def handle_request(self, request, **kw):
+        if request == ACTIONS.PREDICT:
+            return self.predict.predict(*kw['args'])
+        elif request == ACTIONS.PREDICT_MANY:
+            return self.predict.predict_many(kw['candles'])
+        elif request == ACTIONS.GET_BAND:
+            return self.predict.current_band(*kw['args'])
+        elif request == ACTIONS.GET_ATR:
+            return self.predict.current_atr(*kw['args'])
+
+
+@benchmark('atr')
+def bench_atr(env):
+    windows = env.windows()
+    return None, lambda: [AverageTrueRange(candles) for candles in windows]
+
+
+@benchmark('get_band')
+def bench_get_band(env):
+    windows = env.windows()
+    meanrev = env.predicter.MeanReversion
+    return None, lambda: [meanrev.get_band(candles) for candles in windows]
+
+
+@benchmark('get_bands')
+def bench_get_bands(env):
+    windows = env.windows()
+    return None, lambda: env.predicter.MeanReversion.get_bands(windows)
+
+
+@benchmark('predict')
+def bench_predict(env):
+    windows = env.windows()
+    meanrev = env.predicter.MeanReversion
+    return None, lambda: [meanrev.predict(candles) for candles in windows]
+
+
+def _bench_check(cls):
+    def bench(env):
+        checker = env.checker(cls)
+        positions = Client().snapshot().positions
+        return None, lambda: [checker.check(pos) for pos in positions]
+    return bench
+
+
+BENCHMARKS['check_relative'] = _bench_check(RelativeChecker)
+BENCHMARKS['check_reversion'] = _bench_check(ReversionChecker)
+BENCHMARKS['check_fixed'] = _bench_check(FixedChecker)
+
+
+@benchmark('transaction_round')
+def bench_transaction_round(env):
+    automaton = Automaton(env.strategy, env.chain)
+    return env.reset, automaton.complete_round
+
+
+@benchmark('checker_sweep')
+def bench_checker_sweep(env):
+    checkers = [env.checker(cls) for cls in (RelativeChecker, ReversionChecker, FixedChecker)]
+
+    def sweep():
+        for checker in checkers:
+            checker.sweep()
+    return Client().snapshots.invalidate, sweep
+
+
+def run(num_symbols=200, num_positions=200, repeat=5, only=None):
+    """run benchmarks and return machine-readable results"""
+    env = Environment(num_symbols, num_positions)
+    results = OrderedDict()
+    for name, bench in BENCHMARKS.items():
+        if only and name not in only:
+            continue
+        env.reset()
+        before, func = bench(env)
+        timings = []
+        for _ in range(repeat):
+            if before is not None:
+                before()
+            start = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - start)
+        results[name] = {'min': min(timings), 'median': statistics.median(timings),
+                         'mean': statistics.mean(timings), 'repeat': repeat}
+        LOGGER.debug("benchmark {}: {:.6f}s".format(name, results[name]['median']))
+    return {'meta': {'version': __version__, 'python': platform.python_version(),
+                     'symbols': num_symbols, 'positions': num_positions,
+                     'time': time.time()},
+            'results': results}
+
+
+def compare(current, baseline, tolerance=0.1):
+    """compare medians with baseline, return {name: comparison}"""
+    comparison = OrderedDict()
+    for name, result in current['results'].items():
+        if name not in baseline['results']:
+            continue
+        old = baseline['results'][name]['median']
+        change = (result['median'] - old) / old if old else 0.0
+        if change > tolerance:
+            status = 'slower'
+        elif change < -tolerance:
+            status = 'faster'
+        else:
+            status = 'same'
+        comparison[name] = {'baseline': old, 'current': result['median'],
+                            'change': change, 'status': status}
+    return comparison
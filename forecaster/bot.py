@@ -11,14 +11,12 @@ The Bot Client class.
 import logging
 import os
 import signal
+import time
+from concurrent.futures import ThreadPoolExecutor
 
-from forecaster.automate import Automaton
-from forecaster.automate.utils import ThreadHandler
 from forecaster.enums import ACTIONS, EVENTS
-from forecaster.handler import Client, SentryClient
-from forecaster.mediate import Mediator
-from forecaster.patterns import Chainer
-from forecaster.predict import Predicter
+from forecaster.logger import setup_logging
+from forecaster.patterns import Chainer, EventBus
 
 LOGGER = logging.getLogger('forecaster.bot')
 
@@ -28,55 +26,191 @@ class Bot(Chainer):
 
     def __init__(self, strat='default'):
         super().__init__()
-        # LEVEL ZERO - access to apis and track errors
-        self.sentry = SentryClient()
-        self.client = Client(self)
-        self.mediate = Mediator(self)
-        # LEVEL ONE - algorithmic core
-        self.predict = Predicter('predict')
-        # LEVEL TWO - automation
-        self.automate = Automaton('automate', self)
+        setup_logging()
+        EventBus()  # built before components dispatch from other threads
+        self.startup = {}  # seconds spent by every step
+        self.reload_job = None  # polling of modified config files
+        self.metrics_server = None  # local /metrics endpoint
+        start = time.monotonic()
+        # LEVEL ZERO - access to apis, first as Client() of other components is this one
+        self.client = self._timed('client', self._make_client)
+        # independent components are imported and built concurrently
+        steps = [
+            # LEVEL ZERO - track errors
+            ('sentry', self._make_sentry), ('mediate', self._make_mediate),
+            # LEVEL ONE - algorithmic core
+            ('predict', self._make_predict),
+            # LEVEL TWO - automation
+            ('automate', self._make_automate)]
+        with ThreadPoolExecutor(max_workers=len(steps)) as executor:
+            futures = [(name, executor.submit(self._timed, name, step)) for name, step in steps]
+            for name, future in futures:
+                setattr(self, name, future.result())
+        self.accounts = self._make_accounts()  # {name: automaton} of other accounts
+        self._register_routes()
+        LOGGER.debug("BOT: initied in {:.3f}s ({})".format(
+            time.monotonic() - start, ", ".join(
+                "{} {:.3f}s".format(name, secs) for name, secs in self.startup.items())))
+
+    def _timed(self, name, step):
+        start = time.monotonic()
+        result = step()
+        self.startup[name] = time.monotonic() - start
+        return result
+
+    def _make_sentry(self):
+        from forecaster.handler import SentryClient
+        return SentryClient()
+
+    def _make_client(self):
+        from forecaster.handler import Client
+        return Client(self)
+
+    def _make_mediate(self):
+        from forecaster.mediate import Mediator
+        return Mediator(self)
+
+    def _make_predict(self):
+        from forecaster.predict import Predicter
+        return Predicter('predict')
+
+    def _make_automate(self):
+        from forecaster.automate import Automaton, Coordinator
+        from forecaster.utils import get_conf
+        conf = get_conf()
+        workers = conf['SHARDS'].getint('workers', fallback=0) if conf.has_section('SHARDS') else 0
+        if workers > 1:  # instruments traded by worker processes
+            return Coordinator('automate', self, workers)
+        return Automaton('automate', self)
+
+    def _make_accounts(self):
+        """clients and automatons of the other accounts in config, market data
+        of their clients is the one of the default client"""
+        from forecaster.automate import Automaton
+        from forecaster.handler import Client
+        from forecaster.utils import get_conf
+        conf = get_conf()
+        accounts = {}
+        if not conf.has_section('ACCOUNTS'):
+            return accounts
+        for name, value in conf['ACCOUNTS'].items():
+            mode, _, strat = (x.strip() for x in value.partition(','))
+            client = Client(self, name=name, mode=mode)
+            accounts[name] = Automaton(strat or 'automate', self, client)
+        LOGGER.debug("BOT: {} other accounts".format(len(accounts)))
+        return accounts
 
     def handle_request(self, request, **kw):
         """handle requests from chainers"""
-        # start the bot
-        if request == ACTIONS.START_BOT:
-            self.start_bot()
-        # stop the bot
-        elif request == ACTIONS.STOP_BOT:
-            self.stop_bot()
-        # shutdown the foreground
-        elif request == ACTIONS.SHUTDOWN:
-            self.stop()
-        # predict
-        elif request == ACTIONS.PREDICT:
-            return self.predict.predict(*kw['args'])
-        # notify handler
-        elif request == ACTIONS.CHANGE_MODE:
-            return self.echo_request(self.client, request, **kw)
-        # swap mode
-        elif request == EVENTS.MODE_FAILURE:
-            self.echo_request(self.mediate, EVENTS.MODE_FAILURE)
+        return EventBus().dispatch(request, **kw)
+
+    def _register_routes(self):
+        """fill dispatch table of the event bus, requests reach handlers directly"""
+        bus = EventBus()
+        bus.clear()
+        routes = {
+            ACTIONS.START_BOT: self.start_bot,
+            ACTIONS.STOP_BOT: self.stop_bot,
+            ACTIONS.SHUTDOWN: self.stop,
+            # predict
+            ACTIONS.PREDICT: self._predict,
+            ACTIONS.PREDICT_MANY: self.predict.predict_many,
+            ACTIONS.GET_BAND: self._get_band,
+            ACTIONS.GET_ATR: self._get_atr,
+            # handler
+            ACTIONS.CHANGE_MODE: self.client.change_mode,
+            EVENTS.MODE_FAILURE: self.mode_failure,
+            EVENTS.CONNECTION_ERROR: self.connection_error}
+        for event, handler in routes.items():
+            bus.subscribe(event, handler)
+        # notifications of mediator
+        for event in (EVENTS.MISSING_DATA, EVENTS.CLOSED_POS, EVENTS.CLOSED_ALL,
+                      EVENTS.MARKET_CLOSED):
+            handler, mode = self.mediate.routes[event]
+            bus.subscribe(event, handler, mode)
+        if hasattr(self.automate, 'handlers'):  # requests of workers have nothing to raise to
+            self.automate.handlers.update({
+                EVENTS.CONNECTION_ERROR: self.stop_for_error,
+                EVENTS.MISSING_DATA: self.mediate.need_conf})
+
+    def _predict(self, args):
+        return self.predict.predict(*args)
+
+    def _get_band(self, args):
+        return self.predict.current_band(*args)
+
+    def _get_atr(self, args):
+        return self.predict.current_atr(*args)
+
+    def mode_failure(self, account='default'):
+        """notify and swap mode"""
+        self.mediate.mode_failure()
+        if account in self.accounts:
+            self.accounts[account].client.swap()
+        else:
             self.client.swap()
-        # notify mediator
-        elif request in (EVENTS.MISSING_DATA, EVENTS.CLOSED_POS, EVENTS.MARKET_CLOSED):
-            self.echo_request(self.mediate, request, **kw)
-        # connection error
-        elif request == EVENTS.CONNECTION_ERROR:
-            self.echo_request(self.mediate, request)
-            self.handle_request(ACTIONS.STOP_BOT)
-            self.mediate.log("Bot stopped")
-            raise
+
+    def connection_error(self):
+        """notify and stop, raised again to the request that failed"""
+        self.stop_for_error()
+        raise
+
+    def stop_for_error(self):
+        """notify connection error and stop"""
+        self.mediate.connection_error()
+        self.stop_bot()
+        self.mediate.log("Bot stopped")
 
     def start(self):
         """start cycle"""
         # first level: interface for receiving commands
         self.mediate.start()
+        self._start_metrics()
+        self._add_profiling_signals()
         LOGGER.debug("BOT: ready")
 
+    def _add_profiling_signals(self):
+        """SIGUSR1 toggles cpu profiler, SIGUSR2 memory tracing (reports in logs)"""
+        from forecaster.profiling import Profiler
+        if not hasattr(signal, 'SIGUSR1'):  # not on windows
+            return
+
+        def toggle(toggler):
+            def handler(signum, frame):
+                path, text = toggler()
+                LOGGER.info("BOT: {}".format(text if path is None else path))
+            return handler
+
+        signal.signal(signal.SIGUSR1, toggle(Profiler().toggle_cpu))
+        signal.signal(signal.SIGUSR2, toggle(Profiler().toggle_memory))
+
+    def _start_metrics(self):
+        """serve metrics on local port if enabled"""
+        from forecaster.metrics import MetricsServer
+        from forecaster.utils import get_conf
+        conf = get_conf()
+        if not conf.has_section('METRICS') or not conf['METRICS'].getboolean('enabled'):
+            return
+        self.metrics_server = MetricsServer(
+            conf['METRICS'].get('host', fallback='127.0.0.1'),
+            conf['METRICS'].getint('port', fallback=9100))
+        try:
+            self.metrics_server.start()
+        except OSError as e:  # port in use, the bot works without it
+            LOGGER.error("BOT: failed to serve metrics: {}".format(e))
+            self.metrics_server = None
+
     def stop(self):
+        from forecaster.automate.scheduler import Scheduler
+        from forecaster.automate.utils import ThreadHandler
         self.automate.stop()
+        for automaton in self.accounts.values():
+            automaton.stop()
         self.mediate.stop()
+        if self.metrics_server is not None:
+            self.metrics_server.stop()
+        Scheduler().stop()
+        EventBus().shutdown(wait=False)
         ThreadHandler().stop_all()
         LOGGER.debug("BOT: shutted down")
         os.kill(os.getpid(), signal.SIGINT)
@@ -87,10 +221,28 @@ class Bot(Chainer):
 
     def start_bot(self):
         """start bot cycle"""
+        from forecaster.automate.scheduler import Scheduler
+        from forecaster.utils import ConfigRegistry, get_conf
+        from forecaster.exceptions import MissingData
         self.client.start()
         self.automate.start()
+        for name, automaton in self.accounts.items():
+            try:
+                automaton.client.start()
+            except MissingData:  # other accounts keep trading
+                LOGGER.error("BOT: account {} not started".format(name))
+                continue
+            automaton.start()
+        interval = get_conf()['CONFIG'].getfloat('reload_interval', fallback=10)
+        self.reload_job = Scheduler().every(  # hot reload of strategies
+            interval, ConfigRegistry().check, delay=interval, name='config')
         LOGGER.debug("BOT: started")
 
     def stop_bot(self):
         self.automate.stop()
+        for automaton in self.accounts.values():
+            automaton.stop()
+        if self.reload_job is not None:
+            self.reload_job.cancel()
+            self.reload_job = None
         LOGGER.debug("BOT: stopped")
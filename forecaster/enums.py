@@ -12,6 +12,7 @@ class EVENTS(Enum):
     MISSING_DATA = auto()
     MODE_FAILURE = auto()
     CLOSED_POS = auto()
+    CLOSED_ALL = auto()
     MARKET_CLOSED = auto()
     CONNECTION_ERROR = auto()
 
@@ -21,6 +22,9 @@ class ACTIONS(Enum):
     STOP_BOT = auto()
     SHUTDOWN = auto()
     PREDICT = auto()
+    PREDICT_MANY = auto()
+    GET_BAND = auto()
+    GET_ATR = auto()
     CHANGE_MODE = auto()
     BUY = 'buy'
     SELL = 'sell'
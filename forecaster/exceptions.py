@@ -24,3 +24,11 @@ class MissingToken(Exception):
         msg = "tokens not found in environment variables, please run setup.sh first."
         logger.error(msg)
         super().__init__(msg)
+
+
+class CircuitOpen(Exception):
+    def __init__(self, name):
+        self.name = name
+        msg = "circuit {} open, request refused".format(name)
+        logger.warning(msg)
+        super().__init__(msg)
@@ -0,0 +1,8 @@
+from .aio import AsyncClient
+from .cache import CandleCache
+from .client import Client, CloseResult, SentryClient
+from .gateway import LANE, Gateway
+from .journal import TradeJournal
+from .replay import RecordingSession, ReplaySession
+from .retry import Backoff, CircuitBreaker, RetryPolicy
+from .snapshot import AccountSnapshot, SnapshotService
@@ -0,0 +1,112 @@
+"""
+forecaster.handler.aio
+~~~~~~~~~~~~~~
+
+Asyncio client sharing session, cache and snapshots of Client.
+trading212api is blocking, so every request runs on a bounded pool of
+threads, while waits between retries are asyncio sleeps that don't hold
+a thread. Orders are futures resolved on confirmation.
+"""
+
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from forecaster.handler.client import Client
+from forecaster.utils import get_conf
+
+LOGGER = logging.getLogger('forecaster.handler.aio')
+
+
+class AsyncClient(object):
+    """coroutine interface of Client"""
+
+    def __init__(self, client=None, workers=None):
+        self.client = client if client is not None else Client()
+        if workers is None:
+            workers = get_conf()['HANDLER'].getint('async_workers', fallback=16)
+        self.workers = workers
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        self.in_flight = 0  # orders submitted and not yet confirmed
+        LOGGER.debug("ASYNC CLIENT: initied with {} workers".format(workers))
+
+    async def run(self, func, *args):
+        """run blocking func in the pool of workers"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, func, *args)
+
+    async def refresh(self):
+        """refresh the session"""
+        await self.run(self.client.refresh)
+
+    async def snapshot(self):
+        """get shared snapshot of account and positions"""
+        return await self.run(self.client.snapshot)
+
+    async def get_last_candles(self, symbol, num, timeframe):
+        """get last candles"""
+        return await self.run(self.client.get_last_candles, symbol, num, timeframe)
+
+    async def get_margin(self, symbol, quantity):
+        """get margin"""
+        return await self.run(self.client.get_margin, symbol, quantity)
+
+    async def open_pos(self, symbol, mode, quantity):
+        """open position, retrying without holding a thread, return error or None"""
+        await self.refresh()  # renovate sessions
+        error = await self._retry(
+            'open {}'.format(symbol), self.client.try_open, symbol, mode, quantity)
+        if error is not None:
+            LOGGER.error("failed to open position on {}: {!r}".format(symbol, error))
+        return error
+
+    async def close_pos(self, pos, reason=None):
+        """close position, retrying without holding a thread, return error or None"""
+        await self.refresh()  # renovate sessions
+        error = await self._retry(
+            'close {}'.format(pos.id), self.client.try_close, pos, True, reason)
+        if error is not None:
+            LOGGER.error("failed to close position {}: {!r}".format(pos.id, error))
+        return error
+
+    def submit_open(self, symbol, mode, quantity):
+        """schedule opening of position, return future resolved on confirmation"""
+        return self._submit(self.open_pos(symbol, mode, quantity))
+
+    def submit_close(self, pos, reason=None):
+        """schedule closing of position, return future resolved on confirmation"""
+        return self._submit(self.close_pos(pos, reason))
+
+    async def close_all(self):
+        """close all positions concurrently"""
+        snapshot = await self.snapshot()
+        await asyncio.gather(*[self.submit_close(pos, 'close_all')
+                               for pos in snapshot.positions])
+
+    def shutdown(self, wait=True):
+        """release the pool of workers"""
+        self.executor.shutdown(wait=wait)
+
+    async def _retry(self, name, attempt, *args):
+        """repeat attempt while it returns an error allowed by retry policy,
+        return last error or None"""
+        retry = self.client.retry_policy.start(name)
+        while True:
+            error = await self.run(attempt, *args)
+            if error is None:
+                return None
+            delay = retry.next_delay(error)
+            if delay is None:
+                return error
+            await asyncio.sleep(delay)
+
+    def _submit(self, coro):
+        future = asyncio.ensure_future(coro)
+        self.in_flight += 1
+        future.add_done_callback(self._done)
+        return future
+
+    def _done(self, future):
+        self.in_flight -= 1
+        if not future.cancelled() and future.exception() is not None:
+            LOGGER.error("order failed: {}".format(future.exception()))
@@ -0,0 +1,106 @@
+"""
+forecaster.handler.cache
+~~~~~~~~~~~~~~
+
+Bounded in-memory cache of historical candles.
+Every (symbol, timeframe) keeps a ring buffer of raw candles and only the
+candles newer than the last cached one are requested to the API.
+"""
+
+import logging
+import time
+from collections import OrderedDict, deque
+from threading import Lock
+
+from forecaster.enums import TIMEFRAME
+
+LOGGER = logging.getLogger('forecaster.handler.cache')
+
+
+class CandleCache(object):
+    """ring buffers of candles keyed by (symbol, timeframe) with LRU eviction"""
+
+    def __init__(self, fetch, max_keys=64, max_candles=500):
+        self.fetch = fetch  # fetch(symbol, num, timeframe) -> raw candles
+        self.max_keys = max_keys
+        self.max_candles = max_candles
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._buffers = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, symbol, num, timeframe):
+        """get last num raw candles, downloading only the missing ones"""
+        key = (symbol, timeframe)
+        with self._lock:
+            buffer = self._buffers.get(key)
+            if buffer is not None:
+                self._buffers.move_to_end(key)  # mark as recently used
+                missing = self._missing(buffer, num, timeframe)
+            else:
+                missing = None
+        if missing is not None:  # download only the newest candles
+            candles = self.fetch(symbol, missing, timeframe)
+            with self._lock:
+                if self._merge(buffer, candles):
+                    self.hits += 1
+                    return list(buffer)[-num:]
+            LOGGER.debug("gap found in cache of %s %s", *key)
+        candles = self.fetch(symbol, num, timeframe)  # download the whole window
+        with self._lock:
+            self.misses += 1
+            return list(self._store(key, candles, num))[-num:]
+
+    def last_timestamp(self, symbol, timeframe):
+        """get timestamp (in seconds) of last cached candle or None"""
+        with self._lock:
+            buffer = self._buffers.get((symbol, timeframe))
+            if not buffer:
+                return None
+            return int(buffer[-1]['timestamp']) / 1000
+
+    def clear(self):
+        """drop every buffer"""
+        with self._lock:
+            self._buffers.clear()
+
+    def stats(self):
+        """get counters of cache usage"""
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses,
+                    'evictions': self.evictions, 'keys': len(self._buffers)}
+
+    def _missing(self, buffer, num, timeframe):
+        """get number of candles to download or None if a full fetch is needed"""
+        if len(buffer) < num or timeframe not in TIMEFRAME:
+            return None
+        elapsed = time.time() - int(buffer[-1]['timestamp']) / 1000
+        # the last cached candle could be still forming, so download it again
+        missing = max(int(elapsed // TIMEFRAME[timeframe]), 0) + 1
+        if missing >= num:
+            return None
+        return missing
+
+    def _merge(self, buffer, candles):
+        """merge new candles in buffer, return False if they don't overlap"""
+        if not candles:
+            return True
+        first = int(candles[0]['timestamp'])
+        if first > int(buffer[-1]['timestamp']):
+            return False
+        while buffer and int(buffer[-1]['timestamp']) >= first:
+            buffer.pop()  # replace candles that could have changed
+        buffer.extend(candles)
+        return True
+
+    def _store(self, key, candles, num):
+        """replace buffer of key and evict least recently used"""
+        buffer = deque(candles, maxlen=max(self.max_candles, num))
+        self._buffers[key] = buffer
+        self._buffers.move_to_end(key)
+        while len(self._buffers) > self.max_keys:
+            old_key, _ = self._buffers.popitem(last=False)
+            self.evictions += 1
+            LOGGER.debug("evicted %s %s from cache", *old_key)
+        return buffer
@@ -0,0 +1,474 @@
+"""
+forecaster.handler.client
+~~~~~~~~~~~~~~
+
+Handle requests and responses from API
+
+There is a client for every account, Client() is the default one and
+Client(name='...') the others. Every client has its own session, gateway and
+snapshots, market data (candle cache) and the journal are the ones of the
+default client, shared by all accounts.
+"""
+
+import logging
+import os.path
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+import raven
+import trading212api
+from forecaster import __version__
+from forecaster.enums import ACTIONS, EVENTS
+from forecaster.exceptions import CircuitOpen, MissingData
+from forecaster.handler.cache import CandleCache
+from forecaster.handler.freshness import RefreshGate
+from forecaster.handler.gateway import LANE, Gateway
+from forecaster.handler.journal import TradeJournal
+from forecaster.handler.replay import RecordingSession, ReplaySession
+from forecaster.handler.retry import CircuitBreaker, RetryPolicy
+from forecaster.handler.snapshot import SafeAccount, SnapshotService
+from forecaster.metrics import API_ERRORS as API_FAILURES
+from forecaster.metrics import API_SECONDS, Metrics
+from forecaster.patterns import Chainer, Multiton, Singleton
+from forecaster.utils import get_conf, read_data, read_tokens
+
+LOGGER = logging.getLogger('forecaster.handler')
+MOVER_LOGGER = logging.getLogger('mover')
+
+# outcome of a position closed by close_all
+CloseResult = namedtuple(
+    'CloseResult', ['id', 'instrument', 'result', 'closed', 'latency', 'error'])
+
+# errors of an unhealthy api, counted by the circuit breaker
+API_ERRORS = (trading212api.exceptions.RequestError, requests.exceptions.ConnectionError)
+
+
+class Client(Chainer, metaclass=Multiton):
+    """Adapter for trading212api.Client"""
+
+    def __init__(self, bot=None, name='default', mode=None):
+        super().__init__(successor=bot)
+        self.name = name  # account
+        self.mode = mode or self._get_mode()
+        self.api = self._make_api(self.mode)
+        self.gateway = self._make_gateway()  # every request to api goes through
+        self.results = 0.0  # current net profit
+        self.retry_policy, self.breaker = self._make_retry()
+        if self.default:
+            self.journal = self._make_journal()  # persistent history of trades
+            self.candles = CandleCache(self._fetch_candles)  # historical data
+            Metrics().add_collector('client', self._collect)
+        else:  # market data doesn't depend on account
+            self.journal = Client().journal
+            self.candles = Client().candles
+        self.freshness = RefreshGate(self._refresh_api, self._get_refresh_ttl())
+        self.snapshots = SnapshotService(
+            self.refresh, lambda: self.api.account, self._get_snapshot_interval())
+        LOGGER.debug("CLIENT: initied {}".format(self.name))
+
+    @property
+    def default(self):
+        return self.name == 'default'
+
+    @property
+    def positions(self):
+        return self.api.positions
+
+    @property
+    def account(self):
+        return self.api.account
+
+    @property
+    def funds(self):
+        return self.api.account.funds
+
+    def snapshot(self):
+        """get shared snapshot of account and positions"""
+        return self.snapshots.get()
+
+    def handle_request(self, event, **kw):
+        """chainer function"""
+        if event == ACTIONS.CHANGE_MODE:
+            return self.change_mode(**kw)
+        return self.pass_request(event, **kw)
+
+    def change_mode(self, mode):
+        """swap to mode, return True if switched"""
+        if self.mode != mode:
+            LOGGER.info("CLIENT: switching mode from {} to {}".format(self.mode, mode))
+            self.swap()
+            LOGGER.info("CLIENT: current mode: {}".format(self.mode))
+            return self.mode == mode
+
+    def start(self):
+        """start from credentials in data file"""
+        try:
+            self.data = self._get_data()
+        except MissingData:
+            self._missing_data()
+        self._auto_login()
+        LOGGER.debug("CLIENT: started with data")
+
+    def login(self, username, password):
+        """log in trading212"""
+        while True:
+            try:
+                self.gateway.call(LANE.ACCOUNT, self.api.login, username, password)
+                self.username = username
+                break
+            except trading212api.exceptions.InvalidCredentials as e:
+                LOGGER.error("Invalid credentials with {}".format(e.username))
+                self._missing_data()
+            except trading212api.exceptions.LiveNotConfigured:
+                LOGGER.error("{} mode not configured".format(self.mode))
+                self.handle_request(EVENTS.MODE_FAILURE, account=self.name)
+        LOGGER.debug("CLIENT: logged in")
+
+    def open_pos(self, symbol, mode, quantity):
+        """open position and handle exceptions, return error of refused order or None"""
+        self.refresh()  # renovate sessions
+        error = self._retry('open {}'.format(symbol), self.try_open, symbol, mode, quantity)
+        if error is not None:
+            LOGGER.error("failed to open position on {}: {!r}".format(symbol, error))
+        return error
+
+    def close_pos(self, pos, reason=None):
+        """close position and update results, reason is journaled (checker name),
+        return error of refused order or None"""
+        self.refresh()  # renovate sessions
+        error = self._retry('close {}'.format(pos.id), self.try_close, pos, True, reason)
+        if error is not None:
+            LOGGER.error("failed to close position {}: {!r}".format(pos.id, error))
+        return error
+
+    def try_open(self, symbol, mode, quantity):
+        """make one attempt to open position, return error or None"""
+        try:
+            self.breaker.check()
+        except CircuitOpen as e:
+            return e  # fail fast while the api is unhealthy
+        error = None
+        try:
+            with API_SECONDS.time(operation='open'):
+                self.gateway.call(LANE.ORDERS, self.api.open_position, mode, symbol, quantity)
+            MOVER_LOGGER.info("opened position of %d %s on %s", quantity, symbol, mode, extra={
+                'move': {'event': 'open', 'symbol': symbol, 'mode': mode, 'quantity': quantity}})
+            self.journal.record_open(self.mode, symbol, mode, quantity, self.name)
+            self.freshness.touch()
+            self.snapshots.publish()  # account updated by response
+        except trading212api.exceptions.PriceChangedException as e:
+            error = e
+        except trading212api.exceptions.MinQuantityExceeded:
+            LOGGER.warning("Minimum quantity exceeded")
+            SentryClient().captureException()
+        except trading212api.exceptions.MaxQuantityExceeded:
+            LOGGER.warning("Maximum quantity exceeded")
+        except trading212api.exceptions.MarketClosed:
+            LOGGER.warning("Market closed for {}".format(symbol))
+            self.handle_request(EVENTS.MARKET_CLOSED, sym=symbol)
+        except trading212api.exceptions.NoPriceException as e:
+            LOGGER.warning("NoPriceException caught")
+            error = e
+        except trading212api.exceptions.ProductNotAvaible:
+            LOGGER.warning("Product not avaible")
+            SentryClient().debug("{} product not avaible".format(symbol))
+            SentryClient().captureException()
+        except API_ERRORS as e:
+            LOGGER.warning("failed to open position on {}: {}".format(symbol, e))
+            API_FAILURES.inc(operation='open')
+            self.breaker.failure()
+            return e
+        except Exception:
+            self.breaker.success()  # not a failure of the api, probe is over
+            raise
+        self.breaker.success()
+        return error
+
+    def try_close(self, pos, notify=True, reason=None):
+        """make one attempt to close position, return error or None,
+        a position not found is already closed and its result is booked"""
+        try:
+            self.breaker.check()
+        except CircuitOpen as e:
+            return e  # fail fast while the api is unhealthy
+        try:
+            with API_SECONDS.time(operation='close'):
+                self.gateway.call(LANE.ORDERS, self.api.close_position, pos.id)  # close
+            MOVER_LOGGER.info("closed position %s with gain of %.2f", pos.id, pos.result, extra={
+                'move': {'event': 'close', 'id': pos.id, 'symbol': pos.instrument,
+                         'result': pos.result}})
+            self.journal.record_close(self.mode, pos, reason, self.name)
+            self.freshness.touch()
+            self.snapshots.publish()  # account updated by response
+        except trading212api.exceptions.NoPriceException as e:
+            LOGGER.warning("NoPriceException caught")
+            self.breaker.success()
+            return e
+        except ValueError:
+            LOGGER.warning("Position {} not found".format(pos.id))  # already closed
+        except API_ERRORS as e:
+            LOGGER.warning("failed to close position {}: {}".format(pos.id, e))
+            API_FAILURES.inc(operation='close')
+            self.breaker.failure()
+            return e
+        except Exception:
+            self.breaker.success()  # not a failure of the api, probe is over
+            raise
+        self.breaker.success()
+        self.results += pos.result  # update returns
+        if notify:
+            self.handle_request(EVENTS.CLOSED_POS, pos=pos)
+        return None
+
+    def close_all(self, workers=None):
+        """close all positions concurrently and notify one summary"""
+        self.refresh(force=True)  # the only refresh of the bulk close
+        poss = list(self.api.account.positions)
+        if workers is None:
+            workers = get_conf()['HANDLER'].getint('close_workers', fallback=8)
+        start = time.monotonic()
+        if poss:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                results = list(executor.map(self._close_timed, poss))
+        else:
+            results = []
+        LOGGER.info("closed {} of {} positions in {:.2f}s".format(
+            sum(res.closed for res in results), len(results), time.monotonic() - start))
+        self.handle_request(EVENTS.CLOSED_ALL, results=results)
+        return results
+
+    def get_last_candles(self, symbol, num, timeframe):
+        """get last candles"""
+        candles = self.candles.get(symbol, num, timeframe)
+        prices = [candle['bid'] for candle in candles]
+        return prices
+
+    def get_margin(self, symbol, quantity):
+        """get margin"""
+        with API_SECONDS.time(operation='margin'):
+            return self.gateway.call(LANE.ACCOUNT, self.api.get_margin, symbol, quantity)
+
+    def refresh(self, force=False):
+        """refresh the session if older than refresh_ttl"""
+        return self.freshness(force)
+
+    def _retry(self, name, attempt, *args):
+        """repeat attempt while it returns an error allowed by retry policy,
+        return last error or None"""
+        retry = self.retry_policy.start(name)
+        while True:
+            error = attempt(*args)
+            if error is None:
+                return None
+            delay = retry.next_delay(error)
+            if delay is None:
+                return error
+            time.sleep(delay)
+
+    def _close_timed(self, pos):
+        """close position without notification, return CloseResult"""
+        start = time.monotonic()
+        error = self._retry('close {}'.format(pos.id), self.try_close, pos, False, 'close_all')
+        return CloseResult(pos.id, pos.instrument, pos.result, error is None,
+                           time.monotonic() - start, None if error is None else str(error))
+
+    def _refresh_api(self):
+        """refresh the session, return False on failure"""
+        if not self.breaker.allow():
+            return False
+        try:
+            with API_SECONDS.time(operation='refresh'):
+                self.gateway.call(LANE.ACCOUNT, self.api.refresh)
+        except trading212api.exceptions.RequestError:
+            LOGGER.warning("API unavaible")
+            API_FAILURES.inc(operation='refresh')
+            self.breaker.failure()
+            if not self.breaker.allow():  # don't log in again while unhealthy
+                return False
+            try:
+                self._auto_login()
+                self.gateway.call(LANE.ACCOUNT, self.api.refresh)
+            except API_ERRORS:
+                self.breaker.failure()
+                return False
+        except requests.exceptions.ConnectionError:
+            LOGGER.error("Connection error")
+            API_FAILURES.inc(operation='refresh')
+            self.breaker.failure()
+            SentryClient().captureException()
+            self.handle_request(EVENTS.CONNECTION_ERROR)
+            return False
+        except Exception:
+            self.breaker.success()  # not a failure of the api, probe is over
+            raise
+        self.breaker.success()
+        return True
+
+    def swap(self):
+        """swap mode"""
+        if self.mode == 'demo':
+            self.mode = 'live'
+        elif self.mode == 'live':
+            self.mode = 'demo'
+        self.api = self._make_api(self.mode)
+        self.results = 0.0
+        if self.default:  # candles of other accounts come from this session
+            self.candles.clear()
+        self.freshness.invalidate()
+        self.snapshots.invalidate()
+        self._auto_login()
+
+    def _make_api(self, mode):
+        """build api with the session of configured backend (live, record or replay)"""
+        api = trading212api.Client(mode)
+        api.account = SafeAccount(mode, api.positions)  # closes run concurrently
+        conf = get_conf()
+        backend = conf['HANDLER'].get('backend', fallback='live')
+        if backend == 'live':
+            return api
+        replay = conf['REPLAY'] if conf.has_section('REPLAY') else {}
+        path = replay.get('path', os.path.join(
+            os.path.dirname(os.path.dirname(__file__)), 'logs', 'recording.jsonl'))
+        if backend == 'record':
+            api.session = RecordingSession(path)
+        elif backend == 'replay':
+            errors = {}
+            for item in filter(None, replay.get('errors', '').split(',')):
+                name, probability = item.split(':')
+                errors[name.strip()] = float(probability)
+            seed = replay.get('seed')
+            api.session = ReplaySession(
+                path, latency=float(replay.get('latency', 0)),
+                jitter=float(replay.get('jitter', 0)), errors=errors,
+                seed=int(seed) if seed is not None else None)
+        else:
+            raise ValueError("backend {} not exists".format(backend))
+        LOGGER.debug("CLIENT: using {} backend".format(backend))
+        return api
+
+    def _fetch_candles(self, symbol, num, timeframe):
+        """download raw candles (used by cache)"""
+        self.refresh()  # renovate sessions
+        self.breaker.check()
+        try:
+            with API_SECONDS.time(operation='candles'):
+                candles = self.gateway.call(
+                    LANE.DATA, self.api.get_historical_data, symbol, num, timeframe)
+        except API_ERRORS:
+            API_FAILURES.inc(operation='candles')
+            self.breaker.failure()
+            raise
+        except Exception:
+            self.breaker.success()  # not a failure of the api, probe is over
+            raise
+        self.breaker.success()
+        return candles
+
+    def _collect(self):
+        """get values for metrics at scrape time"""
+        values = {'forecaster_results': self.results}
+        for name, stats in (('candle_cache', self.candles.stats()),
+                            ('refresh', self.freshness.stats()),
+                            ('breaker', self.breaker.stats())):
+            for key, value in stats.items():
+                if isinstance(value, (int, float)):
+                    values['forecaster_{}_{}'.format(name, key)] = value
+        values['forecaster_breaker_open'] = self.breaker.stats()['state'] != 'closed'
+        for key, value in self.gateway.stats().items():
+            if value != float('inf'):
+                values['forecaster_gateway_' + key] = value
+        retry = self.retry_policy.stats()
+        values['forecaster_retries'] = sum(retry['retries'].values())
+        values['forecaster_retries_gave_up'] = sum(retry['gave_up'].values())
+        values['forecaster_retries_waited_seconds'] = retry['waited']
+        return values
+
+    def _make_gateway(self):
+        """build gateway to api from config"""
+        conf = get_conf()
+        gateway = conf['GATEWAY'] if conf.has_section('GATEWAY') else {}
+        rate = float(gateway.get('rate', 0))
+        return Gateway(rate=rate or None, burst=int(gateway.get('burst', 10)),
+                       concurrency=int(gateway.get('concurrency', 4)))
+
+    def _make_journal(self):
+        """build trade journal from config"""
+        conf = get_conf()
+        journal = conf['JOURNAL'] if conf.has_section('JOURNAL') else {}
+        path = journal.get('path', os.path.join(
+            os.path.dirname(os.path.dirname(__file__)), 'logs', 'journal.db'))
+        return TradeJournal(path, flush_interval=float(journal.get('flush_interval', 1)),
+                            batch=int(journal.get('batch', 100)))
+
+    def _make_retry(self):
+        """build retry policy and circuit breaker from config"""
+        conf = get_conf()
+        retry = conf['RETRY'] if conf.has_section('RETRY') else {}
+        policy = RetryPolicy(max_attempts=int(retry.get('max_attempts', 10)),
+                             max_time=float(retry.get('max_time', 30)))
+        breaker = CircuitBreaker(failures=int(retry.get('breaker_failures', 5)),
+                                 reset_timeout=float(retry.get('breaker_reset', 60)))
+        return policy, breaker
+
+    def _get_mode(self):
+        """get mode"""
+        try:
+            return self._get_data()['mode']
+        except (MissingData, KeyError):
+            return get_conf()['HANDLER']['mode']
+
+    def _get_refresh_ttl(self):
+        """get seconds a refresh of session and account is considered fresh"""
+        return get_conf()['HANDLER'].getfloat('refresh_ttl', fallback=2.0)
+
+    def _get_snapshot_interval(self):
+        """get seconds between account refreshes of snapshots"""
+        return get_conf()['HANDLER'].getfloat('snapshot_interval', fallback=5.0)
+
+    def _get_data(self):
+        """get credentials if exist (data_<name> for other accounts)"""
+        try:
+            return read_data('data' if self.default else 'data_' + self.name)
+        except FileNotFoundError:
+            raise MissingData()
+
+    def _missing_data(self):
+        """ask credentials, only the default account is configured by chat"""
+        if not self.default:
+            LOGGER.error("missing credentials of account {}".format(self.name))
+            raise MissingData()
+        self.handle_request(EVENTS.MISSING_DATA)
+
+    def _auto_login(self):
+        """"auto login with credentials"""
+        self.login(self.data['username'], self.data['password'])
+
+
+class SentryClient(raven.Client, metaclass=Singleton):
+    """sentry handler to handle exceptions"""
+
+    def __init__(self, *args, **kwargs):
+        token = read_tokens()['sentry']
+        version = __version__.strip('v')
+        env = 'developing'
+        super().__init__(dsn=token, release=version, environment=env, *args, **kwargs)
+        self.breadcrumbs = raven.breadcrumbs
+        LOGGER.debug("SENTRY: initied")
+
+    def record(self, text, *args, **kwargs):
+        self.breadcrumbs.record(message=text, *args, **kwargs)
+
+    def debug(self, text):
+        self.breadcrumbs.record(text, level='debug')
+
+    def info(self, text):
+        self.breadcrumbs.record(text, level='info')
+
+    def warning(self, text):
+        self.breadcrumbs.record(text, level='warning')
+
+    def error(self, text):
+        self.breadcrumbs.record(text, level='error')
@@ -0,0 +1,58 @@
+"""
+forecaster.handler.freshness
+~~~~~~~~~~~~~~
+
+Track when session and account were last refreshed.
+Refreshes within the ttl are skipped and concurrent ones are coalesced
+into a single request.
+"""
+
+import logging
+import time
+from threading import Lock
+
+LOGGER = logging.getLogger('forecaster.handler.freshness')
+
+
+class RefreshGate(object):
+    """call refresh only when stale"""
+
+    def __init__(self, refresh, ttl):
+        self._refresh = refresh  # refresh() returns False on failure
+        self.ttl = ttl
+        self.refreshes = 0  # requests sent
+        self.avoided = 0  # skipped because fresh
+        self.coalesced = 0  # served by a refresh of another thread
+        self._last = None
+        self._lock = Lock()
+
+    def __call__(self, force=False):
+        """refresh if older than ttl, return True if a request was sent"""
+        if not force and self._is_fresh(self._last):
+            self.avoided += 1
+            return False
+        started = time.monotonic()
+        with self._lock:  # other threads wait for the same refresh
+            if not force and self._last is not None and self._last >= started:
+                self.coalesced += 1
+                return False
+            self.refreshes += 1
+            if self._refresh() is not False:
+                self._last = time.monotonic()
+            return True
+
+    def touch(self):
+        """mark as fresh (account updated by another response)"""
+        self._last = time.monotonic()
+
+    def invalidate(self):
+        """force next refresh"""
+        self._last = None
+
+    def stats(self):
+        """get counters of refreshes"""
+        return {'refreshes': self.refreshes, 'avoided': self.avoided + self.coalesced,
+                'skipped_fresh': self.avoided, 'coalesced': self.coalesced}
+
+    def _is_fresh(self, last):
+        return last is not None and time.monotonic() - last < self.ttl
@@ -0,0 +1,116 @@
+"""
+forecaster.handler.gateway
+~~~~~~~~~~~~~~
+
+Single entrance to the trading212 session shared by every thread.
+Requests wait in priority lanes: orders and closes go before account
+refreshes, which go before candle downloads and queries. A token bucket
+limits the rate of requests and a bounded number of them run at once.
+"""
+
+import heapq
+import itertools
+import logging
+import time
+from collections import Counter
+from enum import IntEnum
+from threading import Condition
+
+from forecaster.metrics import GATEWAY_WAIT
+
+LOGGER = logging.getLogger('forecaster.handler.gateway')
+
+
+class LANE(IntEnum):
+    ORDERS = 0  # open and close positions
+    ACCOUNT = 1  # login, refresh, margins
+    DATA = 2  # candles and queries
+
+
+class TokenBucket(object):
+    """rate tokens per second, up to capacity saved for bursts"""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self._last = time.monotonic()
+
+    def _fill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self._last) * self.rate)
+        self._last = now
+
+    def wait_time(self, now):
+        """get seconds until a token is available (not thread safe)"""
+        self._fill(now)
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self):
+        self.tokens -= 1
+
+
+class Gateway(object):
+    """prioritized, rate limited access to the api"""
+
+    def __init__(self, rate=None, burst=10, concurrency=4):
+        self.bucket = TokenBucket(rate, burst) if rate else None  # None is unlimited
+        self.concurrency = concurrency  # requests running at once
+        self.active = 0
+        self.calls = Counter()  # by lane
+        self._waiting = []  # heap of (lane, ticket)
+        self._tickets = itertools.count()
+        self._cond = Condition()
+
+    def call(self, lane, func, *args, **kw):
+        """run func(*args, **kw) when its turn comes"""
+        queued = time.monotonic()
+        self._acquire(lane)
+        GATEWAY_WAIT.observe(time.monotonic() - queued, lane=lane.name)
+        try:
+            return func(*args, **kw)
+        finally:
+            with self._cond:
+                self.active -= 1
+                self._cond.notify_all()
+
+    def share(self, parts):
+        """keep a part of rate and burst, the others go to other processes"""
+        if self.bucket is not None:
+            self.bucket.rate /= parts
+            self.bucket.capacity = max(self.bucket.capacity / parts, 1)
+            self.bucket.tokens = min(self.bucket.tokens, self.bucket.capacity)
+
+    def depth(self):
+        """get {lane name: requests waiting}"""
+        with self._cond:
+            depth = Counter(LANE(lane).name for lane, _ in self._waiting)
+        return {lane.name: depth[lane.name] for lane in LANE}
+
+    def stats(self):
+        with self._cond:
+            stats = {'active': self.active,
+                     'tokens': self.bucket.tokens if self.bucket else float('inf')}
+        for lane, num in self.depth().items():
+            stats['waiting_' + lane.lower()] = num
+        for lane in LANE:
+            stats['calls_' + lane.name.lower()] = self.calls[lane.name]
+        return stats
+
+    def _acquire(self, lane):
+        with self._cond:
+            ticket = (int(lane), next(self._tickets))
+            heapq.heappush(self._waiting, ticket)
+            while True:
+                timeout = None
+                if self._waiting[0] == ticket and self.active < self.concurrency:
+                    wait = self.bucket.wait_time(time.monotonic()) if self.bucket else 0.0
+                    if wait <= 0:
+                        break
+                    timeout = wait
+                self._cond.wait(timeout)
+            heapq.heappop(self._waiting)
+            if self.bucket:
+                self.bucket.take()
+            self.active += 1
+            self.calls[lane.name] += 1
+            self._cond.notify_all()  # next ticket can check its turn
@@ -0,0 +1,184 @@
+"""
+forecaster.handler.journal
+~~~~~~~~~~~~~~
+
+Append-only journal of trades in SQLite (WAL mode).
+Orders only put a row in a queue, a writer thread inserts rows in batches,
+so journaling doesn't add latency to order execution. Aggregates per
+symbol, day and checker are answered by indexes. Every row is tagged with
+the account that made it, all accounts of the process share one journal.
+"""
+
+import datetime
+import logging
+import os.path
+import queue
+import sqlite3
+import threading
+import time
+
+LOGGER = logging.getLogger('forecaster.handler.journal')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS trades (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    time REAL NOT NULL,
+    day TEXT NOT NULL,
+    mode TEXT NOT NULL,
+    event TEXT NOT NULL,
+    position TEXT,
+    symbol TEXT NOT NULL,
+    side TEXT,
+    quantity REAL,
+    result REAL,
+    reason TEXT,
+    account TEXT NOT NULL DEFAULT 'default'
+);
+CREATE INDEX IF NOT EXISTS trades_symbol ON trades (mode, event, symbol, day);
+CREATE INDEX IF NOT EXISTS trades_day ON trades (mode, event, day);
+CREATE INDEX IF NOT EXISTS trades_reason ON trades (mode, event, reason, day);
+"""
+
+COLUMNS = ('time', 'day', 'mode', 'event', 'position', 'symbol', 'side', 'quantity',
+           'result', 'reason', 'account')
+
+# group by of aggregates
+GROUPS = {'symbol': 'symbol', 'day': 'day', 'checker': 'reason', 'account': 'account'}
+
+
+class TradeJournal(object):
+    """journal of opened and closed positions"""
+
+    def __init__(self, path, flush_interval=1.0, batch=100):
+        self.path = path
+        self.flush_interval = flush_interval  # max seconds a row waits in queue
+        self.batch = batch
+        self.written = 0
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._local = threading.local()  # read connection of every thread
+
+    def record_open(self, mode, symbol, side, quantity, account='default'):
+        self._put(mode, 'open', None, symbol, side, quantity, None, None, account)
+
+    def record_close(self, mode, pos, reason=None, account='default'):
+        self._put(mode, 'close', pos.id, pos.instrument, pos.mode, pos.quantity,
+                  pos.result, reason, account)
+
+    def flush(self, timeout=5.0):
+        """wait until queued rows are written"""
+        if self._thread is not None:
+            done = threading.Event()
+            self._queue.put(done)
+            done.wait(timeout)
+
+    def close(self):
+        """write queued rows and stop writer"""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(None)
+            thread.join()
+
+    def total(self, mode, since=None, account=None):
+        """get (profit, number) of closed positions (of every account if None)"""
+        query = "SELECT COALESCE(SUM(result), 0), COUNT(*) FROM trades " \
+                "WHERE mode = ? AND event = 'close' AND day >= ?" + _account(account)
+        return tuple(self._read(query, _params(mode, since, account))[0])
+
+    def aggregate(self, mode, by, since=None, account=None):
+        """get [(key, profit, number)] of closed positions grouped by symbol,
+        day, checker or account, most profitable first"""
+        column = GROUPS[by]
+        query = "SELECT {0}, SUM(result), COUNT(*) FROM trades " \
+                "WHERE mode = ? AND event = 'close' AND day >= ?{1} " \
+                "GROUP BY {0} ORDER BY SUM(result) DESC".format(column, _account(account))
+        return [tuple(row) for row in self._read(query, _params(mode, since, account))]
+
+    def _put(self, mode, event, position, symbol, side, quantity, result, reason, account):
+        now = time.time()
+        day = datetime.datetime.fromtimestamp(now).strftime('%Y-%m-%d')
+        self._queue.put((now, day, mode, event, position, symbol, side, quantity,
+                         result, reason, account))
+        self._start()
+
+    def _start(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._write_loop, name='journal')
+                self._thread.daemon = True
+                self._thread.start()
+
+    def _connect(self):
+        folder = os.path.dirname(self.path)
+        if folder and not os.path.isdir(folder):
+            os.makedirs(folder)
+        conn = sqlite3.connect(self.path, timeout=10)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")  # durable at checkpoints in WAL mode
+        conn.executescript(SCHEMA)
+        columns = [row[1] for row in conn.execute("PRAGMA table_info(trades)")]
+        if 'account' not in columns:  # journal of a single account version
+            conn.execute("ALTER TABLE trades ADD COLUMN account TEXT NOT NULL "
+                         "DEFAULT 'default'")
+        return conn
+
+    def _write_loop(self):
+        conn = self._connect()
+        insert = "INSERT INTO trades ({}) VALUES ({})".format(
+            ', '.join(COLUMNS), ', '.join('?' * len(COLUMNS)))
+        running = True
+        while running:
+            rows, waiting = [], []
+            item = self._queue.get()
+            deadline = time.monotonic() + self.flush_interval
+            while True:  # collect a batch
+                if item is None:
+                    running = False
+                    break
+                if isinstance(item, threading.Event):
+                    waiting.append(item)
+                    break
+                rows.append(item)
+                if len(rows) >= self.batch:
+                    break
+                try:
+                    item = self._queue.get(timeout=max(deadline - time.monotonic(), 0))
+                except queue.Empty:
+                    break
+            if rows:
+                try:
+                    with conn:
+                        conn.executemany(insert, rows)
+                    self.written += len(rows)
+                except sqlite3.Error as e:
+                    LOGGER.error("failed to journal {} trades: {}".format(len(rows), e))
+            for event in waiting:
+                event.set()
+        conn.close()
+
+    def _read(self, query, params):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = self._connect()
+        return conn.execute(query, params).fetchall()
+
+
+def _account(account):
+    """get filter of account, none for every account"""
+    return '' if account is None else " AND account = ?"
+
+
+def _params(mode, since, account):
+    params = (mode, _day(since))
+    return params if account is None else params + (account,)
+
+
+def _day(since):
+    """get day string of date, datetime or None (all)"""
+    if since is None:
+        return ''
+    return since.strftime('%Y-%m-%d')
@@ -0,0 +1,139 @@
+"""
+forecaster.handler.replay
+~~~~~~~~~~~~~~
+
+Record and replay responses of the trading212 API.
+Sessions replace the requests.Session of trading212api.Client, so the
+client runs unchanged against saved responses with injected latency and
+errors.
+"""
+
+import json
+import logging
+import random
+import time
+from collections import Counter
+from threading import Lock
+
+import requests
+
+LOGGER = logging.getLogger('forecaster.handler.replay')
+
+# errors that can be injected: (methods, url part, context of 500 response)
+INJECTABLE = {
+    'PriceChangedException': (
+        ('POST',), 'open-positions', {'type': 'PriceChangedException', 'current': 1.0}),
+    'NoPriceException': (('POST', 'DELETE'), 'open-positions', {'type': 'NoPriceException'}),
+    'MarketClosed': (('POST',), 'open-positions', {'type': 'MarketStillNotOpen'}),
+    'ConnectionError': (('GET', 'POST', 'DELETE'), '', None),
+}
+
+
+def request_key(method, url, data=None):
+    """key to match requests, passwords are never saved"""
+    if isinstance(data, dict):
+        data = json.dumps({key: '***' if 'password' in key else value
+                           for key, value in data.items()}, sort_keys=True)
+    elif isinstance(data, bytes):
+        data = data.decode()
+    return '{} {} {}'.format(method.upper(), url, data or '')
+
+
+def load_records(path):
+    """load records saved by RecordingSession"""
+    with open(path, 'r') as records_file:
+        return [json.loads(line) for line in records_file if line.strip()]
+
+
+def make_response(status, content, url=None):
+    """build a requests.Response"""
+    response = requests.Response()
+    response.status_code = status
+    response._content = content.encode() if isinstance(content, str) else content
+    response.encoding = 'utf-8'
+    response.url = url
+    return response
+
+
+class RecordingSession(requests.Session):
+    """session that appends every response to a jsonl file"""
+
+    def __init__(self, path):
+        super().__init__()
+        self.path = path
+        self._lock = Lock()
+
+    def request(self, method, url, *args, **kwargs):
+        response = super().request(method, url, *args, **kwargs)
+        record = {'key': request_key(method, url, kwargs.get('data')),
+                  'status': response.status_code, 'content': response.text}
+        with self._lock:
+            with open(self.path, 'a') as records_file:
+                records_file.write(json.dumps(record) + '\n')
+        return response
+
+
+class ReplaySession(requests.Session):
+    """session that serves recorded responses"""
+
+    def __init__(self, records, latency=0.0, jitter=0.0, errors=None, seed=None):
+        super().__init__()
+        if isinstance(records, str):
+            records = load_records(records)
+        self.responses = {}
+        for record in records:
+            self.responses.setdefault(record['key'], []).append(record)
+        self.latency = latency  # mean seconds of every request
+        self.jitter = jitter  # standard deviation of latency
+        self.errors = errors or {}  # {error name: probability}
+        self.served = Counter()
+        self.injected = Counter()
+        self.random = random.Random(seed)
+        self._lock = Lock()
+        for name in self.errors:
+            if name not in INJECTABLE:
+                raise ValueError("{} can't be injected".format(name))
+
+    def request(self, method, url, *args, **kwargs):
+        key = request_key(method, url, kwargs.get('data'))
+        with self._lock:
+            delay = max(self.random.gauss(self.latency, self.jitter), 0) if self.latency else 0
+            error = self._pick_error(method, url)
+            record = self._next_record(key, method, url)
+        if delay:
+            time.sleep(delay)
+        if error is not None:
+            return self._inject(error, url)
+        if record is None:
+            LOGGER.warning("no recorded response for {}".format(key))
+            return make_response(404, '{}', url)
+        return make_response(record['status'], record['content'], url)
+
+    def _pick_error(self, method, url):
+        """draw an injected error for request"""
+        for name, probability in self.errors.items():
+            methods, part, _ = INJECTABLE[name]
+            if method.upper() in methods and part in url and self.random.random() < probability:
+                self.injected[name] += 1
+                return name
+        return None
+
+    def _inject(self, name, url):
+        """raise or respond with injected error"""
+        if name == 'ConnectionError':
+            raise requests.exceptions.ConnectionError("injected connection error")
+        content = {'context': INJECTABLE[name][2]}
+        return make_response(500, json.dumps(content), url)
+
+    def _next_record(self, key, method, url):
+        """get next response of key, repeat the last one when finished"""
+        responses = self.responses.get(key)
+        if responses is None:  # same endpoint with different payload
+            prefix = '{} {} '.format(method.upper(), url)
+            key = next((k for k in self.responses if k.startswith(prefix)), None)
+            if key is None:
+                return None
+            responses = self.responses[key]
+        index = min(self.served[key], len(responses) - 1)
+        self.served[key] += 1
+        return responses[index]
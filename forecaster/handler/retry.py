@@ -0,0 +1,186 @@
+"""
+forecaster.handler.retry
+~~~~~~~~~~~~~~
+
+Retry policies and circuit breaker of API requests.
+Every retryable exception has its own exponential backoff with jitter,
+every operation has a budget of attempts and time. The circuit breaker
+fails fast while the API is unhealthy.
+"""
+
+import logging
+import random
+import time
+from collections import Counter
+from enum import Enum
+from threading import Lock
+
+import requests
+
+import trading212api
+from forecaster.exceptions import CircuitOpen
+
+LOGGER = logging.getLogger('forecaster.handler.retry')
+
+
+class Backoff(object):
+    """exponential delays: base * factor ** attempt, capped, with jitter"""
+
+    def __init__(self, base, factor=2.0, cap=60.0, jitter=0.5):
+        self.base = base
+        self.factor = factor
+        self.cap = cap
+        self.jitter = jitter  # fraction of delay randomized
+
+    def delay(self, attempt, rand=random.random):
+        delay = min(self.base * self.factor ** attempt, self.cap)
+        return delay * (1 - self.jitter * rand())
+
+
+# exceptions that are retried and their backoffs
+DEFAULT_BACKOFFS = {
+    trading212api.exceptions.PriceChangedException: Backoff(0.05, cap=1.0),
+    trading212api.exceptions.NoPriceException: Backoff(1.0, cap=30.0),
+    trading212api.exceptions.RequestError: Backoff(1.0, cap=60.0),
+    requests.exceptions.ConnectionError: Backoff(1.0, cap=60.0),
+}
+
+
+class RetryPolicy(object):
+    """per-exception backoffs with attempt and time budgets"""
+
+    def __init__(self, backoffs=None, max_attempts=10, max_time=30.0):
+        self.backoffs = backoffs if backoffs is not None else dict(DEFAULT_BACKOFFS)
+        self.max_attempts = max_attempts
+        self.max_time = max_time  # seconds of a whole operation
+        self.retries = Counter()  # retries by exception name
+        self.gave_up = Counter()  # exhausted budgets by operation
+        self.waited = 0.0  # total seconds spent waiting
+        self._lock = Lock()
+
+    def is_retryable(self, error):
+        return self._backoff(error) is not None
+
+    def start(self, name):
+        """begin an operation"""
+        return RetryState(self, name)
+
+    def stats(self):
+        """get counters of retries"""
+        with self._lock:
+            return {'retries': dict(self.retries), 'gave_up': dict(self.gave_up),
+                    'waited': self.waited}
+
+    def _backoff(self, error):
+        for exc, backoff in self.backoffs.items():
+            if isinstance(error, exc):
+                return backoff
+        return None
+
+    def _record(self, error, delay):
+        with self._lock:
+            self.retries[error.__class__.__name__] += 1
+            self.waited += delay
+
+    def _give_up(self, name):
+        with self._lock:
+            self.gave_up[name] += 1
+
+
+class RetryState(object):
+    """attempts of an operation under a RetryPolicy"""
+
+    def __init__(self, policy, name):
+        self.policy = policy
+        self.name = name
+        self.attempts = Counter()  # attempts by exception
+        self.start = time.monotonic()
+
+    def next_delay(self, error):
+        """get seconds to wait before retrying after error, None to give up"""
+        backoff = self.policy._backoff(error)
+        if backoff is None:
+            return None
+        attempt = self.attempts[error.__class__]
+        self.attempts[error.__class__] += 1
+        delay = backoff.delay(attempt)
+        elapsed = time.monotonic() - self.start
+        if (sum(self.attempts.values()) >= self.policy.max_attempts or
+                elapsed + delay > self.policy.max_time):
+            LOGGER.warning("{} gave up after {} attempts in {:.1f}s: {}".format(
+                self.name, sum(self.attempts.values()), elapsed, error))
+            self.policy._give_up(self.name)
+            return None
+        self.policy._record(error, delay)
+        return delay
+
+
+class STATE(Enum):
+    CLOSED = 'closed'  # requests allowed
+    OPEN = 'open'  # requests refused
+    HALF_OPEN = 'half_open'  # one probe allowed (another if lost for reset_timeout)
+
+
+class CircuitBreaker(object):
+    """open after consecutive failures, probe again after reset_timeout"""
+
+    def __init__(self, failures=5, reset_timeout=60.0, name='api'):
+        self.max_failures = failures
+        self.reset_timeout = reset_timeout
+        self.name = name
+        self.state = STATE.CLOSED
+        self.failures = 0  # consecutive failures
+        self.opened = 0  # times opened
+        self.rejected = 0  # requests refused while open
+        self._opened_at = None
+        self._probe_at = None  # start of probe while half open
+        self._lock = Lock()
+
+    def allow(self):
+        """return True if a request can be sent"""
+        with self._lock:
+            if self.state == STATE.OPEN:
+                if time.monotonic() - self._opened_at < self.reset_timeout:
+                    self.rejected += 1
+                    return False
+                self.state = STATE.HALF_OPEN  # let this request probe the api
+                self._probe_at = time.monotonic()
+                LOGGER.info("circuit {} half open".format(self.name))
+                return True
+            if self.state == STATE.HALF_OPEN:
+                if time.monotonic() - self._probe_at < self.reset_timeout:
+                    self.rejected += 1  # probe already in flight
+                    return False
+                self._probe_at = time.monotonic()  # outcome never recorded, probe again
+                LOGGER.info("circuit {} probing again".format(self.name))
+                return True
+            return True
+
+    def check(self):
+        """raise CircuitOpen if a request can't be sent"""
+        if not self.allow():
+            raise CircuitOpen(self.name)
+
+    def success(self):
+        with self._lock:
+            if self.state != STATE.CLOSED:
+                LOGGER.info("circuit {} closed".format(self.name))
+            self.state = STATE.CLOSED
+            self.failures = 0
+
+    def failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == STATE.HALF_OPEN or (
+                    self.state == STATE.CLOSED and self.failures >= self.max_failures):
+                self.state = STATE.OPEN
+                self._opened_at = time.monotonic()
+                self.opened += 1
+                LOGGER.warning("circuit {} open after {} failures".format(
+                    self.name, self.failures))
+
+    def stats(self):
+        """get state and counters"""
+        with self._lock:
+            return {'state': self.state.value, 'failures': self.failures,
+                    'opened': self.opened, 'rejected': self.rejected}
@@ -0,0 +1,99 @@
+"""
+forecaster.handler.snapshot
+~~~~~~~~~~~~~~
+
+Shared snapshots of account and positions.
+The account is refreshed at most once per interval and every reader gets
+the same immutable snapshot.
+"""
+
+import logging
+import time
+from collections import namedtuple
+from threading import Lock
+from types import MappingProxyType
+
+from trading212api.datastruct import Account, Position
+
+LOGGER = logging.getLogger('forecaster.handler.snapshot')
+
+AccountSnapshot = namedtuple(
+    'AccountSnapshot', ['taken', 'funds', 'positions', 'by_id', 'by_instrument'])
+
+
+class SafeAccount(Account):
+    """account whose positions are replaced in one step on update,
+    concurrent readers never see an empty list while requests are in flight"""
+
+    def __init__(self, mode, positions=None):
+        super().__init__(mode)
+        if positions is not None:
+            self.positions = positions  # keep list shared with api.positions
+
+    def update(self, raw_data):
+        positions = [Position(pos) for pos in raw_data['positions']]
+        self.id = raw_data['id']  # account id
+        self.funds = {
+            'free': raw_data['cash']['free'],
+            'total': raw_data['cash']['total'],
+            'result': raw_data['cash']['ppl'],  # actual results
+        }
+        self.positions[:] = positions
+
+
+def take_snapshot(account):
+    """build an immutable snapshot of a trading212api account"""
+    positions = tuple(account.positions)
+    by_instrument = {}
+    for pos in positions:
+        by_instrument.setdefault(pos.instrument, []).append(pos)
+    return AccountSnapshot(
+        taken=time.monotonic(),
+        funds=MappingProxyType(dict(getattr(account, 'funds', {}))),
+        positions=positions,
+        by_id=MappingProxyType({pos.id: pos for pos in positions}),
+        by_instrument=MappingProxyType(
+            {sym: tuple(poss) for sym, poss in by_instrument.items()}))
+
+
+class SnapshotService(object):
+    """refresh account at most once per interval and publish snapshots"""
+
+    def __init__(self, refresh, account, interval):
+        self._refresh = refresh  # refresh() updates the account
+        self._account = account  # account() returns the account to snapshot
+        self.interval = interval
+        self.refreshes = 0
+        self.reads = 0
+        self._snapshot = None
+        self._lock = Lock()
+
+    def get(self):
+        """get current snapshot, refresh account if older than interval"""
+        self.reads += 1
+        snapshot = self._snapshot
+        if self._is_fresh(snapshot):
+            return snapshot
+        with self._lock:  # other threads wait for the same refresh
+            if not self._is_fresh(self._snapshot):
+                self._refresh()
+                self.refreshes += 1
+                self._snapshot = take_snapshot(self._account())
+            return self._snapshot
+
+    def publish(self):
+        """publish a snapshot of the account as it is now (after orders)"""
+        with self._lock:
+            self._snapshot = take_snapshot(self._account())
+        return self._snapshot
+
+    def invalidate(self):
+        """force a refresh on next read"""
+        self._snapshot = None
+
+    def stats(self):
+        """get counters of snapshot usage"""
+        return {'reads': self.reads, 'refreshes': self.refreshes}
+
+    def _is_fresh(self, snapshot):
+        return snapshot is not None and time.monotonic() - snapshot.taken < self.interval
@@ -0,0 +1,177 @@
+"""
+forecaster.logger
+~~~~~~~~~~~~~~
+
+Logging configuration, applied once by the CLI and by Bot.
+Loggers only put records in a queue, files are written by a listener
+thread so trading threads never wait on disk. Moves are JSON lines
+appended to movlist.log and repetitive debug messages of checker loops
+are rate limited.
+"""
+
+import atexit
+import json
+import logging.config
+import logging.handlers
+import os.path
+import queue
+import threading
+import time
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'deafult': {
+            'format':
+                '%(asctime)s - %(levelname)s - %(name)s - %(message)s',
+            'datefmt': '%Y-%m-%d %H:%M:%S'
+        },
+        'mov_form': {
+            '()': 'forecaster.logger.JsonFormatter'
+        }
+    },
+    'filters': {
+        'rate_limit': {
+            '()': 'forecaster.logger.RateLimitFilter',
+            'interval': 60
+        }
+    },
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+            'formatter': 'deafult',
+        },
+        'rotating': {
+            'class': 'logging.handlers.TimedRotatingFileHandler',
+            'formatter': 'deafult',
+            'filename': os.path.join(
+                os.path.dirname(__file__), 'logs/logfile.log'),
+            'when': 'midnight',
+            'backupCount': 3,
+            'delay': True
+        },
+        'movs_handler': {
+            'class': 'logging.FileHandler',
+            'formatter': 'mov_form',
+            'filename': os.path.join(
+                os.path.dirname(__file__), 'logs/movlist.log'),
+            'mode': 'a',  # keep history of moves between restarts
+            'delay': True
+        }
+    },
+    'loggers': {
+        '': {
+            'handlers': ['console'],
+            'level': 'CRITICAL',
+            'propagate': True
+        },
+        'forecaster': {
+            'handlers': ['rotating'],
+            'level': 'DEBUG'
+        },
+        'forecaster.automate.checker': {
+            'filters': ['rate_limit']
+        },
+        'forecaster.automate.positioner': {
+            'filters': ['rate_limit']
+        },
+        'mover': {
+            'handlers': ['movs_handler'],
+            'level': 'DEBUG'
+        }
+    }
+}
+
+# loggers whose file handlers are moved behind a queue
+QUEUED_LOGGERS = ['forecaster', 'mover']
+
+
+class JsonFormatter(logging.Formatter):
+    """one JSON object per record, fields passed in extra={'move': {...}}"""
+
+    def format(self, record):
+        data = {'time': self.formatTime(record, '%Y-%m-%dT%H:%M:%S'),
+                'message': record.getMessage()}
+        data.update(getattr(record, 'move', {}))
+        return json.dumps(data, sort_keys=True)
+
+
+class RateLimitFilter(logging.Filter):
+    """let a debug message through once every interval seconds,
+    messages are the same when they are formatted the same"""
+
+    def __init__(self, interval=60, level=logging.DEBUG):
+        super().__init__()
+        self.interval = interval
+        self.level = level  # records above are never limited
+        self._last = {}  # (logger name, message): [time, suppressed]
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        if record.levelno > self.level:
+            return True
+        message = record.getMessage()
+        key = (record.name, message)
+        now = time.monotonic()
+        with self._lock:
+            last = self._last.get(key)
+            if last is not None and now - last[0] < self.interval:
+                last[1] += 1
+                return False
+            suppressed = last[1] if last is not None else 0
+            self._last[key] = [now, 0]
+            if len(self._last) > 1024:  # forget messages not seen in interval
+                self._last = {k: v for k, v in self._last.items()
+                              if now - v[0] < self.interval or v[1]}
+        if suppressed:  # format of message is left to args, the same for every handler
+            record.msg, record.args = '%s (%d similar suppressed)', (message, suppressed)
+        return True
+
+
+class QueueLogging(object):
+    """file handlers of loggers run on a listener thread"""
+
+    def __init__(self, names):
+        self.queue = queue.Queue(-1)
+        handlers = []
+        for name in names:
+            logger = logging.getLogger(name)
+            handlers.extend(_Routed(name, handler) for handler in logger.handlers)
+            logger.handlers = [logging.handlers.QueueHandler(self.queue)]
+        self.listener = logging.handlers.QueueListener(
+            self.queue, *handlers, respect_handler_level=True)
+
+    def start(self):
+        self.listener.start()
+        atexit.register(self.stop)  # flush records left in queue
+
+    def stop(self):
+        if self.listener._thread is not None:
+            self.listener.stop()
+
+
+class _Routed(logging.Handler):
+    """handler of records logged under logger name only"""
+
+    def __init__(self, name, handler):
+        super().__init__(handler.level)
+        self.name_prefix = name
+        self.handler = handler
+
+    def handle(self, record):
+        if record.name == self.name_prefix or record.name.startswith(self.name_prefix + '.'):
+            return self.handler.handle(record)
+        return False
+
+
+_pipeline = None
+
+
+def setup_logging():
+    """configure handlers of forecaster loggers (once)"""
+    global _pipeline
+    if _pipeline is None:
+        logging.config.dictConfig(LOGGING)
+        _pipeline = QueueLogging(QUEUED_LOGGERS)
+        _pipeline.start()
@@ -12,7 +12,7 @@ import signal
 from forecaster.enums import EVENTS
 from forecaster.exceptions import MissingData
 from forecaster.mediate.telegram import TelegramMediator
-from forecaster.patterns import Chainer
+from forecaster.patterns import MODE, Chainer
 from forecaster.utils import read_tokens
 
 LOGGER = logging.getLogger('forecaster.mediate')
@@ -29,24 +29,43 @@ class Mediator(Chainer):
 
     def handle_request(self, event, **kw):
         """handle requests from chainers"""
-        # raise missing data
-        if event == EVENTS.MISSING_DATA:
-            self.need_conf()
-            raise MissingData()
-        # log mode failure
-        elif event == EVENTS.MODE_FAILURE:
-            LOGGER.warning("Mode failed to login")
-        # notify telegram to close position
-        elif event == EVENTS.CLOSED_POS:
-            self.telegram.close_pos(kw['pos'].result)
-        # notify telegram of market closed
-        elif event == EVENTS.MARKET_CLOSED:
-            self.log("Market closed for *{}*".format(kw['sym']))
-        # connection error
-        elif event == EVENTS.CONNECTION_ERROR:
-            self.log("Connection error caught")
-        else:
-            return self.pass_request(event, **kw)
+        route = self.routes.get(event)
+        if route is not None:
+            return route[0](**kw)
+        return self.pass_request(event, **kw)
+
+    @property
+    def routes(self):
+        """event: (handler, mode), notifications don't block who sends them"""
+        return {
+            EVENTS.MISSING_DATA: (self.missing_data, MODE.SYNC),
+            EVENTS.MODE_FAILURE: (self.mode_failure, MODE.SYNC),
+            EVENTS.CLOSED_POS: (self.closed_pos, MODE.ASYNC),
+            EVENTS.CLOSED_ALL: (self.closed_all, MODE.ASYNC),
+            EVENTS.MARKET_CLOSED: (self.market_closed, MODE.ASYNC),
+            EVENTS.CONNECTION_ERROR: (self.connection_error, MODE.SYNC)}
+
+    def missing_data(self):
+        """raise missing data"""
+        self.need_conf()
+        raise MissingData()
+
+    def mode_failure(self):
+        LOGGER.warning("Mode failed to login")
+
+    def closed_pos(self, pos):
+        """notify telegram to close position"""
+        self.telegram.close_pos(pos.result)
+
+    def closed_all(self, results):
+        """notify telegram a summary of bulk close"""
+        self.telegram.close_all(results)
+
+    def market_closed(self, sym):
+        self.log("Market closed for *{}*".format(sym))
+
+    def connection_error(self):
+        self.log("Connection error caught")
 
     def start(self):
         """start listener"""
@@ -56,6 +75,7 @@ class Mediator(Chainer):
     def stop(self):
         """stop listener"""
         # self.telegram.deactivate()  # BUG
+        self.telegram.outbox.stop()  # send queued messages
         os.kill(os.getpid(), signal.SIGINT)
         LOGGER.debug("MEDIATOR: stopped")
 
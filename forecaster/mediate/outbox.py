@@ -0,0 +1,158 @@
+"""
+forecaster.mediate.outbox
+~~~~~~~~~~~~~~
+
+Queue of outbound messages drained by a sender thread.
+Callers never wait on chat I/O: messages arriving in a burst are merged
+into one digest, sends respect the per-chat rate limit and failed sends
+are retried with backoff after renewing the connection.
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+
+from forecaster.handler.retry import Backoff
+
+LOGGER = logging.getLogger('forecaster.mediate.outbox')
+
+MAX_LENGTH = 4096  # characters of a telegram message
+
+
+class Message(object):
+    """text to send, or item of a group merged by its digest function"""
+
+    def __init__(self, text=None, group=None, item=None, options=None):
+        self.text = text
+        self.group = group
+        self.item = item
+        self.options = options or {}  # reply_markup and other send options
+
+
+class Outbox(object):
+    """coalescing, rate limited queue of messages"""
+
+    def __init__(self, send, renew=None, min_interval=1.0, window=0.5, attempts=5,
+                 backoff=None):
+        self._send = send  # send(text, **options), raises on failure
+        self._renew = renew  # renew() checks connection before a retry
+        self.min_interval = min_interval  # seconds between sends to the chat
+        self.window = window  # seconds to wait for the rest of a burst
+        self.attempts = attempts
+        self.backoff = backoff if backoff is not None else Backoff(1.0, cap=30.0)
+        self.digests = {}  # group: func(items) -> text
+        self.sent = 0
+        self.delivered = 0  # messages, more than sent when merged
+        self.dropped = 0
+        self._queue = deque()
+        self._cond = threading.Condition()
+        self._running = False
+        self._thread = None
+        self._last_send = 0.0
+
+    def add_digest(self, group, func):
+        """merge items put in group with func(items) -> text"""
+        self.digests[group] = func
+
+    def put(self, text, **options):
+        """queue text, return immediately"""
+        self._push(Message(text=text, options=options))
+
+    def put_item(self, group, item):
+        """queue item of group, items of a burst are sent as one digest"""
+        self._push(Message(group=group, item=item))
+
+    def start(self):
+        with self._cond:
+            if self._running:
+                return
+            self._running = True
+        self._thread = threading.Thread(target=self._send_loop, name='outbox')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self, timeout=10.0):
+        """send queued messages and stop sender"""
+        with self._cond:
+            if not self._running:
+                return
+            self._running = False
+            self._cond.notify()
+        self._thread.join(timeout)
+
+    def stats(self):
+        return {'sent': self.sent, 'delivered': self.delivered, 'dropped': self.dropped,
+                'queued': len(self._queue)}
+
+    def _push(self, message):
+        with self._cond:
+            self._queue.append(message)
+            self._cond.notify()
+
+    def _send_loop(self):
+        while True:
+            with self._cond:
+                while self._running and not self._queue:
+                    self._cond.wait()
+                if not self._queue:
+                    return  # stopped and drained
+                running = self._running
+            if running:
+                time.sleep(self.window)  # let the burst arrive
+            self._wait_rate_limit()  # messages keep queueing
+            with self._cond:
+                batch = list(self._queue)
+                self._queue.clear()
+            for text, options, num in self._coalesce(batch):
+                self._deliver(text, options, num)
+
+    def _coalesce(self, batch):
+        """get [(text, options, number of messages)] in order of arrival,
+        items of a group become one digest, plain texts are joined"""
+        groups = {}  # group: items, digest sent where the first item was
+        parts = []  # [text, options, num] or group name
+        for message in batch:
+            if message.group is not None:
+                if message.group not in groups:
+                    groups[message.group] = []
+                    parts.append(message.group)
+                groups[message.group].append(message.item)
+            elif message.options:  # keyboards can't be merged
+                parts.append([message.text, message.options, 1])
+            elif (parts and isinstance(parts[-1], list) and not parts[-1][1] and
+                  len(parts[-1][0]) + len(message.text) + 2 <= MAX_LENGTH):
+                parts[-1][0] += '\n\n' + message.text
+                parts[-1][2] += 1
+            else:
+                parts.append([message.text[:MAX_LENGTH], {}, 1])
+        return [(self.digests[part](groups[part]), {}, len(groups[part]))
+                if not isinstance(part, list) else tuple(part) for part in parts]
+
+    def _wait_rate_limit(self):
+        wait = self._last_send + self.min_interval - time.monotonic()
+        if wait > 0:
+            time.sleep(wait)
+
+    def _deliver(self, text, options, num):
+        for attempt in range(self.attempts):
+            self._wait_rate_limit()
+            try:
+                self._send(text, **options)
+            except Exception as e:
+                LOGGER.warning("failed to send message: {}".format(e))
+                time.sleep(self.backoff.delay(attempt))
+                if self._renew is not None:
+                    try:
+                        self._renew()
+                    except Exception as e:
+                        LOGGER.warning("failed to renew connection: {}".format(e))
+                continue
+            finally:
+                self._last_send = time.monotonic()
+            self.sent += 1
+            self.delivered += num
+            return True
+        self.dropped += num
+        LOGGER.error("dropped {} messages after {} attempts".format(num, self.attempts))
+        return False
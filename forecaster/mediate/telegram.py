@@ -5,15 +5,20 @@ forecaster.mediate.telegram
 Handle telegram requests and interface with the service.
 """
 
+import datetime
 import json
 import logging
+import os.path
 import textwrap
 
 import telegram
 from forecaster.enums import ACTIONS
 from forecaster.handler import Client
+from forecaster.mediate.outbox import Outbox
+from forecaster.metrics import TELEGRAM_SECONDS, Metrics, summary
+from forecaster.profiling import Profiler
 from forecaster.patterns import Chainer
-from forecaster.utils import get_json, save_json
+from forecaster.utils import get_conf, get_json, save_json
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.error import TimedOut
 from telegram.ext import (CallbackQueryHandler, CommandHandler,
@@ -32,6 +37,19 @@ class TelegramMediator(Chainer):
         self.updater = Updater(token=token)
         self.dispatcher = self.updater.dispatcher
         self._handlers = []
+        self.outbox = self._make_outbox()
+
+    def _make_outbox(self):
+        """build queue of outbound messages from config"""
+        conf = get_conf()
+        mediate = conf['MEDIATE'] if conf.has_section('MEDIATE') else {}
+        outbox = Outbox(self._send, self.renew_connection,
+                        min_interval=float(mediate.get('min_interval', 1)),
+                        window=float(mediate.get('window', 0.5)))
+        outbox.add_digest('closed_pos', self._closed_digest)
+        Metrics().add_collector('outbox', lambda: {
+            'forecaster_telegram_' + key: value for key, value in outbox.stats().items()})
+        return outbox
 
     def handle_request(self, event, **kw):
         return self.pass_request(event, **kw)
@@ -70,6 +88,9 @@ class TelegramMediator(Chainer):
         self._add_command('closeall', self.cmd_close_all)
         self._add_command('valued', self.cmd_valued)
         self._add_command('results', self.cmd_results)
+        self._add_command('stats', self.cmd_stats)
+        self._add_command('profile', self.cmd_profile)
+        self._add_command('memory', self.cmd_memory)
         self._add_command('whoami', self.cmd_who_am_i)
         self._add_command('help', self.cmd_help)
         self._add_command('restart', self.cmd_restart)
@@ -79,6 +100,7 @@ class TelegramMediator(Chainer):
         for hand in self._handlers:
             self.dispatcher.add_handler(hand)
         self.updater.start_polling()  # listen to connections
+        self.outbox.start()
         LOGGER.debug("Telegram listening")
 
     def _add_command(self, name, func):
@@ -86,6 +108,7 @@ class TelegramMediator(Chainer):
 
     def deactivate(self):
         self.updater.stop()
+        self.outbox.stop()
         LOGGER.debug("Telegram stopped")
 
     def cmd_start(self, bot, update):
@@ -96,18 +119,15 @@ class TelegramMediator(Chainer):
 
     def cmd_stop(self, bot, update):
         LOGGER.debug("stop command caught")
-        self.renew_connection()
         self.handle_request(ACTIONS.STOP_BOT)
         self.send_msg("Bot stopped")
 
     def cmd_shutdown(self, bot, update):
         LOGGER.debug("shutdown command caught")
-        self.renew_connection()
         self.handle_request(ACTIONS.SHUTDOWN)
 
     def cmd_restart(self, bot, update):
         LOGGER.debug("restart command caught")
-        self.renew_connection()
         self.send_msg("Restarting...")
         self.handle_request(ACTIONS.STOP_BOT)
         self.handle_request(ACTIONS.START_BOT)
@@ -115,7 +135,6 @@ class TelegramMediator(Chainer):
 
     def cmd_help(self, bot, update):
         LOGGER.debug("help command caught")
-        self.renew_connection()
         text = textwrap.dedent("""\
             Forecaster uses his algorithm to predict more profitable moments to make transactions.
             These are all commands avaible:
@@ -128,6 +147,9 @@ class TelegramMediator(Chainer):
             - /restart: restart the bot
             - /results: print the results from start
             - /valued: print current values of transactions
+            - /stats: print latencies and counters
+            - /profile: start or stop the cpu profiler
+            - /memory: start or stop memory tracing
             - /closeall: close all positions
             - /changemode: change mode of handler""")
 
@@ -157,29 +179,60 @@ class TelegramMediator(Chainer):
 
     def cmd_results(self, bot, update):
         LOGGER.debug("results command caught")
-        self.renew_connection()
-        self.send_msg("Actual results are *{:.2f}*".format(Client().results))
+        client = Client()
+        journal = client.journal
+        journal.flush()  # include trades of last seconds
+        today = datetime.date.today()
+        month = today.replace(day=1)
+        text = "Actual results are *{:.2f}*".format(client.results)
+        text += "\ntoday: *{:.2f}* in {} trades".format(
+            *journal.total(client.mode, today, client.name))
+        text += "\nthis month: *{:.2f}* in {} trades".format(
+            *journal.total(client.mode, month, client.name))
+        for reason, profit, num in journal.aggregate(client.mode, 'checker', month, client.name):
+            text += "\n- {}: *{:.2f}* in {} trades".format(
+                (reason or 'manual').replace('_', ' '), profit, num)
+        for name, other in sorted(Client.instances().items()):
+            if name != client.name:
+                text += "\naccount {} ({}) this month: *{:.2f}* in {} trades".format(
+                    name, other.mode, *journal.total(other.mode, month, name))
+        self.send_msg(text)
 
     def cmd_valued(self, bot, update):
         LOGGER.debug("valued command caught")
-        self.renew_connection()
-        Client().refresh()
-        result = Client().api.account.funds['result']
-        num_pos = len(Client().api.account.positions)
-        self.send_msg(
-            "Actual value is *{:.2f}* with *{}* positions".format(result, num_pos))
+        snapshot = Client().snapshot()
+        result = snapshot.funds['result']
+        num_pos = len(snapshot.positions)
+        text = "Actual value is *{:.2f}* with *{}* positions".format(result, num_pos)
+        for name, client in sorted(Client.instances().items()):
+            if not client.default:
+                snapshot = client.snapshot()
+                text += "\naccount {} ({}): *{:.2f}* with *{}* positions".format(
+                    name, client.mode, snapshot.funds['result'], len(snapshot.positions))
+        self.send_msg(text)
+
+    def cmd_stats(self, bot, update):
+        LOGGER.debug("stats command caught")
+        self.send_msg("```\n{}\n```".format(summary()))
+
+    def cmd_profile(self, bot, update):
+        LOGGER.debug("profile command caught")
+        self._send_report(*Profiler().toggle_cpu())
+
+    def cmd_memory(self, bot, update):
+        LOGGER.debug("memory command caught")
+        self._send_report(*Profiler().toggle_memory())
+
+    def _send_report(self, path, text):
+        if path is None:
+            self.send_msg(text)
+        else:
+            self.send_msg("```\n{}\n```\nsaved to {}".format(text, os.path.basename(path)))
 
     def cmd_close_all(self, bot, update):
         LOGGER.debug("close_all command caught")
-        self.renew_connection()
-        Client().refresh()
         LOGGER.info("closing all positions")
-        old_results = Client().results
-        Client().close_all()
-        profit = Client().results - old_results
-        LOGGER.info("profit: {:.2f}".format(profit))
-        self.send_msg(
-            "Closed all positions with profit of *{:.2f}*".format(profit))
+        Client().close_all()  # summary notified by CLOSED_ALL
 
     def cmd_change_mode(self, bot, update):
         """change mode command"""
@@ -204,16 +257,44 @@ class TelegramMediator(Chainer):
 
     def close_pos(self, result):
         LOGGER.debug("close_position telegram")
-        self.renew_connection()
         LOGGER.debug("closed position - revenue of {:.2f}".format(result))
-        self.send_msg("Closed position with gain of *{:.2f}*".format(result))
+        self.outbox.put_item('closed_pos', result)  # a burst is sent as one digest
+
+    def _closed_digest(self, results):
+        if len(results) == 1:
+            return "Closed position with gain of *{:.2f}*".format(results[0])
+        return "Closed *{}* positions with gain of *{:.2f}*".format(len(results), sum(results))
+
+    def close_all(self, results):
+        LOGGER.debug("close_all telegram")
+        closed = [res for res in results if res.closed]
+        failed = [res for res in results if not res.closed]
+        profit = sum(res.result for res in closed)
+        LOGGER.info("profit: {:.2f}".format(profit))
+        text = "Closed *{}* positions with profit of *{:.2f}*".format(len(closed), profit)
+        if results:
+            latencies = sorted(res.latency for res in results)
+            text += "\nlatency: median *{:.2f}s*, max *{:.2f}s*".format(
+                latencies[len(latencies) // 2], latencies[-1])
+        for res in failed:
+            text += "\nfailed {} ({}): {}".format(res.id, res.instrument, res.error)
+        self.send_msg(text)
 
     def send_msg(self, text, **kw):
+        """queue message, sent by the outbox thread"""
+        self.outbox.put(text, **kw)
+
+    def _send(self, text, **kw):
         """send message with formatting"""
-        self.bot.send_message(chat_id=self.chat_id, text=text,
-                              parse_mode=telegram.ParseMode.MARKDOWN, **kw)
+        if getattr(self, 'chat_id', None) is None:
+            LOGGER.warning("no chat to send to: {}".format(text))
+            return
+        with TELEGRAM_SECONDS.time():
+            self.bot.send_message(chat_id=self.chat_id, text=text,
+                                  parse_mode=telegram.ParseMode.MARKDOWN, **kw)
 
     def renew_connection(self):
+        """check connection, called by outbox before retrying a send"""
         timeout = 5
         while timeout > 0:
             try:
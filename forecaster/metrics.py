@@ -0,0 +1,325 @@
+"""
+forecaster.metrics
+~~~~~~~~~~~~~~
+
+Counters, gauges and latency histograms.
+Updating a metric is a dict lookup and an addition under a lock, exposition
+in Prometheus text format is done only when scraped.
+Collectors are functions called at scrape time that return values already
+counted by other components (cache, retry policy, circuit breaker).
+"""
+
+import bisect
+import logging
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+from threading import Lock, Thread
+
+from forecaster.patterns import Singleton
+
+LOGGER = logging.getLogger('forecaster.metrics')
+
+# upper bounds in seconds, from a cached read to a slow api request
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class Metric(object):
+    """values by tuple of label values"""
+    kind = None
+
+    def __init__(self, name, doc, labels=()):
+        self.name = name
+        self.doc = doc
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = Lock()
+
+    def _key(self, labels):
+        return tuple(str(labels[name]) for name in self.labels)
+
+    def _format_labels(self, key, extra=()):
+        pairs = list(zip(self.labels, key)) + list(extra)
+        if not pairs:
+            return ''
+        return '{' + ','.join('{}="{}"'.format(name, value) for name, value in pairs) + '}'
+
+    def samples(self):
+        """get list of (suffix, labels string, value)"""
+        with self._lock:
+            return [('', self._format_labels(key), value)
+                    for key, value in sorted(self._values.items())]
+
+    def get(self, **labels):
+        return self._values.get(self._key(labels), 0.0)
+
+
+class Counter(Metric):
+    """monotonic count"""
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+
+class Gauge(Metric):
+    """value that goes up and down"""
+    kind = 'gauge'
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+
+class Histogram(Metric):
+    """count of observations in cumulative buckets"""
+    kind = 'histogram'
+
+    def __init__(self, name, doc, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, doc, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self._values.get(key)
+            if counts is None:  # [count per bucket and +Inf, sum]
+                counts = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            counts[index] += 1
+            counts[-1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        """observe seconds spent in block"""
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.observe(time.monotonic() - start, **labels)
+
+    def get(self, **labels):
+        """get (count, sum)"""
+        with self._lock:
+            counts = self._values.get(self._key(labels))
+            if counts is None:
+                return 0, 0.0
+            return sum(counts[:-1]), counts[-1]
+
+    def quantile(self, q, **labels):
+        """estimate quantile interpolating inside its bucket"""
+        with self._lock:
+            counts = self._values.get(self._key(labels))
+            counts = list(counts) if counts is not None else None
+        return self._quantile(q, counts)
+
+    def _quantile(self, q, counts):
+        if not counts or not sum(counts[:-1]):
+            return 0.0
+        rank = q * sum(counts[:-1])
+        cumulative = 0
+        for num, count in enumerate(counts[:-1]):
+            if count and cumulative + count >= rank:
+                if num == len(self.buckets):  # +Inf, best guess is last bound
+                    return self.buckets[-1]
+                lower = self.buckets[num - 1] if num else 0.0
+                return lower + (self.buckets[num] - lower) * (rank - cumulative) / count
+            cumulative += count
+        return self.buckets[-1]
+
+    def samples(self):
+        with self._lock:
+            items = [(key, list(counts)) for key, counts in sorted(self._values.items())]
+        samples = []
+        for key, counts in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), counts[:-1]):
+                cumulative += count
+                samples.append(('_bucket', self._format_labels(key, [('le', bound)]), cumulative))
+            samples.append(('_sum', self._format_labels(key), counts[-1]))
+            samples.append(('_count', self._format_labels(key), cumulative))
+        return samples
+
+    def summaries(self):
+        """get {label values: (count, mean, p50, p95)}"""
+        with self._lock:
+            items = [(key, list(counts)) for key, counts in sorted(self._values.items())]
+        result = {}
+        for key, counts in items:
+            count = sum(counts[:-1])
+            result[key] = (count, counts[-1] / count if count else 0.0,
+                           self._quantile(0.5, counts), self._quantile(0.95, counts))
+        return result
+
+
+class Metrics(metaclass=Singleton):
+    """registry of every metric of the process"""
+
+    def __init__(self):
+        self.metrics = {}  # name: Metric
+        self.collectors = {}  # name: func returning {metric name: value}
+        self._lock = Lock()
+
+    def counter(self, name, doc, labels=()):
+        return self._register(Counter, name, doc, labels)
+
+    def gauge(self, name, doc, labels=()):
+        return self._register(Gauge, name, doc, labels)
+
+    def histogram(self, name, doc, labels=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram, name, doc, labels, buckets=buckets)
+
+    def add_collector(self, name, func):
+        """func() returns {metric name: value} read at scrape time"""
+        with self._lock:
+            self.collectors[name] = func
+
+    def collect(self):
+        """get {metric name: value} of collectors"""
+        with self._lock:
+            collectors = list(self.collectors.items())
+        values = {}
+        for name, func in collectors:
+            try:
+                values.update(func())
+            except Exception as e:  # a broken component must not break scrapes
+                LOGGER.warning("collector {} failed: {}".format(name, e))
+        return values
+
+    def render(self):
+        """get Prometheus text exposition"""
+        with self._lock:
+            metrics = sorted(self.metrics.values(), key=lambda metric: metric.name)
+        lines = []
+        for metric in metrics:
+            lines.append('# HELP {} {}'.format(metric.name, metric.doc))
+            lines.append('# TYPE {} {}'.format(metric.name, metric.kind))
+            for suffix, labels, value in metric.samples():
+                lines.append('{}{}{} {}'.format(metric.name, suffix, labels, _number(value)))
+        for name, value in sorted(self.collect().items()):
+            lines.append('# TYPE {} gauge'.format(name))
+            lines.append('{} {}'.format(name, _number(value)))
+        return '\n'.join(lines) + '\n'
+
+    def _register(self, kind, name, doc, labels, **kw):
+        """get metric, created at first registration"""
+        with self._lock:
+            metric = self.metrics.get(name)
+            if metric is None:
+                metric = self.metrics[name] = kind(name, doc, labels, **kw)
+            elif not isinstance(metric, kind) or metric.labels != tuple(labels):
+                raise ValueError("metric {} already registered differently".format(name))
+            return metric
+
+
+def _number(value):
+    if isinstance(value, bool):
+        return '1' if value else '0'
+    return repr(float(value))
+
+
+# +----------------------------------------------------------------------+
+# | INSTRUMENTS                                                          |
+# +----------------------------------------------------------------------+
+API_SECONDS = Metrics().histogram(
+    'forecaster_api_seconds', "seconds of requests to trading212", ['operation'])
+API_ERRORS = Metrics().counter(
+    'forecaster_api_errors_total', "failed requests to trading212", ['operation'])
+ROUND_SECONDS = Metrics().histogram(
+    'forecaster_round_seconds', "seconds of transaction rounds", ['phase'])
+ROUND_LAG = Metrics().gauge(
+    'forecaster_round_lag_seconds', "delay of last round from its candle boundary")
+JOB_SECONDS = Metrics().histogram(
+    'forecaster_job_seconds', "seconds of scheduled jobs (rounds and sweeps)", ['job'])
+JOB_LAG = Metrics().histogram(
+    'forecaster_job_lag_seconds', "delay of scheduled jobs from their deadline", ['job'])
+MARGIN_CHECKS = Metrics().counter(
+    'forecaster_margin_checks_total', "orders checked by preserver", ['allowed'])
+GATEWAY_WAIT = Metrics().histogram(
+    'forecaster_gateway_wait_seconds', "seconds requests waited for the api", ['lane'])
+BUS_SECONDS = Metrics().histogram(
+    'forecaster_bus_seconds', "seconds of event handlers", ['event', 'handler'])
+TELEGRAM_SECONDS = Metrics().histogram(
+    'forecaster_telegram_seconds', "seconds to send telegram messages")
+
+
+# +----------------------------------------------------------------------+
+# | HTTP ENDPOINT                                                        |
+# +----------------------------------------------------------------------+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?')[0] != '/metrics':
+            self.send_error(404)
+            return
+        body = Metrics().render().encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        LOGGER.debug("metrics request: " + format % args)
+
+
+class _Server(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class MetricsServer(object):
+    """serve /metrics on a local port in a daemon thread"""
+
+    def __init__(self, host='127.0.0.1', port=9100):
+        self.host = host
+        self.port = port
+        self._server = None
+        self._thread = None
+
+    @property
+    def running(self):
+        return self._server is not None
+
+    def start(self):
+        if self._server is not None:
+            return
+        self._server = _Server((self.host, self.port), _Handler)
+        self.port = self._server.server_address[1]  # port 0 picks a free one
+        self._thread = Thread(target=self._server.serve_forever, name='metrics')
+        self._thread.daemon = True
+        self._thread.start()
+        LOGGER.debug("metrics served on {}:{}".format(self.host, self.port))
+
+    def stop(self):
+        if self._server is None:
+            return
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
+        self._server = self._thread = None
+        LOGGER.debug("metrics server stopped")
+
+
+def summary():
+    """get text summary of latencies and counters (for /stats)"""
+    lines = []
+    for metric in sorted(Metrics().metrics.values(), key=lambda metric: metric.name):
+        name = metric.name.replace('forecaster_', '')
+        if isinstance(metric, Histogram):
+            for key, (count, mean, p50, p95) in metric.summaries().items():
+                lines.append("{}{}: {} | mean {:.3f}s p50 {:.3f}s p95 {:.3f}s".format(
+                    name, '[' + ','.join(key) + ']' if key else '', count, mean, p50, p95))
+        else:
+            for _, labels, value in metric.samples():
+                lines.append("{}{}: {:g}".format(name, labels, value))
+    for name, value in sorted(Metrics().collect().items()):
+        lines.append("{}: {:g}".format(name.replace('forecaster_', ''), value))
+    return '\n'.join(lines) if lines else "no metrics yet"
@@ -6,6 +6,13 @@ Contains all design patterns.
 """
 
 import abc
+import logging
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from enum import Enum
+from threading import Lock, RLock
+
+LOGGER = logging.getLogger('forecaster.patterns')
 
 
 # +----------------------------------------------------------------------+
@@ -21,13 +28,43 @@ class Singleton(type):
     def __init__(cls, name, bases, attrs, **kwargs):
         super().__init__(name, bases, attrs)
         cls._instance = None
+        cls._instance_lock = RLock()
 
     def __call__(cls, *args, **kwargs):
         if cls._instance is None:
-            cls._instance = super().__call__(*args, **kwargs)
+            with cls._instance_lock:  # only one thread builds the instance
+                if cls._instance is None:
+                    cls._instance = super().__call__(*args, **kwargs)
         return cls._instance
 
 
+# -[ MULTITON ]-
+class Multiton(type):
+    """
+    One instance for every name keyword, Class() gets the 'default' one
+    as with a Singleton.
+    """
+
+    def __init__(cls, name, bases, attrs, **kwargs):
+        super().__init__(name, bases, attrs)
+        cls._instances = {}
+        cls._instance_lock = RLock()
+
+    def __call__(cls, *args, name='default', **kwargs):
+        instance = cls._instances.get(name)
+        if instance is None:
+            with cls._instance_lock:
+                instance = cls._instances.get(name)
+                if instance is None:
+                    instance = super().__call__(*args, name=name, **kwargs)
+                    cls._instances[name] = instance
+        return instance
+
+    def instances(cls):
+        """get {name: instance}"""
+        return dict(cls._instances)
+
+
 # -[ CHAINER ]-
 class Chainer():
     """
@@ -43,6 +80,9 @@ class Chainer():
         return chainer.handle_request(request, **kwargs)
 
     def pass_request(self, request, **kwargs):
+        bus = EventBus()
+        if bus.handles(request):  # straight to registered handlers
+            return bus.dispatch(request, **kwargs)
         if self._successor is not None:
             return self._successor.handle_request(request, **kwargs)
 
@@ -50,6 +90,88 @@ class Chainer():
         raise NotImplementedError()
 
 
+# -[ EVENT BUS ]-
+class MODE(Enum):
+    SYNC = 'sync'  # run by the thread that dispatched
+    ASYNC = 'async'  # run on the pool of the bus, dispatcher doesn't wait
+
+
+Route = namedtuple('Route', ['handler', 'mode', 'name'])
+
+
+class EventBus(metaclass=Singleton):
+    """
+    Dispatch table from EVENTS and ACTIONS to the handlers registered for
+    them. Sync handlers return the result of the request, async ones are
+    notifications run on a pool of workers.
+    """
+
+    def __init__(self, workers=4):
+        from forecaster.metrics import BUS_SECONDS
+        self.workers = workers
+        self.routes = {}  # event: (Route, ...)
+        self._seconds = BUS_SECONDS
+        self._executor = None
+        self._lock = Lock()
+
+    def subscribe(self, event, handler, mode=MODE.SYNC):
+        name = getattr(handler, '__qualname__', repr(handler))
+        with self._lock:  # tables are replaced, dispatch reads them without lock
+            self.routes[event] = self.routes.get(event, ()) + (Route(handler, mode, name),)
+
+    def unsubscribe(self, event, handler):
+        with self._lock:
+            routes = tuple(x for x in self.routes.get(event, ()) if x.handler != handler)
+            if routes:
+                self.routes[event] = routes
+            else:
+                self.routes.pop(event, None)
+
+    def clear(self):
+        with self._lock:
+            self.routes = {}
+
+    def handles(self, event):
+        return event in self.routes
+
+    def dispatch(self, event, **kw):
+        """run handlers of event, return first result of sync handlers"""
+        result = None
+        for route in self.routes.get(event, ()):
+            if route.mode == MODE.ASYNC:
+                self._pool().submit(self._run_async, route, event, kw)
+                continue
+            value = self._run(route, event, kw)
+            if result is None:
+                result = value
+        return result
+
+    def shutdown(self, wait=True):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait)
+
+    def _run(self, route, event, kw):
+        """call handler tracing its latency"""
+        with self._seconds.time(event=event.name, handler=route.name):
+            return route.handler(**kw)
+
+    def _run_async(self, route, event, kw):
+        try:
+            self._run(route, event, kw)
+        except Exception as e:
+            LOGGER.exception("{} failed on {}: {}".format(route.name, event.name, e))
+
+    def _pool(self):
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.workers, thread_name_prefix='bus')
+        return self._executor
+
+
 # -[ STATER ]-
 class StateContext():
     """
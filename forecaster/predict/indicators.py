@@ -0,0 +1,63 @@
+#!/usr/bin/env python
+
+"""
+forecaster.predict.indicators
+~~~~~~~~~~~~~~
+
+Array based indicators.
+Every function works on the last axis, so a (n_symbols x window) matrix
+computes all symbols in one call and a 1-d array computes a single one.
+"""
+
+import numpy as np
+
+
+def to_matrix(candles, field):
+    """convert a list of candles (or a list of lists of candles) to array"""
+    if candles and isinstance(candles[0], dict):
+        return np.array([candle[field] for candle in candles], dtype=float)
+    return np.array([[candle[field] for candle in row] for row in candles], dtype=float)
+
+
+def average_true_range(high, low):
+    """average true range as computed by predict.utils.AverageTrueRange"""
+    ranges = np.asarray(high, dtype=float) - np.asarray(low, dtype=float)
+    num = ranges.shape[-1]
+    if num < 2:
+        return np.zeros(ranges.shape[:-1])
+    # running mean of (num - 1) ranges starting from zero, unrolled as weights
+    weights = ((num - 1) / num) ** np.arange(num - 2, -1, -1) / num
+    return ranges[..., 1:] @ weights
+
+
+def regression(values):
+    """least-squared regression over x = 1..n, return (intercept, slope)"""
+    values = np.asarray(values, dtype=float)
+    num = values.shape[-1]
+    x = np.arange(1, num + 1, dtype=float)
+    x_mean = x.mean()
+    y_mean = values.mean(axis=-1)
+    x_dev = x - x_mean
+    slope = ((values - y_mean[..., None]) @ x_dev) / (x_dev @ x_dev)
+    intercept = y_mean - slope * x_mean
+    return intercept, slope
+
+
+def moving_average(values, period):
+    """simple moving average, return (..., n - period + 1) array"""
+    values = np.asarray(values, dtype=float)
+    cumsum = np.cumsum(values, axis=-1)
+    cumsum = np.concatenate([np.zeros(values.shape[:-1] + (1,)), cumsum], axis=-1)
+    return (cumsum[..., period:] - cumsum[..., :-period]) / period
+
+
+def band(close, high, low, mult):
+    """mean reversion band: regression intercept plus mult times ATR"""
+    intercept, _ = regression(close)
+    return intercept + mult * average_true_range(high, low)
+
+
+def sliding(values, window):
+    """view of every window of values, return (..., n - window + 1, window)"""
+    return np.lib.stride_tricks.sliding_window_view(
+        np.asarray(values, dtype=float), window, axis=-1)
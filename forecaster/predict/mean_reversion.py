@@ -10,9 +10,8 @@ Use a strategy pattern to work with a yml file.
 
 import logging
 
-from scipy import stats
-
-from forecaster.predict.utils import AverageTrueRange
+from forecaster.predict import indicators
+from forecaster.predict.streaming import StreamingBand
 from forecaster.enums import ACTIONS
 
 LOGGER = logging.getLogger('forecaster.predict.mean_reversion')
@@ -30,6 +29,31 @@ class MeanReversionPredicter(object):
         # linear least-squared regression
         band = self.get_band(candles)
         close = [x['close'] for x in candles][-1]
+        return self._compare(close, band)
+
+    def predict_many(self, candles):
+        """predict many symbols, return a {symbol: prediction} dict"""
+        groups = {}  # group windows of same length to compute them together
+        for symbol, window in candles.items():
+            groups.setdefault(len(window), []).append(symbol)
+        predictions = {}
+        for symbols in groups.values():
+            bands = self.get_bands([candles[sym] for sym in symbols])
+            for symbol, band in zip(symbols, bands):
+                close = candles[symbol][-1]['close']
+                predictions[symbol] = self._compare(close, float(band))
+        return predictions
+
+    def predict_stream(self, stream):
+        """predict from a StreamingBand"""
+        return self._compare(stream.close, stream.band)
+
+    def make_stream(self, count, timeframe=None):
+        """get streaming band of windows of count candles"""
+        return StreamingBand(count, self.mult, timeframe)
+
+    def _compare(self, close, band):
+        """compare last close with band"""
         diff = close - band  # get diff to display
         perc = 100 * (close / band - 1)  # get diff to display
         if close > band:
@@ -41,8 +65,12 @@ class MeanReversionPredicter(object):
 
     def get_band(self, candles):
         """get bolliger band"""
-        day_closes = [x['close'] for x in candles]
-        moving_average = stats.linregress(range(1, len(day_closes) + 1), day_closes)[1]
-        moving_dev = AverageTrueRange(candles)  # deviation function
-        band = moving_average + self.mult * moving_dev  # calculate Bolliger Band
-        return band
+        return float(self.get_bands([candles])[0])
+
+    def get_bands(self, candles_list):
+        """get bolliger bands of many symbols with windows of same length"""
+        closes = indicators.to_matrix(candles_list, 'close')
+        highs = indicators.to_matrix(candles_list, 'high')
+        lows = indicators.to_matrix(candles_list, 'low')
+        # linear regression as moving average and ATR as deviation function
+        return indicators.band(closes, highs, lows, self.mult)
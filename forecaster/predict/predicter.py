@@ -8,10 +8,12 @@ Facade class to predict working with algorithms.
 """
 
 import logging
+from contextlib import contextmanager
+from threading import Lock
 
 from forecaster.handler import Client
 from forecaster.predict.mean_reversion import MeanReversionPredicter
-from forecaster.utils import read_strategy
+from forecaster.utils import read_strategy, watch_strategy
 
 LOGGER = logging.getLogger('forecaster.predict')
 
@@ -20,12 +22,50 @@ class Predicter(object):
     """Adapter proxy class to interface with predictive algorithms"""
 
     def __init__(self, strat):
-        self.strategy = read_strategy(strat)
+        self.strategy = read_strategy(strat) if isinstance(strat, str) else strat
         strategy = {'mult': self.strategy['multiplier']}
         self.MeanReversion = MeanReversionPredicter(strategy)
+        self.streams = {}  # (symbol, count, timeframe): (StreamingBand, Lock)
+        self._lock = Lock()
+        if isinstance(strat, str):
+            watch_strategy(strat, self.configure)  # hot reload
         LOGGER.debug("Predicter initied")
 
+    def configure(self, strat):
+        """apply a new strategy, streams keep their statistics"""
+        self.strategy = strat
+        self.MeanReversion.mult = strat['multiplier']
+        with self._lock:
+            for stream, _ in self.streams.values():
+                stream.mult = strat['multiplier']
+        LOGGER.info("Predicter strategy updated")
+
     def predict(self, symbol, interval, timeframe):
-        candles = Client().get_last_candles(symbol, interval, timeframe)
-        prediction = self.MeanReversion.predict(candles)
-        return prediction
+        with self._stream(symbol, interval, timeframe) as stream:
+            return self.MeanReversion.predict_stream(stream)
+
+    def current_band(self, symbol, count, timeframe):
+        """get band of last count candles without recomputing from history"""
+        with self._stream(symbol, count, timeframe) as stream:
+            return stream.band
+
+    def current_atr(self, symbol, count, timeframe):
+        """get average true range of last count candles"""
+        with self._stream(symbol, count, timeframe) as stream:
+            return stream.atr.value
+
+    def predict_many(self, candles):
+        """predict every symbol of a {symbol: candles} dict in one pass"""
+        return self.MeanReversion.predict_many(candles)
+
+    @contextmanager
+    def _stream(self, symbol, count, timeframe):
+        """update streaming band with the newest candles and hold it"""
+        key = (symbol, count, timeframe)
+        with self._lock:
+            if key not in self.streams:
+                self.streams[key] = (self.MeanReversion.make_stream(count, timeframe), Lock())
+            stream, lock = self.streams[key]
+        with lock:
+            stream.update(Client().candles.get(symbol, stream.missing(), timeframe))
+            yield stream
@@ -0,0 +1,230 @@
+#!/usr/bin/env python
+
+"""
+forecaster.predict.streaming
+~~~~~~~~~~~~~~
+
+Streaming indicators.
+Rolling windows keep sufficient statistics and update them in constant
+time when a value arrives, the last value can be provisional (a candle
+still forming) and is rolled back when replaced.
+Results match the array functions in predict.indicators.
+"""
+
+import abc
+import time
+from collections import deque
+
+from forecaster.enums import TIMEFRAME
+
+
+class RollingWindow(metaclass=abc.ABCMeta):
+    """window of last size values with constant time updates"""
+
+    def __init__(self, size):
+        self.size = size
+        self.values = deque()
+        self._saved = None  # (state, dropped value) before provisional value
+        self._slides = 0  # slides since last full recompute
+
+    @property
+    def ready(self):
+        return len(self.values) == self.size
+
+    def push(self, value, provisional=False):
+        """add value, a provisional one is replaced by the next push"""
+        self.rollback()
+        full = self.ready
+        dropped = self.values.popleft() if full else None
+        if provisional:
+            self._saved = (self._state(), dropped)
+        self.values.append(value)
+        if full and self._slides < self.size:
+            self._slide(value, dropped)
+            self._slides += 1
+        else:  # warming up or resync of accumulated rounding errors
+            self._recompute()
+            self._slides = 0
+
+    def rollback(self):
+        """remove provisional value"""
+        if self._saved is None:
+            return
+        state, dropped = self._saved
+        self.values.pop()
+        if dropped is not None:
+            self.values.appendleft(dropped)
+        self._restore(state)
+        self._saved = None
+
+    @abc.abstractmethod
+    def _state(self):
+        """get statistics to restore after a provisional value"""
+        pass
+
+    @abc.abstractmethod
+    def _restore(self, state):
+        pass
+
+    @abc.abstractmethod
+    def _slide(self, value, dropped):
+        """update statistics with value in and dropped out"""
+        pass
+
+    @abc.abstractmethod
+    def _recompute(self):
+        """compute statistics from all values"""
+        pass
+
+
+class RollingStats(RollingWindow):
+    """moving mean and variance"""
+
+    def __init__(self, size):
+        super().__init__(size)
+        self.sum = 0.0
+        self.sum_sq = 0.0
+
+    @property
+    def mean(self):
+        return self.sum / len(self.values) if self.values else 0.0
+
+    @property
+    def variance(self):
+        if not self.values:
+            return 0.0
+        return max(self.sum_sq / len(self.values) - self.mean ** 2, 0.0)
+
+    def _state(self):
+        return (self.sum, self.sum_sq, self._slides)
+
+    def _restore(self, state):
+        self.sum, self.sum_sq, self._slides = state
+
+    def _slide(self, value, dropped):
+        self.sum += value - dropped
+        self.sum_sq += value * value - dropped * dropped
+
+    def _recompute(self):
+        self.sum = sum(self.values)
+        self.sum_sq = sum(x * x for x in self.values)
+
+
+class RollingRegression(RollingWindow):
+    """least-squared regression over x = 1..n as indicators.regression"""
+
+    def __init__(self, size):
+        super().__init__(size)
+        self.sum_y = 0.0
+        self.sum_xy = 0.0
+
+    @property
+    def slope(self):
+        num = len(self.values)
+        if num < 2:
+            return 0.0
+        x_mean = (num + 1) / 2
+        sum_xx = num * (num * num - 1) / 12  # centered sum of squares of x
+        return (self.sum_xy - x_mean * self.sum_y) / sum_xx
+
+    @property
+    def intercept(self):
+        num = len(self.values)
+        if not num:
+            return 0.0
+        return self.sum_y / num - self.slope * (num + 1) / 2
+
+    def _state(self):
+        return (self.sum_y, self.sum_xy, self._slides)
+
+    def _restore(self, state):
+        self.sum_y, self.sum_xy, self._slides = state
+
+    def _slide(self, value, dropped):
+        # every x decreases by one and the new value takes x = n
+        self.sum_xy += self.size * value - self.sum_y
+        self.sum_y += value - dropped
+
+    def _recompute(self):
+        self.sum_y = sum(self.values)
+        self.sum_xy = sum(x * y for x, y in enumerate(self.values, 1))
+
+
+class RollingATR(RollingWindow):
+    """average true range of ranges as indicators.average_true_range"""
+
+    def __init__(self, size):
+        super().__init__(size)
+        self.value = 0.0
+
+    def _state(self):
+        return (self.value, self._slides)
+
+    def _restore(self, state):
+        self.value, self._slides = state
+
+    def _slide(self, value, dropped):
+        # the first range of the window has no weight, weights are q ** age / n
+        num = self.size
+        if num < 2:
+            return
+        ratio = (num - 1) / num
+        leaving = self.values[0]  # had weight ratio ** (num - 2) / num
+        self.value = ratio * (self.value - leaving * ratio ** (num - 2) / num) + value / num
+
+    def _recompute(self):
+        num = len(self.values)
+        if num < 2:
+            self.value = 0.0
+            return
+        ratio = (num - 1) / num
+        ranges = list(self.values)[1:]
+        self.value = sum(rng * ratio ** age / num for age, rng in enumerate(reversed(ranges)))
+
+
+class StreamingBand(object):
+    """mean reversion band of a stream of raw candles"""
+
+    def __init__(self, count, mult, timeframe=None):
+        self.count = count
+        self.mult = mult
+        self.timeframe = timeframe
+        self.regression = RollingRegression(count)
+        self.atr = RollingATR(count)
+        self.close = None
+        self.last_timestamp = None  # of last candle, possibly still forming
+        self.provisional = False
+
+    @property
+    def ready(self):
+        return self.regression.ready
+
+    @property
+    def band(self):
+        """regression intercept plus mult times ATR"""
+        return self.regression.intercept + self.mult * self.atr.value
+
+    def push(self, candle, provisional=False):
+        """add candle of {open, high, low, close}"""
+        self.regression.push(candle['close'], provisional)
+        self.atr.push(candle['high'] - candle['low'], provisional)
+        self.close = candle['close']
+        self.provisional = provisional
+
+    def update(self, candles):
+        """feed raw candles (with timestamp and bid), the last is still forming"""
+        for num, candle in enumerate(candles):
+            timestamp = int(candle['timestamp'])
+            if self.last_timestamp is not None and timestamp < self.last_timestamp:
+                continue  # already final
+            if timestamp == self.last_timestamp and not self.provisional:
+                continue
+            self.push(candle['bid'], provisional=num == len(candles) - 1)
+            self.last_timestamp = timestamp
+
+    def missing(self):
+        """get number of raw candles needed to bring the band up to date"""
+        if not self.ready or self.last_timestamp is None or self.timeframe not in TIMEFRAME:
+            return self.count
+        elapsed = time.time() - self.last_timestamp / 1000
+        return min(max(int(elapsed // TIMEFRAME[self.timeframe]), 0) + 1, self.count)
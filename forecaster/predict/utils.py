@@ -7,9 +7,10 @@ forecaster.predict.utils
 Various utils to predicter.
 """
 
+from forecaster.predict import indicators
+
 
 def AverageTrueRange(candles):
-    ATR = 0.0
-    for candle in candles[1:]:
-        ATR = (ATR * (len(candles) - 1) + (candle['high'] - candle['low'])) / len(candles)
-    return ATR
+    high = indicators.to_matrix(candles, 'high')
+    low = indicators.to_matrix(candles, 'low')
+    return float(indicators.average_true_range(high, low))
@@ -0,0 +1,208 @@
+"""
+forecaster.profiling
+~~~~~~~~~~~~~~
+
+Profile the running process without restarting it.
+The CPU profiler is a thread that samples the stacks of every thread at a
+fixed interval, so the profiled code doesn't pay for tracing; memory is
+traced by tracemalloc and compared with the snapshot taken at start.
+Reports are written to the logs folder and a top-N summary is returned.
+"""
+
+import logging
+import os.path
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+
+from forecaster.patterns import Singleton
+
+LOGGER = logging.getLogger('forecaster.profiling')
+
+LOGS_FOLDER = os.path.join(os.path.dirname(__file__), 'logs')
+
+
+class SamplingProfiler(object):
+    """count stacks of every thread each interval seconds"""
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.stacks = Counter()  # (thread name, frames from root): samples
+        self.samples = 0
+        self.started = None
+        self.elapsed = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def running(self):
+        return self._thread is not None
+
+    def start(self):
+        self.stacks.clear()
+        self.samples = 0
+        self.started = time.monotonic()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._sample_loop, name='profiler')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+        self.elapsed = time.monotonic() - self.started
+
+    def _sample_loop(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                self.stacks[(names.get(ident, str(ident)), _walk(frame))] += 1
+            self.samples += 1
+
+    def collapsed(self):
+        """get stacks in collapsed format (input of flamegraph.pl)"""
+        return ['{};{} {}'.format(thread, ';'.join(stack), count)
+                for (thread, stack), count in self.stacks.most_common()]
+
+    def top(self, num=10):
+        """get [(function, self samples, total samples)] by total samples"""
+        own, total = Counter(), Counter()
+        for (_, stack), count in self.stacks.items():
+            if stack:
+                own[stack[-1]] += count
+            for func in set(stack):
+                total[func] += count
+        return [(func, own[func], count) for func, count in total.most_common(num)]
+
+    def threads(self):
+        """get {thread name: samples not idle}"""
+        busy = Counter()
+        for (thread, stack), count in self.stacks.items():
+            if stack and not _is_idle(stack[-1]):
+                busy[thread] += count
+        return busy
+
+
+def _walk(frame):
+    """get tuple of 'function (file:line of definition)' from root to frame"""
+    stack = []
+    while frame is not None:
+        code = frame.f_code
+        stack.append('{} ({}:{})'.format(
+            code.co_name, os.path.basename(code.co_filename), code.co_firstlineno))
+        frame = frame.f_back
+    return tuple(reversed(stack))
+
+
+def _is_idle(func):
+    """True if thread is blocked waiting"""
+    return func.startswith(('wait ', 'select ', 'poll ', '_worker ', 'get ', 'sleep '))
+
+
+class Profiler(metaclass=Singleton):
+    """on-demand CPU and memory profiling of the process"""
+
+    def __init__(self, folder=LOGS_FOLDER):
+        self.folder = folder
+        self.cpu = None  # SamplingProfiler while running
+        self.memory_start = None  # tracemalloc snapshot taken at start
+        self._lock = threading.Lock()
+
+    @property
+    def cpu_running(self):
+        return self.cpu is not None
+
+    @property
+    def memory_running(self):
+        return self.memory_start is not None
+
+    def start_cpu(self, interval=0.005):
+        with self._lock:
+            if self.cpu is not None:
+                return False
+            self.cpu = SamplingProfiler(interval)
+            self.cpu.start()
+        LOGGER.info("cpu profiler started")
+        return True
+
+    def stop_cpu(self, top=10):
+        """stop sampling, write report and return (path, summary)"""
+        with self._lock:
+            if self.cpu is None:
+                return None, "cpu profiler not running"
+            profiler, self.cpu = self.cpu, None
+        profiler.stop()
+        path = self._path('cpu')
+        with open(path, 'w') as report:
+            report.write('\n'.join(profiler.collapsed()) + '\n')
+        lines = ["cpu profile: {} samples in {:.1f}s".format(profiler.samples, profiler.elapsed)]
+        for func, own, total in profiler.top(top):
+            lines.append("{:5.1f}% {:5.1f}% {}".format(
+                100 * total / max(profiler.samples, 1),
+                100 * own / max(profiler.samples, 1), func))
+        lines.append("busy threads:")
+        for thread, count in profiler.threads().most_common(top):
+            lines.append("{:5.1f}% {}".format(100 * count / max(profiler.samples, 1), thread))
+        LOGGER.info("cpu profile written to {}".format(path))
+        return path, '\n'.join(lines)
+
+    def toggle_cpu(self, top=10):
+        """start cpu profiler or stop it and return (path, summary)"""
+        if self.start_cpu():
+            return None, "cpu profiler started"
+        return self.stop_cpu(top)
+
+    def start_memory(self, frames=10):
+        with self._lock:
+            if self.memory_start is not None:
+                return False
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(frames)
+            self.memory_start = tracemalloc.take_snapshot()
+        LOGGER.info("memory tracing started")
+        return True
+
+    def snapshot_memory(self, top=10, stop=False):
+        """write growth since start, return (path, summary)"""
+        with self._lock:
+            if self.memory_start is None:
+                return None, "memory tracing not running"
+            start = self.memory_start
+            snapshot = tracemalloc.take_snapshot()
+            current, peak = tracemalloc.get_traced_memory()
+            if stop:
+                self.memory_start = None
+                tracemalloc.stop()
+        filters = [tracemalloc.Filter(False, tracemalloc.__file__)]
+        stats = snapshot.filter_traces(filters).compare_to(
+            start.filter_traces(filters), 'lineno')
+        path = self._path('memory')
+        with open(path, 'w') as report:
+            report.write('\n'.join(str(stat) for stat in stats) + '\n')
+        lines = ["memory: current {:.1f} KiB, peak {:.1f} KiB".format(
+            current / 1024, peak / 1024)]
+        for stat in stats[:top]:
+            frame = stat.traceback[0]
+            lines.append("{:+.1f} KiB ({:+d}) {}:{}".format(
+                stat.size_diff / 1024, stat.count_diff,
+                os.path.basename(frame.filename), frame.lineno))
+        LOGGER.info("memory report written to {}".format(path))
+        return path, '\n'.join(lines)
+
+    def toggle_memory(self, top=10):
+        """start memory tracing or stop it and return (path, summary)"""
+        if self.start_memory():
+            return None, "memory tracing started"
+        return self.snapshot_memory(top, stop=True)
+
+    def _path(self, kind):
+        if not os.path.isdir(self.folder):
+            os.makedirs(self.folder)
+        return os.path.join(self.folder, 'profile-{}-{}.txt'.format(
+            kind, time.strftime('%Y%m%d-%H%M%S')))
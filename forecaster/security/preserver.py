@@ -5,11 +5,17 @@ forecaster.security.preserver
 ~~~~~~~~~~~~~~
 
 Facade class to preserve profits.
+Margins are cached for margin_ttl seconds and during a transaction round
+funds are read once, every approved order reserves its margin.
+With worker processes margin is reserved on a budget shared by all of them.
 """
 
 import logging
+import time
+from threading import Lock
 
 from forecaster.handler import Client
+from forecaster.metrics import MARGIN_CHECKS, Metrics
 
 LOGGER = logging.getLogger('forecaster.predict')
 
@@ -17,25 +23,106 @@ LOGGER = logging.getLogger('forecaster.predict')
 class Preserver(object):
     """module that preserve funds"""
 
-    def __init__(self, strat):
+    def __init__(self, strat, client=None, budget=None):
+        self._client = client  # None is the default account
+        self.budget = budget  # MarginBudget of worker processes
+        self.configure(strat)
+        self.margins = {}  # (symbol, quantity): (time, margin)
+        self.margin_hits = 0
+        self.margin_misses = 0
+        self._round = None  # [funds, reserved margin] of current round
+        self._lock = Lock()
+        if client is None:
+            Metrics().add_collector('preserver', lambda: {
+                'forecaster_margin_cache_' + key: value for key, value in self.stats().items()})
+        LOGGER.debug("Preserver initied")
+
+    @property
+    def client(self):
+        return self._client if self._client is not None else Client()
+
+    def configure(self, strat):
+        """read strategy values"""
         self.strategy = strat['preserver']
         self.funds_risk = self.strategy['funds_risk']
-        LOGGER.debug("Preserver initied")
+        self.margin_ttl = self.strategy.get('margin_ttl', 60)
+        self.budget_ttl = self.strategy.get('budget_ttl', 10)  # seconds between funds reads
 
     def check_margin(self, symbol, quantity):
         """check if margin allows more buys"""
-        free = self.get_free_margin()
-        to_use = Client().get_margin(symbol, quantity)
-        if to_use <= free:
-            return True
-        else:
-            return False
+        return self.check_margins([(symbol, quantity)])[0]
+
+    def check_margins(self, orders):
+        """check list of (symbol, quantity) against one read of funds"""
+        to_use = [self.get_margin(symbol, quantity) for symbol, quantity in orders]
+        if self.budget is not None:
+            allowed = self.budget.reserve(
+                to_use, self.funds_risk, self._read_funds, self.budget_ttl)
+            for result in allowed:
+                MARGIN_CHECKS.inc(allowed=result)
+            return allowed
+        with self._lock:
+            if self._round is not None:
+                funds, reserved = self._round
+            else:
+                funds, reserved = self._read_funds(), 0.0
+            allowed = []
+            for margin in to_use:
+                if margin <= self._available(funds) - reserved:
+                    reserved += margin
+                    allowed.append(True)
+                else:
+                    allowed.append(False)
+            if self._round is not None:
+                self._round[1] = reserved
+        for result in allowed:
+            MARGIN_CHECKS.inc(allowed=result)
+        return allowed
+
+    def get_margin(self, symbol, quantity):
+        """get margin of order, cached for margin_ttl seconds"""
+        key = (symbol, quantity)
+        cached = self.margins.get(key)
+        if cached is not None and time.monotonic() - cached[0] < self.margin_ttl:
+            self.margin_hits += 1
+            return cached[1]
+        self.margin_misses += 1
+        margin = self.client.get_margin(symbol, quantity)
+        self.margins[key] = (time.monotonic(), margin)
+        return margin
 
     def get_free_margin(self):
         """get free margin left"""
-        Client().refresh()
-        total_funds = Client().funds['total']
-        free_funds = Client().funds['free']
+        if self.budget is not None:
+            return self.budget.free(self.funds_risk)
+        with self._lock:
+            if self._round is not None:
+                return max(self._available(self._round[0]) - self._round[1], 0)
+        return max(self._available(self._read_funds()), 0)
+
+    def begin_round(self):
+        """read funds once for the orders of a transaction round"""
+        if self.budget is not None:  # read by budget for every process
+            return
+        funds = self._read_funds()
+        with self._lock:
+            self._round = [funds, 0.0]
+
+    def end_round(self):
+        with self._lock:
+            self._round = None
+
+    def stats(self):
+        """get counters of margin cache"""
+        return {'hits': self.margin_hits, 'misses': self.margin_misses,
+                'cached': len(self.margins)}
+
+    def _read_funds(self):
+        """get (total, free) funds from shared snapshot"""
+        funds = self.client.snapshot().funds
+        return funds['total'], funds['free']
+
+    def _available(self, funds):
+        total_funds, free_funds = funds
         used_funds = total_funds - free_funds
-        avaible_margin = self.funds_risk * total_funds - used_funds
-        return max(avaible_margin, 0)
+        return self.funds_risk * total_funds - used_funds
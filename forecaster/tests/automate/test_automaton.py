@@ -0,0 +1,114 @@
+from types import SimpleNamespace
+
+import pytest
+
+from forecaster.automate.automaton import Automaton
+from forecaster.automate.checkers import FixedChecker
+from forecaster.automate.scheduler import OVERRUN
+from forecaster.enums import ACTIONS
+from forecaster.handler.aio import AsyncClient
+from forecaster.handler.retry import RetryPolicy
+
+STRATEGY = {
+    'count': 5, 'currencies': ['EURUSD', 'GBPUSD'], 'fix_trend': True,
+    'fixed_quantity': 5000, 'overrun': 'skip', 'sleep_transactions': 60,
+    'timeframe': '1h', 'workers': 2,
+    'preserver': {'funds_risk': 0.5, 'margin_ttl': 60},
+    'checkers': {'activate': []}}
+
+
+class Bot(object):
+    def handle_request(self, event, candles):
+        assert event == ACTIONS.PREDICT_MANY
+        return {'EURUSD': ACTIONS.BUY, 'GBPUSD': ACTIONS.BUY}
+
+
+class Account(object):
+    """account with a sell position of EURUSD, 400 of margin left"""
+
+    def __init__(self):
+        self.funds = {'total': 1000, 'free': 900}
+        self.positions = [SimpleNamespace(id='1', instrument='EURUSD', mode='sell')]
+        self.moves = []
+        self.candles = SimpleNamespace(last_timestamp=lambda symbol, timeframe: None)
+        self.retry_policy = RetryPolicy()
+
+    def refresh(self):
+        pass
+
+    def get_last_candles(self, symbol, num, timeframe):
+        return [1.0] * num
+
+    def get_margin(self, symbol, quantity):
+        return quantity / 10
+
+    def snapshot(self):
+        by_instrument = {}
+        for pos in self.positions:
+            by_instrument.setdefault(pos.instrument, []).append(pos)
+        return SimpleNamespace(funds=self.funds, positions=self.positions,
+                               by_instrument=by_instrument)
+
+    def close_pos(self, pos, reason=None):
+        self.moves.append(('close', pos.instrument, reason))
+        self.positions.remove(pos)
+        self.funds = {'total': 1000, 'free': 1000}
+
+    def open_pos(self, symbol, mode, quantity):
+        self.moves.append(('open', symbol, mode))
+
+    def try_open(self, symbol, mode, quantity):
+        self.open_pos(symbol, mode, quantity)
+
+    def try_close(self, pos, notify=True, reason=None):
+        self.close_pos(pos, reason)
+
+
+@pytest.fixture(params=['threads', 'async'])
+def automaton(request):
+    account = Account()
+    automaton = Automaton(dict(STRATEGY), Bot(), account)
+    if request.param == 'async':
+        automaton.aclient = AsyncClient(account, workers=2)
+    yield automaton
+    if automaton.aclient is not None:
+        automaton.aclient.shutdown()
+
+
+def test_trend_fixed_before_margin_check(automaton, caplog):
+    account = automaton.client
+    automaton.run_round()
+    assert account.moves[0] == ('close', 'EURUSD', 'trend')
+    assert sorted(account.moves[1:]) == [('open', 'EURUSD', 'buy'), ('open', 'GBPUSD', 'buy')]
+    # margin of EURUSD was freed by the close, GBPUSD is opened anyway
+    warnings = [rec for rec in caplog.records if 'missing funds' in rec.getMessage()]
+    assert len(warnings) == 1
+
+
+def test_async_sweep(automaton):
+    account = automaton.client
+    account.positions[0].result = 30
+    checker = FixedChecker({'sleep': 1, 'overrun': 'skip', 'gain': 20, 'loss': -5},
+                           automaton.positioner)
+    checker.run_sweep()
+    assert account.moves == [('close', 'EURUSD', 'FixedChecker')]
+
+
+def test_strategy_without_workers():
+    account = Account()
+    strategy = {key: value for key, value in STRATEGY.items() if key != 'workers'}
+    automaton = Automaton(strategy, Bot(), account)
+    automaton.complete_round()
+    assert len(account.moves) == 3
+
+
+def test_strategy_without_overrun():
+    strategy = {key: value for key, value in STRATEGY.items() if key != 'overrun'}
+    automaton = Automaton(strategy, Bot(), Account())
+    job = automaton._schedule(delay=3600)
+    try:
+        assert job.overrun == OVERRUN.SKIP
+        checker = FixedChecker({'sleep': 1, 'gain': 20, 'loss': -5}, automaton.positioner)
+        assert checker.overrun == OVERRUN.SKIP
+    finally:
+        job.cancel()
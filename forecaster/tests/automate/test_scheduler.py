@@ -0,0 +1,47 @@
+import time
+from threading import Event
+
+from forecaster.automate.scheduler import OVERRUN, Job, Scheduler
+
+
+def test_next_deadline():
+    skip = Job(None, 10, OVERRUN.SKIP, 'skip')
+    catch_up = Job(None, 10, OVERRUN.CATCH_UP, 'catch_up')
+    coalesce = Job(None, 10, OVERRUN.COALESCE, 'coalesce')
+    assert Scheduler()._next_deadline(skip, 0, 5) == 10
+    assert Scheduler()._next_deadline(skip, 0, 25) == 30
+    assert skip.missed == 2
+    assert Scheduler()._next_deadline(catch_up, 0, 25) == 10
+    assert Scheduler()._next_deadline(coalesce, 0, 25) == 25
+
+
+def test_missed_ticks_counted_once():
+    catch_up = Job(None, 1, OVERRUN.CATCH_UP, 'catch_up')
+    assert Scheduler()._next_deadline(catch_up, 0, 3.5) == 1
+    assert catch_up.missed == 3  # ticks 1, 2 and 3
+    assert Scheduler()._next_deadline(catch_up, 1, 3.6) == 2
+    assert catch_up.missed == 3
+    assert Scheduler()._next_deadline(catch_up, 2, 5.2) == 3
+    assert catch_up.missed == 5  # and 4, 5
+
+
+def test_periodic_run():
+    done = Event()
+    calls = []
+
+    def job():
+        calls.append(time.monotonic())
+        if len(calls) == 3:
+            done.set()
+
+    handle = Scheduler().every(0.02, job)
+    assert done.wait(2)
+    handle.cancel()
+    assert len(calls) >= 3
+
+
+def test_stop_wakes_immediately():
+    Scheduler().every(3600, lambda: None, delay=3600)
+    start = time.monotonic()
+    Scheduler().stop()
+    assert time.monotonic() - start < 1
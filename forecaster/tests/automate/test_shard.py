@@ -0,0 +1,113 @@
+import logging
+import multiprocessing
+import threading
+import time
+from collections import Counter
+from types import SimpleNamespace
+
+from forecaster.automate.checkers import FixedChecker
+from forecaster.automate.shard import Coordinator, MarginBudget, Shard, _log_record, shard_of
+from forecaster.enums import EVENTS
+from forecaster.security import Preserver
+
+SYMBOLS = ['SYM{:03d}'.format(num) for num in range(300)]
+
+
+def read_funds():
+    return 1000.0, 900.0  # 400 available with funds_risk 0.5
+
+
+def reserve(budget, margins, results):
+    results.put(budget.reserve(margins, 0.5, read_funds, 60))
+
+
+def test_instruments_split():
+    shards = [Shard(index, 4) for index in range(4)]
+    selected = [shard.select({'currencies': SYMBOLS})['currencies'] for shard in shards]
+    assert sorted(sum(selected, [])) == SYMBOLS  # every symbol in one shard
+    assert min(len(symbols) for symbols in selected) > 50
+    assert all(shards[shard_of(sym, 4)].owns(sym) for sym in SYMBOLS)
+
+
+def test_checker_sweeps_own_positions():
+    positions = [SimpleNamespace(id=sym, instrument=sym, result=50) for sym in SYMBOLS]
+    closed = Counter()
+
+    class Positioner(object):
+        shard = Shard(1, 4)
+        client = SimpleNamespace(snapshot=lambda: SimpleNamespace(positions=positions))
+
+        def handle_request(self, event, pos, checker):
+            closed[shard_of(pos.instrument, 4)] += 1
+
+    checker = FixedChecker({'sleep': 1, 'overrun': 'skip', 'gain': 20, 'loss': -5}, Positioner())
+    checker.sweep()
+    assert list(closed) == [1]
+
+
+def test_budget_shared_by_processes():
+    context = multiprocessing.get_context('spawn')
+    budget, results = MarginBudget(context), context.Queue()
+    workers = [context.Process(target=reserve, args=(budget, [150, 150], results))
+               for _ in range(2)]
+    for worker in workers:
+        worker.start()
+    allowed = sum((results.get(timeout=30) for _ in workers), [])
+    for worker in workers:
+        worker.join()
+    assert allowed.count(True) == 2  # 400 of margin for 4 orders of 150
+    assert budget.free(0.5) == 100
+
+
+def test_preserver_on_budget():
+    budget = MarginBudget()
+    strat = {'preserver': {'funds_risk': 0.5, 'margin_ttl': 60}}
+    client = SimpleNamespace(get_margin=lambda symbol, quantity: quantity / 10,
+                             snapshot=lambda: SimpleNamespace(funds={'total': 1000, 'free': 900}))
+    first, second = Preserver(strat, client, budget), Preserver(strat, client, budget)
+    first.begin_round()
+    assert first.check_margins([('A', 3000)]) == [True]
+    assert second.check_margins([('B', 2000), ('C', 1000)]) == [False, True]
+    assert first.get_free_margin() == 0
+
+
+def test_relayed_records_respect_levels(monkeypatch):
+    handled = []
+    logger = logging.getLogger('library.connectionpool')  # debug of a library in a worker
+    logger.setLevel(logging.WARNING)
+    monkeypatch.setattr(logger, 'handle', handled.append)
+    _log_record(logging.makeLogRecord({'name': logger.name, 'levelno': logging.DEBUG}))
+    _log_record(logging.makeLogRecord({'name': logger.name, 'levelno': logging.ERROR}))
+    assert [record.levelno for record in handled] == [logging.ERROR]
+
+
+def test_funds_read_outside_lock():
+    budget, reading = MarginBudget(), threading.Event()
+
+    def slow_funds():
+        reading.set()
+        time.sleep(0.3)
+        return read_funds()
+
+    worker = threading.Thread(target=budget.reserve, args=([100], 0.5, slow_funds, 60))
+    worker.start()
+    assert reading.wait(2)
+    start = time.monotonic()
+    assert budget.free(0.5) == 0  # not read yet, but not waiting for the api
+    assert time.monotonic() - start < 0.1
+    worker.join()
+    assert budget.reserve([100], 0.5, slow_funds, 60) == [True]  # read once
+    assert budget.free(0.5) == 200
+
+
+def test_worker_errors_are_not_raised():
+    requests, stopped = [], []
+
+    class Bot(object):
+        def handle_request(self, event, **kw):
+            requests.append(event)  # Bot.connection_error raises again
+
+    coordinator = Coordinator('automate', Bot(), 2)
+    coordinator.handlers[EVENTS.CONNECTION_ERROR] = lambda: stopped.append(True)
+    coordinator._notify((0, EVENTS.CONNECTION_ERROR, {}))
+    assert stopped == [True] and requests == []
@@ -0,0 +1,46 @@
+import numpy as np
+
+from forecaster.backtest import Backtester, Series
+
+HOUR = 3600 * 1000
+
+
+def make_strategy(activate=()):
+    return {
+        'count': 5, 'timeframe': '1h', 'sleep_transactions': 3600, 'fix_trend': True,
+        'fixed_quantity': 1000, 'preserver': {'funds_risk': 0.5},
+        'checkers': {'activate': list(activate),
+                     'fixed': {'sleep': 60, 'gain': 20, 'loss': -5}}}
+
+
+def make_series(closes):
+    closes = np.array(closes, dtype=float)
+    return Series(np.arange(len(closes), dtype=np.int64) * HOUR, closes,
+                  closes + 0.001, closes - 0.001, closes)
+
+
+def test_fix_trend():
+    series = make_series(np.r_[np.linspace(1.0, 1.1, 20), np.linspace(1.1, 1.0, 20)])
+    report = Backtester(make_strategy(), {'multiplier': 2}).run({'EURUSD': series}, '1h')
+    assert report.trades
+    assert {trade.reason for trade in report.trades} <= {'fix_trend', 'end'}
+    for trade in report.trades:
+        assert trade.close_time >= trade.open_time
+
+
+def test_fixed_checker():
+    series = make_series(np.linspace(1.0, 1.5, 60))
+    strategy = make_strategy(['fixed'])
+    strategy['fix_trend'] = False
+    report = Backtester(strategy, {'multiplier': 2}).run({'EURUSD': series}, '1h')
+    for trade in report.trades:
+        if trade.reason == 'fixed':
+            assert trade.result >= 20 or trade.result <= -5
+
+
+def test_margin_rejection():
+    series = make_series(np.linspace(1.0, 1.1, 40))
+    report = Backtester(make_strategy(), {'multiplier': 2}, funds=100.0).run(
+        {'EURUSD': series}, '1h')
+    assert report.rejected > 0
+    assert report.summary()['trades'] == len(report.trades)
@@ -0,0 +1,30 @@
+from forecaster.bench import compare
+from forecaster.bench.market import MarketGenerator, SyntheticAPI
+
+
+def make_results(**medians):
+    return {'results': {name: {'median': value} for name, value in medians.items()}}
+
+
+def test_compare():
+    baseline = make_results(atr=1.0, predict=1.0, sweep=1.0)
+    current = make_results(atr=1.5, predict=0.5, sweep=1.05, new=1.0)
+    comparison = compare(current, baseline, tolerance=0.1)
+    assert comparison['atr']['status'] == 'slower'
+    assert comparison['predict']['status'] == 'faster'
+    assert comparison['sweep']['status'] == 'same'
+    assert 'new' not in comparison
+
+
+def test_synthetic_api():
+    market = MarketGenerator(3, length=50)
+    api = SyntheticAPI(market, num_positions=6)
+    assert len(api.positions) == 6
+    candles = api.get_historical_data('SYM00001', 10, '1h')
+    assert len(candles) == 10
+    assert candles[-1]['bid']['close'] == market.last_price('SYM00001')
+    assert candles[1]['timestamp'] - candles[0]['timestamp'] == 3600 * 1000
+    api.open_position('buy', 'SYM00002', 1000)
+    assert len(api.positions) == 7
+    api.close_position('0')
+    assert '0' not in [pos.id for pos in api.positions]
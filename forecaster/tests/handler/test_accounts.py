@@ -0,0 +1,43 @@
+from types import SimpleNamespace
+
+import pytest
+
+from forecaster.automate.checkers import FixedChecker
+from forecaster.automate.positioner import Positioner
+from forecaster.handler import Client
+from forecaster.patterns import Multiton
+
+
+@pytest.fixture
+def other():
+    client = Client(name='other', mode='live')
+    yield client
+    Client._instances.pop('other')
+
+
+def test_multiton():
+    class Account(metaclass=Multiton):
+        def __init__(self, name):
+            self.name = name
+
+    assert Account() is Account(name='default')
+    assert Account(name='live') is Account(name='live')
+    assert Account(name='live') is not Account()
+    assert sorted(Account.instances()) == ['default', 'live']
+
+
+def test_market_data_is_shared(other):
+    assert other is Client(name='other') and other is not Client()
+    assert other.mode == 'live' and other.api is not Client().api
+    assert other.gateway is not Client().gateway  # requests of account
+    assert other.candles is Client().candles  # one download for every account
+    assert other.journal is Client().journal
+
+
+def test_components_use_their_account(other):
+    automaton = SimpleNamespace(client=other)
+    positioner = Positioner({'checkers': {'activate': []}}, automaton)
+    assert positioner.client is other
+    checker = FixedChecker({'sleep': 1, 'overrun': 'skip', 'gain': 1, 'loss': 1}, positioner)
+    assert checker.client is other
+    assert Positioner({'checkers': {'activate': []}}).client is Client()
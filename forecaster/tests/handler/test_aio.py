@@ -0,0 +1,56 @@
+import asyncio
+import time
+from collections import Counter
+from threading import Lock
+
+from forecaster.handler.aio import AsyncClient
+from forecaster.handler.retry import Backoff, RetryPolicy
+
+
+class FakeClient(object):
+    """every order fails once with a retry delay"""
+
+    def __init__(self, delay):
+        self.retry_policy = RetryPolicy({ValueError: Backoff(delay, jitter=0)})
+        self.attempts = Counter()
+        self.opened = []
+        self.refreshes = 0
+        self._lock = Lock()
+
+    def refresh(self):
+        self.refreshes += 1
+
+    def try_open(self, symbol, mode, quantity):
+        with self._lock:
+            self.attempts[symbol] += 1
+            if self.attempts[symbol] == 1:
+                return ValueError("busy")
+            self.opened.append(symbol)
+
+    def get_last_candles(self, symbol, num, timeframe):
+        return [{'close': 1.0}] * num
+
+
+def test_orders_retry_without_threads():
+    client = FakeClient(delay=0.2)
+    aclient = AsyncClient(client, workers=2)
+
+    async def main():
+        futures = [aclient.submit_open('SYM{}'.format(num), 'buy', 1) for num in range(100)]
+        assert aclient.in_flight == 100
+        await asyncio.gather(*futures)
+
+    start = time.monotonic()
+    asyncio.run(main())
+    # waits overlap on the loop, with blocking sleeps they would take 100 * 0.2 / 2 seconds
+    assert time.monotonic() - start < 2
+    assert len(client.opened) == 100
+    assert aclient.in_flight == 0
+    aclient.shutdown()
+
+
+def test_candles():
+    aclient = AsyncClient(FakeClient(0), workers=1)
+    candles = asyncio.run(aclient.get_last_candles('EURUSD', 3, '1h'))
+    assert len(candles) == 3
+    aclient.shutdown()
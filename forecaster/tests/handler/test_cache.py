@@ -0,0 +1,46 @@
+import time
+
+from forecaster.handler.cache import CandleCache
+
+
+class FakeHistory(object):
+    """serve hourly candles ending now"""
+
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, symbol, num, timeframe):
+        self.calls.append(num)
+        now = int(time.time() // 3600) * 3600
+        return [{'timestamp': (now - 3600 * i) * 1000, 'bid': {'close': i}}
+                for i in reversed(range(num))]
+
+
+def test_incremental_fetch():
+    history = FakeHistory()
+    cache = CandleCache(history)
+    first = cache.get('EURUSD', 5, '1h')
+    second = cache.get('EURUSD', 5, '1h')
+    assert history.calls == [5, 1]  # only the forming candle downloaded again
+    assert [c['timestamp'] for c in first] == [c['timestamp'] for c in second]
+    assert cache.stats()['hits'] == 1
+    assert cache.stats()['misses'] == 1
+
+
+def test_bigger_window():
+    history = FakeHistory()
+    cache = CandleCache(history)
+    cache.get('EURUSD', 5, '1h')
+    assert len(cache.get('EURUSD', 10, '1h')) == 10
+    assert history.calls == [5, 10]
+
+
+def test_lru_eviction():
+    cache = CandleCache(FakeHistory(), max_keys=2)
+    cache.get('EURUSD', 3, '1h')
+    cache.get('GBPUSD', 3, '1h')
+    cache.get('EURUSD', 3, '1h')  # refresh EURUSD usage
+    cache.get('USDJPY', 3, '1h')
+    assert cache.last_timestamp('GBPUSD', '1h') is None
+    assert cache.last_timestamp('EURUSD', '1h') is not None
+    assert cache.stats()['evictions'] == 1
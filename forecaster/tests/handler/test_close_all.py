@@ -0,0 +1,59 @@
+from types import SimpleNamespace
+
+from forecaster.bench.market import MarketGenerator, SyntheticAPI
+from forecaster.enums import EVENTS
+from forecaster.handler import Client
+from forecaster.handler.gateway import Gateway
+from forecaster.handler.journal import TradeJournal
+
+
+class Listener(object):
+    def __init__(self):
+        self.events = []
+
+    def handle_request(self, event, **kw):
+        self.events.append((event, kw))
+
+
+def test_close_all(tmpdir):
+    client = Client()
+    listener = Listener()
+    successor, api, journal = client._successor, client.api, client.journal
+    gateway = client.gateway
+    client._successor = listener
+    client.gateway = Gateway(concurrency=8)
+    client.api = SyntheticAPI(MarketGenerator(5, length=20), num_positions=40)
+    client.journal = TradeJournal(str(tmpdir.join('journal.db')))
+    client.freshness.invalidate()
+    try:
+        expected = sum(pos.result for pos in client.api.positions)
+        results = client.close_all(workers=8)
+        assert not client.api.positions
+        client.journal.flush()
+        profit, num = client.journal.total(client.mode)
+        assert num == 40 and abs(profit - expected) < 1e-9
+        assert client.journal.aggregate(client.mode, 'checker')[0][0] == 'close_all'
+    finally:
+        client.journal.close()
+        client._successor, client.api, client.journal = successor, api, journal
+        client.gateway = gateway
+        client.freshness.invalidate()
+        client.snapshots.invalidate()
+    assert len(results) == 40
+    assert all(res.closed for res in results)
+    assert abs(sum(res.result for res in results) - expected) < 1e-9
+    # one summary instead of a notification for every position
+    assert [event for event, _ in listener.events] == [EVENTS.CLOSED_ALL]
+    assert listener.events[0][1]['results'] == results
+
+
+def test_already_closed_is_closed():
+    client = Client()
+    api, gateway = client.api, client.gateway
+    client.api = SyntheticAPI(MarketGenerator(1, length=20), num_positions=0)
+    client.gateway = Gateway()
+    try:
+        result = client._close_timed(SimpleNamespace(id='gone', instrument='EURUSD', result=1.0))
+    finally:
+        client.api, client.gateway = api, gateway
+    assert result.closed and result.error is None
@@ -0,0 +1,57 @@
+import time
+from threading import Thread
+
+from forecaster.handler.freshness import RefreshGate
+
+
+class Counter(object):
+    def __init__(self, wait=0.0, result=True):
+        self.calls = 0
+        self.wait = wait
+        self.result = result
+
+    def __call__(self):
+        self.calls += 1
+        time.sleep(self.wait)
+        return self.result
+
+
+def test_skip_within_ttl():
+    refresh = Counter()
+    gate = RefreshGate(refresh, ttl=60)
+    assert gate()
+    assert not gate()
+    assert gate(force=True)
+    assert refresh.calls == 2
+    assert gate.stats()['avoided'] == 1
+    gate.invalidate()
+    assert gate()
+    assert refresh.calls == 3
+
+
+def test_touch():
+    refresh = Counter()
+    gate = RefreshGate(refresh, ttl=60)
+    gate.touch()
+    assert not gate()
+    assert refresh.calls == 0
+
+
+def test_failure_is_not_fresh():
+    refresh = Counter(result=False)
+    gate = RefreshGate(refresh, ttl=60)
+    gate()
+    gate()
+    assert refresh.calls == 2
+
+
+def test_coalesce_concurrent():
+    refresh = Counter(wait=0.1)
+    gate = RefreshGate(refresh, ttl=0)  # every call is stale
+    threads = [Thread(target=gate) for _ in range(8)]
+    for thr in threads:
+        thr.start()
+    for thr in threads:
+        thr.join()
+    assert refresh.calls < 8
+    assert gate.stats()['coalesced'] == 8 - refresh.calls
@@ -0,0 +1,68 @@
+import threading
+import time
+
+from forecaster.handler.gateway import LANE, Gateway, TokenBucket
+from forecaster.patterns import Singleton
+
+
+def test_token_bucket():
+    bucket = TokenBucket(rate=10, capacity=2)
+    now = time.monotonic()
+    assert bucket.wait_time(now) == 0
+    bucket.take()
+    bucket.take()
+    assert 0.09 < bucket.wait_time(bucket._last) <= 0.1
+    assert bucket.wait_time(bucket._last + 1) == 0
+    assert bucket.tokens == 2  # capped
+
+
+def test_orders_go_first():
+    gateway = Gateway(concurrency=1)
+    started, release = threading.Event(), threading.Event()
+    order = []
+
+    def blocking():
+        started.set()
+        release.wait(2)
+
+    def request(lane):
+        gateway.call(lane, order.append, lane)
+
+    first = threading.Thread(target=gateway.call, args=(LANE.DATA, blocking))
+    first.start()
+    assert started.wait(2)
+    threads = [threading.Thread(target=request, args=(lane,))
+               for lane in (LANE.DATA, LANE.DATA, LANE.ACCOUNT, LANE.ORDERS)]
+    for thread in threads:
+        thread.start()
+        time.sleep(0.02)  # queue in this order
+    assert gateway.depth() == {'ORDERS': 1, 'ACCOUNT': 1, 'DATA': 2}
+    release.set()
+    for thread in [first] + threads:
+        thread.join(2)
+    assert order == [LANE.ORDERS, LANE.ACCOUNT, LANE.DATA, LANE.DATA]
+    assert gateway.stats()['calls_data'] == 3
+
+
+def test_rate_limit():
+    gateway = Gateway(rate=50, burst=1, concurrency=4)
+    start = time.monotonic()
+    for _ in range(6):
+        gateway.call(LANE.DATA, lambda: None)
+    assert time.monotonic() - start >= 0.09  # 5 waits of 20ms after burst
+
+
+def test_singleton_built_once():
+    built = []
+
+    class Service(metaclass=Singleton):
+        def __init__(self):
+            time.sleep(0.05)
+            built.append(self)
+
+    threads = [threading.Thread(target=Service) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(built) == 1
@@ -0,0 +1,51 @@
+import datetime
+from types import SimpleNamespace
+
+from forecaster.handler.journal import TradeJournal
+
+
+def position(num, symbol, result):
+    return SimpleNamespace(id=str(num), instrument=symbol, mode='buy', quantity=1000,
+                           result=result)
+
+
+def test_aggregates(tmpdir):
+    journal = TradeJournal(str(tmpdir.join('journal.db')), flush_interval=0.01, batch=2)
+    try:
+        journal.record_open('demo', 'EURUSD', 'buy', 1000)
+        journal.record_close('demo', position(1, 'EURUSD', 2.0), 'RelativeChecker')
+        journal.record_close('demo', position(2, 'EURUSD', -0.5), 'FixedChecker')
+        journal.record_close('demo', position(3, 'GBPUSD', 1.0), 'RelativeChecker')
+        journal.record_close('live', position(4, 'GBPUSD', 7.0), 'RelativeChecker')
+        journal.flush()
+        assert journal.written == 5
+        assert journal.total('demo') == (2.5, 3)
+        assert journal.aggregate('demo', 'checker') == [
+            ('RelativeChecker', 3.0, 2), ('FixedChecker', -0.5, 1)]
+        assert journal.aggregate('demo', 'symbol') == [('EURUSD', 1.5, 2), ('GBPUSD', 1.0, 1)]
+        today = datetime.date.today()
+        assert journal.aggregate('demo', 'day', today) == [(today.isoformat(), 2.5, 3)]
+        assert journal.total('demo', today + datetime.timedelta(days=1)) == (0, 0)
+    finally:
+        journal.close()
+
+
+def test_rows_written_on_close(tmpdir):
+    path = str(tmpdir.join('journal.db'))
+    journal = TradeJournal(path, flush_interval=60, batch=100)
+    journal.record_close('demo', position(1, 'EURUSD', 2.0))
+    journal.close()  # doesn't wait for flush_interval
+    assert TradeJournal(path).total('demo') == (2.0, 1)
+
+
+def test_accounts_share_journal(tmpdir):
+    journal = TradeJournal(str(tmpdir.join('journal.db')), flush_interval=0.01)
+    try:
+        journal.record_close('demo', position(1, 'EURUSD', 2.0))
+        journal.record_close('demo', position(2, 'EURUSD', 1.0), account='other')
+        journal.flush()
+        assert journal.total('demo') == (3.0, 2)
+        assert journal.total('demo', account='other') == (1.0, 1)
+        assert journal.aggregate('demo', 'account') == [('default', 2.0, 1), ('other', 1.0, 1)]
+    finally:
+        journal.close()
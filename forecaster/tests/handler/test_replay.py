@@ -0,0 +1,60 @@
+import json
+import time
+
+import pytest
+import requests
+
+import trading212api
+from forecaster.handler.replay import ReplaySession, request_key
+
+ACCOUNT = {'id': 1, 'positions': [], 'cash': {'free': 100, 'total': 100, 'ppl': 0}}
+ACCOUNT_URL = "https://demo.trading212.com/rest/v2/account"
+CANDLES_URL = "https://demo.trading212.com/charting/rest/v2/candles"
+
+
+def make_records():
+    candles = [{'timestamp': 0, 'bid': {'open': 1, 'high': 2, 'low': 0, 'close': 1}}]
+    payload = json.dumps([{'limit': 1, 'instCode': 'EURUSD', 'periodType': 'ONE_HOUR',
+                           'withFakes': True}])
+    return [
+        {'key': request_key('GET', ACCOUNT_URL), 'status': 200,
+         'content': json.dumps(ACCOUNT)},
+        {'key': request_key('POST', CANDLES_URL, payload), 'status': 200,
+         'content': json.dumps([{'candles': candles}])}]
+
+
+def make_api(**kw):
+    api = trading212api.Client('demo')
+    api.account.id = 1
+    api.session = ReplaySession(make_records(), **kw)
+    return api
+
+
+def test_replay():
+    api = make_api()
+    api.refresh()
+    assert api.account.funds['free'] == 100
+    assert api.get_historical_data('EURUSD', 1, '1h')[0]['bid']['close'] == 1
+
+
+def test_latency():
+    api = make_api(latency=0.05, seed=1)
+    start = time.time()
+    api.refresh()
+    assert time.time() - start >= 0.01
+
+
+def test_injected_errors():
+    api = make_api(errors={'ConnectionError': 1.0})
+    with pytest.raises(requests.exceptions.ConnectionError):
+        api.refresh()
+    api = make_api(errors={'NoPriceException': 1.0})
+    api.account.positions.append(type('Position', (), {'id': 5})())
+    with pytest.raises(trading212api.exceptions.NoPriceException):
+        api.close_position(5)
+    assert api.session.injected['NoPriceException'] == 1
+
+
+def test_unknown_error():
+    with pytest.raises(ValueError):
+        ReplaySession([], errors={'Unknown': 1.0})
@@ -0,0 +1,126 @@
+import logging
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from forecaster.enums import EVENTS
+from forecaster.exceptions import CircuitOpen
+from forecaster.handler import Client
+from forecaster.handler.retry import STATE, Backoff, CircuitBreaker, RetryPolicy
+
+
+def test_backoff():
+    backoff = Backoff(1.0, factor=2, cap=5, jitter=0.5)
+    assert backoff.delay(0, rand=lambda: 0) == 1.0
+    assert backoff.delay(2, rand=lambda: 0) == 4.0
+    assert backoff.delay(5, rand=lambda: 0) == 5.0
+    assert backoff.delay(1, rand=lambda: 1) == 1.0
+
+
+def test_attempt_budget():
+    policy = RetryPolicy({ValueError: Backoff(0.01)}, max_attempts=3, max_time=10)
+    retry = policy.start('op')
+    assert retry.next_delay(ValueError()) is not None
+    assert retry.next_delay(ValueError()) is not None
+    assert retry.next_delay(ValueError()) is None
+    assert retry.next_delay(KeyError()) is None  # not retryable
+    stats = policy.stats()
+    assert stats['retries'] == {'ValueError': 2}
+    assert stats['gave_up'] == {'op': 1}
+    assert stats['waited'] > 0
+
+
+def test_time_budget():
+    policy = RetryPolicy({ValueError: Backoff(1.0, jitter=0)}, max_attempts=100, max_time=1.5)
+    retry = policy.start('op')
+    assert retry.next_delay(ValueError()) == 1.0
+    assert retry.next_delay(ValueError()) is None  # 2s delay exceeds budget
+
+
+def test_circuit_breaker():
+    breaker = CircuitBreaker(failures=2, reset_timeout=0.05)
+    breaker.failure()
+    assert breaker.allow()
+    breaker.failure()
+    assert breaker.state == STATE.OPEN
+    with pytest.raises(CircuitOpen):
+        breaker.check()
+    time.sleep(0.06)
+    assert breaker.allow()  # probe
+    assert not breaker.allow()
+    breaker.failure()
+    assert breaker.state == STATE.OPEN
+    time.sleep(0.06)
+    assert breaker.allow()
+    breaker.success()
+    assert breaker.state == STATE.CLOSED
+    assert breaker.stats()['opened'] == 2
+
+
+def test_lost_probe_expires():
+    breaker = CircuitBreaker(failures=1, reset_timeout=0.05)
+    breaker.failure()
+    time.sleep(0.06)
+    assert breaker.allow()  # probe whose outcome is never recorded
+    assert not breaker.allow()
+    time.sleep(0.06)
+    assert breaker.allow()
+    assert breaker.state == STATE.HALF_OPEN
+
+
+@pytest.fixture
+def client():
+    client = Client()
+    api, breaker = client.api, client.breaker
+    client.breaker = CircuitBreaker(failures=1, reset_timeout=0.01)
+    yield client
+    client.api, client.breaker = api, breaker
+
+
+def fail(error):
+    def call(*args):
+        raise error
+    return call
+
+
+def test_open_circuit_is_an_error(client):
+    client.breaker.failure()
+    pos = SimpleNamespace(id='1')
+    assert isinstance(client.try_open('EURUSD', 'buy', 1000), CircuitOpen)
+    assert isinstance(client.try_close(pos), CircuitOpen)
+
+
+def test_probe_outcome_recorded(client):
+    client.api = SimpleNamespace(close_position=fail(ValueError('not found')),
+                                 open_position=fail(KeyError('bug')))
+    client.breaker.failure()
+    time.sleep(0.02)
+    assert client.try_close(SimpleNamespace(id='1', result=0.0), notify=False) is None
+    assert client.breaker.state == STATE.CLOSED
+    client.breaker.failure()
+    time.sleep(0.02)
+    with pytest.raises(KeyError):
+        client.try_open('EURUSD', 'buy', 1000)
+    assert client.breaker.state == STATE.CLOSED
+
+
+def test_not_found_is_closed(client, monkeypatch):
+    client.api = SimpleNamespace(close_position=fail(ValueError('not found')))
+    requests = []
+    monkeypatch.setattr(client, 'handle_request', lambda event, **kw: requests.append(event))
+    results = client.results
+    try:
+        assert client.try_close(SimpleNamespace(id='1', result=2.5)) is None
+        assert client.results == results + 2.5  # closed by the other checker
+        assert requests == [EVENTS.CLOSED_POS]
+    finally:
+        client.results = results
+
+
+def test_refused_order_returned(client, caplog):
+    client.breaker.failure()
+    with caplog.at_level(logging.ERROR, logger='forecaster.handler'):
+        assert isinstance(client.open_pos('EURUSD', 'buy', 1000), CircuitOpen)
+        assert isinstance(client.close_pos(SimpleNamespace(id='1')), CircuitOpen)
+    assert 'EURUSD' in caplog.text and 'position 1' in caplog.text
@@ -0,0 +1,43 @@
+from collections import namedtuple
+from threading import Thread
+
+import pytest
+
+from forecaster.handler.snapshot import SnapshotService
+
+Position = namedtuple('Position', ['id', 'instrument'])
+
+
+class FakeAccount(object):
+    def __init__(self):
+        self.positions = [Position(1, 'EURUSD'), Position(2, 'EURUSD'), Position(3, 'USDJPY')]
+        self.funds = {'free': 10, 'total': 20, 'result': 1}
+        self.refreshes = 0
+
+    def refresh(self):
+        self.refreshes += 1
+
+
+def test_refresh_once_per_interval():
+    account = FakeAccount()
+    service = SnapshotService(account.refresh, lambda: account, interval=60)
+    threads = [Thread(target=service.get) for _ in range(10)]
+    for thr in threads:
+        thr.start()
+    for thr in threads:
+        thr.join()
+    assert account.refreshes == 1
+    service.invalidate()
+    service.get()
+    assert account.refreshes == 2
+
+
+def test_snapshot_indexes():
+    account = FakeAccount()
+    snapshot = SnapshotService(account.refresh, lambda: account, interval=60).get()
+    assert snapshot.by_id[3].instrument == 'USDJPY'
+    assert [pos.id for pos in snapshot.by_instrument['EURUSD']] == [1, 2]
+    account.positions.clear()  # api clears the list in place
+    assert len(snapshot.positions) == 3
+    with pytest.raises(TypeError):
+        snapshot.funds['free'] = 0
@@ -0,0 +1,61 @@
+import time
+
+from forecaster.handler.retry import Backoff
+from forecaster.mediate.outbox import Outbox
+
+
+class Chat(object):
+    def __init__(self, failures=0):
+        self.messages = []
+        self.failures = failures
+        self.renewed = 0
+
+    def send(self, text, **options):
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("timed out")
+        self.messages.append((time.monotonic(), text, options))
+
+    def renew(self):
+        self.renewed += 1
+
+
+def test_burst_merged_in_order():
+    chat = Chat()
+    outbox = Outbox(chat.send, min_interval=0, window=0.05)
+    outbox.add_digest('closed', lambda items: "closed {} for {}".format(len(items), sum(items)))
+    outbox.start()
+    outbox.put("closing all")
+    for result in range(30):
+        outbox.put_item('closed', result)
+    outbox.put("choose", reply_markup='keyboard')
+    outbox.put("done")
+    outbox.stop()
+    assert [text for _, text, _ in chat.messages] == [
+        "closing all", "closed 30 for 435", "choose", "done"]
+    assert chat.messages[2][2] == {'reply_markup': 'keyboard'}
+    assert outbox.stats()['delivered'] == 33
+
+
+def test_put_does_not_wait_and_rate_limit():
+    chat = Chat()
+    outbox = Outbox(chat.send, min_interval=0.1, window=0)
+    outbox.start()
+    start = time.monotonic()
+    outbox.put("first", reply_markup=1)
+    outbox.put("second", reply_markup=2)  # not merged
+    assert time.monotonic() - start < 0.05
+    outbox.stop()
+    assert len(chat.messages) == 2
+    assert chat.messages[1][0] - chat.messages[0][0] >= 0.1
+
+
+def test_retry_after_renewing_connection():
+    chat = Chat(failures=2)
+    outbox = Outbox(chat.send, chat.renew, min_interval=0, window=0,
+                    backoff=Backoff(0.001, jitter=0))
+    outbox.start()
+    outbox.put("hello")
+    outbox.stop()
+    assert [text for _, text, _ in chat.messages] == ["hello"]
+    assert chat.renewed == 2
@@ -0,0 +1,56 @@
+import random
+
+import numpy as np
+import pytest
+
+from forecaster.predict import indicators
+from forecaster.predict.mean_reversion import MeanReversionPredicter
+
+
+def make_candles(num):
+    candles = []
+    for _ in range(num):
+        low = random.uniform(1.0, 1.1)
+        candles.append({'low': low, 'high': low + random.uniform(0, 0.01),
+                        'close': low + random.uniform(0, 0.01)})
+    return candles
+
+
+def loop_atr(candles):
+    ATR = 0.0
+    for candle in candles[1:]:
+        ATR = (ATR * (len(candles) - 1) + (candle['high'] - candle['low'])) / len(candles)
+    return ATR
+
+
+def loop_intercept(values):
+    num = len(values)
+    x_mean = (num + 1) / 2
+    y_mean = sum(values) / num
+    slope = (sum((i + 1 - x_mean) * (y - y_mean) for i, y in enumerate(values)) /
+             sum((i + 1 - x_mean) ** 2 for i in range(num)))
+    return y_mean - slope * x_mean
+
+
+def test_average_true_range():
+    for num in (1, 2, 5, 50):
+        candles = make_candles(num)
+        high = indicators.to_matrix(candles, 'high')
+        low = indicators.to_matrix(candles, 'low')
+        assert indicators.average_true_range(high, low) == pytest.approx(loop_atr(candles))
+
+
+def test_band_matrix():
+    rows = [make_candles(20) for _ in range(10)]
+    predicter = MeanReversionPredicter({'mult': 2})
+    bands = predicter.get_bands(rows)
+    for row, band in zip(rows, bands):
+        closes = [x['close'] for x in row]
+        assert band == pytest.approx(loop_intercept(closes) + 2 * loop_atr(row))
+        assert predicter.get_band(row) == pytest.approx(band)
+
+
+def test_moving_average():
+    values = np.arange(10, dtype=float).reshape(2, 5)
+    assert indicators.moving_average(values, 2).tolist() == [
+        [0.5, 1.5, 2.5, 3.5], [5.5, 6.5, 7.5, 8.5]]
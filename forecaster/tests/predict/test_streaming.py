@@ -0,0 +1,60 @@
+import numpy as np
+
+from forecaster.predict import indicators
+from forecaster.predict.streaming import (RollingATR, RollingRegression, RollingStats,
+                                          StreamingBand)
+
+
+def test_rolling_matches_arrays():
+    rng = np.random.default_rng(0)
+    values = rng.normal(size=200).cumsum()
+    ranges = np.abs(rng.normal(size=200))
+    regression, atr, stats = RollingRegression(10), RollingATR(10), RollingStats(10)
+    for num in range(200):
+        regression.push(values[num])
+        atr.push(ranges[num])
+        stats.push(values[num])
+        window = slice(max(0, num - 9), num + 1)
+        if num >= 1:
+            intercept, slope = indicators.regression(values[window])
+            assert np.isclose(regression.intercept, intercept)
+            assert np.isclose(regression.slope, slope)
+        expected = indicators.average_true_range(ranges[window], np.zeros(num + 1)[window])
+        assert np.isclose(atr.value, expected)
+        assert np.isclose(stats.mean, values[window].mean())
+        assert np.isclose(stats.variance, values[window].var())
+
+
+def test_provisional_rollback():
+    full, streamed = RollingRegression(5), RollingRegression(5)
+    for value in range(1, 9):
+        streamed.push(value * 10.0, provisional=True)  # forming value, then replaced
+        streamed.push(float(value))
+        full.push(float(value))
+    assert list(streamed.values) == list(full.values)
+    assert np.isclose(streamed.intercept, full.intercept)
+    streamed.push(100.0, provisional=True)
+    streamed.rollback()
+    assert list(streamed.values) == list(full.values)
+
+
+def make_candle(timestamp, close):
+    return {'timestamp': timestamp * 1000,
+            'bid': {'open': close, 'high': close + 1, 'low': close - 1, 'close': close}}
+
+
+def test_streaming_band():
+    closes = [1.0, 3.0, 2.0, 5.0, 4.0, 6.0, 8.0, 7.0]
+    candles = [make_candle(num * 60, close) for num, close in enumerate(closes)]
+    stream = StreamingBand(5, 2, '1m')
+    stream.update(candles[:6])
+    assert stream.provisional
+    # last candle changed while forming, then new candles arrive
+    stream.update([make_candle(300, 4.5)])
+    stream.update(candles[5:])
+    window = [candle['bid'] for candle in candles[-5:]]
+    expected = indicators.band(indicators.to_matrix(window, 'close'),
+                               indicators.to_matrix(window, 'high'),
+                               indicators.to_matrix(window, 'low'), 2)
+    assert np.isclose(stream.band, expected)
+    assert stream.close == 7.0
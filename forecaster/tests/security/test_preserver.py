@@ -0,0 +1,51 @@
+from types import SimpleNamespace
+
+import pytest
+
+from forecaster.security import preserver as preserver_module
+from forecaster.security import Preserver
+
+
+class FakeClient(object):
+    margin_calls = 0
+    snapshot_calls = 0
+
+    def get_margin(self, symbol, quantity):
+        FakeClient.margin_calls += 1
+        return quantity / 10
+
+    def snapshot(self):
+        FakeClient.snapshot_calls += 1
+        return SimpleNamespace(funds={'total': 1000, 'free': 900})
+
+
+@pytest.fixture
+def preserver(monkeypatch):
+    FakeClient.margin_calls = 0
+    FakeClient.snapshot_calls = 0
+    monkeypatch.setattr(preserver_module, 'Client', FakeClient)
+    return Preserver({'preserver': {'funds_risk': 0.5, 'margin_ttl': 60}})
+
+
+def test_margin_cache(preserver):
+    assert preserver.get_margin('EURUSD', 1000) == 100
+    assert preserver.get_margin('EURUSD', 1000) == 100
+    assert FakeClient.margin_calls == 1
+    assert preserver.stats() == {'hits': 1, 'misses': 1, 'cached': 1}
+
+
+def test_check_margins(preserver):
+    # 400 available: 0.5 * 1000 - (1000 - 900)
+    assert preserver.check_margins([('A', 2000), ('B', 2000), ('C', 1000)]) == [
+        True, True, False]
+    assert FakeClient.snapshot_calls == 1
+
+
+def test_round_reserves_margin(preserver):
+    preserver.begin_round()
+    assert preserver.check_margin('A', 3000)
+    assert not preserver.check_margin('B', 2000)
+    assert preserver.get_free_margin() == 100
+    preserver.end_round()
+    assert preserver.check_margin('B', 2000)
+    assert FakeClient.snapshot_calls == 2
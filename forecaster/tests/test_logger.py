@@ -0,0 +1,69 @@
+import json
+import logging
+import threading
+
+from forecaster.logger import JsonFormatter, QueueLogging, RateLimitFilter
+
+
+class ListHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records = []
+        self.thread = None
+
+    def emit(self, record):
+        self.thread = threading.current_thread()
+        self.records.append(self.format(record))
+
+
+def make_record(msg, *args, level=logging.DEBUG, **extra):
+    record = logging.LogRecord('test', level, __file__, 1, msg, args, None)
+    record.__dict__.update(extra)
+    return record
+
+
+def test_json_moves():
+    record = make_record("closed position %s", '42', move={'event': 'close', 'result': 1.5})
+    data = json.loads(JsonFormatter().format(record))
+    assert data['message'] == "closed position 42"
+    assert data['event'] == 'close' and data['result'] == 1.5
+
+
+def test_rate_limit_by_message():
+    limit = RateLimitFilter(interval=60)
+    assert limit.filter(make_record("profit %.2f", 1.0))
+    assert not limit.filter(make_record("profit %.2f", 1.0))
+    assert not limit.filter(make_record("profit %.2f", 1.0))
+    assert limit.filter(make_record("loss %.2f", 1.0))
+    assert limit.filter(make_record("profit %.2f", 1.0, level=logging.WARNING))
+    limit.interval = 0
+    record = make_record("profit %.2f", 1.0)
+    assert limit.filter(record)
+    assert record.getMessage() == "profit 1.00 (2 similar suppressed)"
+    assert record.getMessage() == "profit 1.00 (2 similar suppressed)"  # format kept
+
+
+def test_rate_limit_keeps_other_args():
+    limit = RateLimitFilter(interval=60)
+    assert limit.filter(make_record("%s checker triggered for %s", 'fixed', 'A'))
+    assert limit.filter(make_record("%s checker triggered for %s", 'fixed', 'B'))
+    assert limit.filter(make_record("%s checker triggered for %s", 'fixed', 'C'))
+    assert not limit.filter(make_record("%s checker triggered for %s", 'fixed', 'A'))
+
+
+def test_files_written_by_listener():
+    trades, moves = ListHandler(), ListHandler()
+    logging.getLogger('test_queue').addHandler(trades)
+    logging.getLogger('test_queue').setLevel(logging.DEBUG)
+    logging.getLogger('test_moves').addHandler(moves)
+    logging.getLogger('test_moves').setLevel(logging.DEBUG)
+    pipeline = QueueLogging(['test_queue', 'test_moves'])
+    pipeline.start()
+    try:
+        logging.getLogger('test_queue.sub').debug("checked %d positions", 3)
+        logging.getLogger('test_moves').info("opened")
+    finally:
+        pipeline.stop()
+    assert trades.records == ["checked 3 positions"]
+    assert moves.records == ["opened"]
+    assert trades.thread is not threading.current_thread()
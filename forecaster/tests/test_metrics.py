@@ -0,0 +1,43 @@
+from urllib.request import urlopen
+
+import pytest
+
+from forecaster.metrics import Histogram, Metrics, MetricsServer, summary
+
+
+def test_histogram_buckets_and_quantiles():
+    hist = Histogram('test_seconds', "test", ['op'], buckets=(0.1, 1.0, 10.0))
+    for value in (0.05, 0.5, 0.5, 5.0):
+        hist.observe(value, op='read')
+    assert hist.get(op='read') == (4, 6.05)
+    assert hist.get(op='write') == (0, 0.0)
+    assert 0.1 <= hist.quantile(0.5, op='read') <= 1.0
+    samples = {suffix + labels: value for suffix, labels, value in hist.samples()}
+    assert samples['_bucket{op="read",le="0.1"}'] == 1
+    assert samples['_bucket{op="read",le="1.0"}'] == 3
+    assert samples['_bucket{op="read",le="+Inf"}'] == 4
+    assert samples['_count{op="read"}'] == 4
+
+
+def test_register_once():
+    counter = Metrics().counter('test_events_total', "test", ['kind'])
+    assert Metrics().counter('test_events_total', "test", ['kind']) is counter
+    with pytest.raises(ValueError):
+        Metrics().gauge('test_events_total', "test")
+
+
+def test_endpoint_serves_prometheus_text():
+    counter = Metrics().counter('test_requests_total', "test", ['kind'])
+    counter.inc(kind='a')
+    counter.inc(2, kind='a')
+    Metrics().add_collector('test', lambda: {'test_collected': 7})
+    server = MetricsServer(port=0)
+    server.start()
+    try:
+        body = urlopen('http://127.0.0.1:{}/metrics'.format(server.port)).read().decode()
+    finally:
+        server.stop()
+    assert '# TYPE test_requests_total counter' in body
+    assert 'test_requests_total{kind="a"} 3.0' in body
+    assert 'test_collected 7.0' in body
+    assert 'test_collected: 7' in summary()
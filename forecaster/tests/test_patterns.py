@@ -0,0 +1,62 @@
+import threading
+
+import pytest
+
+from forecaster.enums import ACTIONS, EVENTS
+from forecaster.metrics import BUS_SECONDS
+from forecaster.patterns import MODE, Chainer, EventBus
+
+
+@pytest.fixture
+def bus():
+    bus = EventBus()
+    routes = bus.routes
+    bus.clear()
+    yield bus
+    bus.routes = routes
+
+
+class Link(Chainer):
+    def __init__(self, successor=None):
+        super().__init__(successor)
+        self.requests = []
+
+    def handle_request(self, request, **kw):
+        self.requests.append(request)
+        return self.pass_request(request, **kw)
+
+
+def predict(args):
+    return 'buy' if args[0] == 'EURUSD' else None
+
+
+def test_requests_skip_the_chain(bus):
+    head = Link()
+    link = Link(head)
+    bus.subscribe(ACTIONS.PREDICT, predict)
+    assert link.handle_request(ACTIONS.PREDICT, args=['EURUSD']) == 'buy'
+    assert head.requests == []  # no hops
+    link.handle_request(ACTIONS.GET_BAND, args=[])  # not registered, chain as before
+    assert head.requests == [ACTIONS.GET_BAND]
+    count = BUS_SECONDS.get(event='PREDICT', handler='predict')[0]
+    bus.dispatch(ACTIONS.PREDICT, args=['GBPUSD'])
+    assert BUS_SECONDS.get(event='PREDICT', handler='predict')[0] == count + 1
+
+
+def test_notifications_do_not_block(bus):
+    release, done = threading.Event(), threading.Event()
+    received = []
+
+    def notify(pos):
+        release.wait(2)
+        received.append(pos)
+        done.set()
+
+    bus.subscribe(EVENTS.CLOSED_POS, notify, MODE.ASYNC)
+    assert bus.dispatch(EVENTS.CLOSED_POS, pos=1) is None
+    assert received == []  # dispatcher didn't wait
+    release.set()
+    assert done.wait(2)
+    assert received == [1]
+    bus.unsubscribe(EVENTS.CLOSED_POS, notify)
+    assert not bus.handles(EVENTS.CLOSED_POS)
@@ -0,0 +1,50 @@
+import os.path
+import threading
+import time
+
+import pytest
+
+from forecaster.profiling import Profiler
+
+
+@pytest.fixture
+def profiler(tmpdir):
+    profiler = Profiler()
+    folder, profiler.folder = profiler.folder, str(tmpdir)
+    yield profiler
+    profiler.folder = folder
+
+
+def busy_loop(stop):
+    while not stop.is_set():
+        sum(range(1000))
+
+
+def test_cpu_profile(profiler):
+    stop = threading.Event()
+    worker = threading.Thread(target=busy_loop, args=(stop,), name='busy-checker')
+    worker.start()
+    try:
+        assert profiler.toggle_cpu() == (None, "cpu profiler started")
+        assert profiler.cpu_running
+        time.sleep(0.2)
+        path, text = profiler.toggle_cpu()
+    finally:
+        stop.set()
+        worker.join()
+    assert not profiler.cpu_running
+    assert os.path.dirname(path) == profiler.folder
+    assert 'busy_loop (test_profiling.py' in text
+    assert 'busy-checker' in text.split("busy threads:")[1]
+    with open(path) as report:
+        assert any(line.startswith('busy-checker;') for line in report)
+
+
+def test_memory_growth(profiler):
+    assert profiler.toggle_memory() == (None, "memory tracing started")
+    growth = [bytearray(1024) for _ in range(256)]
+    path, text = profiler.toggle_memory()
+    assert not profiler.memory_running
+    assert os.path.isfile(path)
+    assert 'test_profiling.py' in text
+    del growth
@@ -0,0 +1,85 @@
+import os
+
+import pytest
+
+from forecaster.automate.checkers import FixedChecker
+from forecaster.automate.positioner import Positioner
+from forecaster.utils import ConfigRegistry, _load_yml, get_conf, read_yml
+
+
+def write(path, text, stamp):
+    with open(path, 'w') as yml_file:
+        yml_file.write(text)
+    os.utime(path, ns=(stamp, stamp))  # mtime resolution of filesystem may be coarse
+
+
+def test_parse_once_and_when_modified(tmpdir):
+    path = str(tmpdir.join('strategy.yml'))
+    write(path, "multiplier: 2\n", 10 ** 18)
+    registry = ConfigRegistry()
+    parses = registry.parses
+    assert read_yml(path) == {'multiplier': 2}
+    assert read_yml(path) == {'multiplier': 2}
+    assert registry.parses == parses + 1
+    read_yml(path)['multiplier'] = 5  # copies are not shared
+    assert read_yml(path) == {'multiplier': 2}
+    write(path, "multiplier: 3\n", 2 * 10 ** 18)
+    assert read_yml(path) == {'multiplier': 3}
+    assert registry.parses == parses + 2
+
+
+def test_notify_subscribers(tmpdir):
+    path = str(tmpdir.join('strategy.yml'))
+    write(path, "multiplier: 2\n", 10 ** 18)
+    received = []
+    registry = ConfigRegistry()
+    registry.subscribe(path, _load_yml, received.append)
+    registry.check()
+    assert received == []
+    write(path, "multiplier: 3\n", 2 * 10 ** 18)
+    read_yml(path)  # read by others before check
+    registry.check()
+    assert received == [{'multiplier': 3}]
+    write(path, "multiplier: [\n", 3 * 10 ** 18)  # broken file is not applied
+    registry.check()
+    assert received == [{'multiplier': 3}]
+
+
+def test_checker_rescheduled_on_configure():
+    checker = FixedChecker(
+        {'sleep': 3600, 'overrun': 'skip', 'gain': 1, 'loss': -1}, None)
+    checker.sweep = lambda: None
+    checker.start()
+    job = checker.job
+    try:
+        checker.configure({'sleep': 3600, 'overrun': 'skip', 'gain': 2, 'loss': -2})
+        assert checker.job is job
+        assert (checker.gain, checker.loss) == (2, -2)
+        checker.configure({'sleep': 1800, 'overrun': 'skip', 'gain': 2, 'loss': -2})
+        assert checker.job is not job and job.cancelled
+        assert checker.job.interval == 1800
+    finally:
+        checker.stop()
+
+
+def test_conf_is_read_only():
+    with pytest.raises(TypeError):
+        get_conf()['HANDLER']['mode'] = 'changed'
+    assert get_conf() is get_conf()  # parsed and copied once
+    config = get_conf(writable=True)
+    config['HANDLER']['mode'] = 'changed'
+    assert get_conf()['HANDLER']['mode'] != 'changed'
+
+
+def test_checkers_activated_again():
+    fixed = {'sleep': 3600, 'overrun': 'skip', 'gain': 1, 'loss': -1}
+    strategy = {'checkers': {'activate': ['fixed'], 'fixed': fixed}}
+    positioner = Positioner(strategy)
+    positioner.start()
+    try:
+        positioner.configure({'checkers': {'activate': [], 'fixed': fixed}})
+        assert positioner.checkers == {}
+        positioner.configure(strategy)
+        assert list(positioner.checkers) == ['fixed']
+    finally:
+        positioner.stop()
@@ -6,14 +6,20 @@ Contains all the utils of module and Abstract classes.
 """
 
 import configparser
+import copy
 import json
+import logging
 import os
 import os.path
 import sys
+from threading import RLock
 
 import termcolor
 import yaml
 from forecaster.exceptions import MissingToken
+from forecaster.patterns import Singleton
+
+LOGGER = logging.getLogger('forecaster.utils')
 
 
 # +----------------------------------------------------------------------+
@@ -24,6 +30,11 @@ def read_strategy(name, folders=[]):
     return read_yml(get_yaml(name, folders))
 
 
+# call callback(strategy) when strategy file changes
+def watch_strategy(name, callback, folders=[]):
+    ConfigRegistry().subscribe(get_yaml(name, folders), _load_yml, callback)
+
+
 # read strategy files from config folder
 def read_data(name, folders=[]):
     return read_json(get_json(name, folders))
@@ -50,17 +61,35 @@ def get_json(name, folders=[]):
 # read yaml file
 def read_yml(path):
     """read yaml and return dict"""
-    with open(path, 'r') as yaml_file:
-        return yaml.load(yaml_file)
+    return copy.deepcopy(ConfigRegistry().get(path, _load_yml))
 
 
 # read json file
 def read_json(path):
     """read yaml and return dict"""
+    return copy.deepcopy(ConfigRegistry().get(path, _load_json))
+
+
+def _load_yml(path):
+    with open(path, 'r') as yaml_file:
+        return yaml.safe_load(yaml_file)
+
+
+def _load_json(path):
     with open(path, 'r') as json_file:
         return json.load(json_file)
 
 
+def _load_ini(path):
+    config = configparser.ConfigParser()
+    config.read(path)
+    return config
+
+
+def _load_frozen_ini(path):
+    return FrozenConfig(path)
+
+
 # save json file
 def save_json(data, path):
     """save dict to yaml"""
@@ -77,11 +106,13 @@ def make_dirs(path):
 
 
 # get configuration
-def get_conf(filename='config'):
-    config = configparser.ConfigParser()
+def get_conf(filename='config', writable=False):
+    """get config shared by every caller (read-only), parsed again when modified,
+    writable gets a new copy"""
     path = os.path.join(os.path.dirname(__file__), 'config', filename + '.ini')
-    config.read(path)
-    return config
+    if writable:
+        return _load_ini(path)
+    return ConfigRegistry().get(path, _load_frozen_ini)
 
 
 # save configuration
@@ -99,6 +130,123 @@ def get_path(*path):
     return file_path
 
 
+# +----------------------------------------------------------------------+
+# | CONFIGURATION REGISTRY                                               |
+# +----------------------------------------------------------------------+
+class FrozenConfig(configparser.ConfigParser):
+    """config parsed once and shared, changes raise TypeError"""
+
+    def __init__(self, path):
+        self._frozen = False
+        super().__init__()
+        self.read(path)
+        self._frozen = True
+
+    def _check(self):
+        if self._frozen:
+            raise TypeError("shared config is read-only, use get_conf(writable=True)")
+
+    def set(self, section, option, value=None):
+        self._check()
+        super().set(section, option, value)
+
+    def add_section(self, section):
+        self._check()
+        super().add_section(section)
+
+    def remove_section(self, section):
+        self._check()
+        return super().remove_section(section)
+
+    def remove_option(self, section, option):
+        self._check()
+        return super().remove_option(section, option)
+
+    def read_dict(self, dictionary, source='<dict>'):
+        self._check()
+        super().read_dict(dictionary, source)
+
+    def __setitem__(self, key, value):
+        self._check()
+        super().__setitem__(key, value)
+
+    def __delitem__(self, key):
+        self._check()
+        super().__delitem__(key)
+
+
+class ConfigRegistry(metaclass=Singleton):
+    """parse every config file once, parse again when modified"""
+
+    def __init__(self):
+        self._files = {}  # path: (stamp, parsed)
+        self._subscribers = {}  # path: [loader, [callbacks], notified stamp]
+        self.parses = 0
+        self.hits = 0
+        self._lock = RLock()
+
+    def get(self, path, loader):
+        """get parsed file, loader(path) parses it when new or modified"""
+        stamp = self._stamp(path)
+        with self._lock:
+            cached = self._files.get(path)
+            if cached is not None and cached[0] == stamp:
+                self.hits += 1
+                return cached[1]
+            parsed = loader(path)
+            self.parses += 1
+            self._files[path] = (stamp, parsed)
+            return parsed
+
+    def subscribe(self, path, loader, callback):
+        """call callback(parsed) every time check finds path modified"""
+        with self._lock:
+            if path not in self._subscribers:
+                self._subscribers[path] = [loader, [], self._stamp(path)]
+            self._subscribers[path][1].append(callback)
+
+    def check(self):
+        """parse subscribed files modified since last check and notify"""
+        with self._lock:
+            subscribed = [(path, loader, list(callbacks), notified)
+                          for path, (loader, callbacks, notified) in self._subscribers.items()]
+        for path, loader, callbacks, notified in subscribed:
+            stamp = self._stamp(path)
+            if stamp == notified or stamp is None:
+                continue
+            with self._lock:
+                self._subscribers[path][2] = stamp
+            try:
+                parsed = self.get(path, loader)
+            except Exception as e:  # keep old values until fixed
+                LOGGER.error("failed to reload {}: {}".format(path, e))
+                continue
+            LOGGER.info("reloaded {}".format(path))
+            for callback in callbacks:
+                try:
+                    callback(copy.deepcopy(parsed))
+                except Exception as e:
+                    LOGGER.error("failed to apply {}: {}".format(path, e))
+
+    def clear(self):
+        with self._lock:
+            self._files.clear()
+
+    def stats(self):
+        return {'parses': self.parses, 'hits': self.hits, 'files': len(self._files)}
+
+    def _stamp(self, path):
+        """modification time and size, None if missing"""
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+
+ConfigRegistry()  # built at import, before threads share it
+
+
 # +----------------------------------------------------------------------+
 # | COMMAND LINE INTERFACE FUCNTIONS                                     |
 # +----------------------------------------------------------------------+
@@ -174,7 +322,7 @@ class CLIConfig(object):
             save_json(config, path)
         elif self.CONFIG == 'ini':
             if not self.OVER:
-                config = get_conf(self.FILE)
+                config = get_conf(self.FILE, writable=True)
             else:
                 config = {}
             for entry in self.entries:
@@ -9,7 +9,7 @@ setup(
     version=__version__,
     packages=find_packages(),
     install_requires=[
-        'scipy',
+        'numpy',
         'pyyaml',
         'trading212-api',
         'python-telegram-bot',